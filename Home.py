@@ -2,10 +2,13 @@ import streamlit as st
 from datetime import datetime
 import pandas as pd
 from utils.db_pool import DatabasePool
-from utils.models import MigratedCoin, Tweet
-from utils.scheduler import TaskScheduler
-from utils.data_fetcher import fetch_migrated_coins, update_market_data
-from utils.sentiment_analyzer import analyze_sentiment
+from utils.dashboard_data import (
+    chart_resolution, chart_window, history_figure, market_overview, recent_alerts,
+    recent_migrations, sentiment_by_coin
+)
+from utils.query_cache import query_cache
+from utils.scheduler import get_scheduler
+from utils.task_runner import task_runner
 from utils.log_util import setup_logging
 import plotly.express as px
 
@@ -13,10 +16,8 @@ import plotly.express as px
 db_pool = DatabasePool()
 logger = setup_logging(__name__, db_session_maker=db_pool.get_session)
 
-# Initialize scheduler
-scheduler = TaskScheduler()
-scheduler.start()
-logger.info("Scheduler started")
+# One scheduler per process, shared by every dashboard session
+scheduler = get_scheduler()
 
 # Streamlit UI
 st.title("Crypto Migration Monitor")
@@ -27,6 +28,7 @@ time_range = st.sidebar.selectbox(
     "Select Time Range",
     ["Last 24 Hours", "Last Week", "Last Month", "All Time"]
 )
+chart_coins = st.sidebar.slider("Coins per History Chart", min_value=1, max_value=1000, value=10)
 
 # Add Configuration Section
 st.sidebar.header("Configuration")
@@ -61,37 +63,51 @@ with st.sidebar.expander("API Keys & Credentials"):
 # Task Control Section in Sidebar
 st.sidebar.header("Task Controls")
 
-# Individual Task Buttons
+# Individual Task Buttons: runs go through the shared task runner, so a
+# task already running (from another session or the scheduler) is joined
+# rather than started twice, and the page stays responsive meanwhile
 st.sidebar.subheader("Run Individual Tasks")
-if st.sidebar.button("Fetch Migrated Coins"):
-    with st.spinner("Fetching migrated coins..."):
-        try:
-            fetch_migrated_coins()
-            st.success("Fetch completed!")
-            logger.info("Manual fetch_migrated_coins completed successfully")
-        except Exception as e:
-            st.error("Fetch failed!")
-            logger.error(f"Manual fetch_migrated_coins failed: {str(e)}", exc_info=True)
+for task, label in [('fetch', "Fetch Migrated Coins"), ('market', "Update Market Data"),
+                    ('sentiment', "Analyze Sentiment")]:
+    if st.sidebar.button(label):
+        run, started = task_runner.submit(task, trigger='dashboard')
+        if started:
+            st.sidebar.success(f"{label} started")
+            logger.info(f"Manual {task} run {run.run_id} started")
+        else:
+            st.sidebar.info(f"{label} already running since {run.started_at:%H:%M:%S}, following that run")
 
-if st.sidebar.button("Update Market Data"):
-    with st.spinner("Updating market data..."):
-        try:
-            update_market_data()
-            st.success("Market data updated!")
-            logger.info("Manual update_market_data completed successfully")
-        except Exception as e:
-            st.error("Update failed!")
-            logger.error(f"Manual update_market_data failed: {str(e)}", exc_info=True)
+@st.fragment(run_every=2 if task_runner.active() else None)
+def task_progress():
+    """Poll the shared runs; reload the page once a watched run finishes"""
+    running = set()
+    for task, info in task_runner.status().items():
+        run = info['run']
+        if run is None:
+            continue
+        progress = run['progress']
+        if run['state'] == 'running':
+            running.add(task)
+            text = f"{info['label']}: {progress['message'] or 'running'}"
+            if progress['total']:
+                st.progress(min(progress['done'] / progress['total'], 1.0),
+                            text=f"{text} ({progress['done']}/{progress['total']})")
+            else:
+                done = f", {progress['done']:,} done" if progress['done'] is not None else ""
+                st.caption(f"{text} ({run['elapsed']:.0f}s{done})")
+        elif run['state'] == 'failed':
+            st.caption(f"{info['label']} failed at {run['finished_at']:%H:%M:%S}: {run['error']}")
+        else:
+            st.caption(f"{info['label']} finished at {run['finished_at']:%H:%M:%S} "
+                       f"in {run['elapsed']:.1f}s")
 
-if st.sidebar.button("Analyze Sentiment"):
-    with st.spinner("Analyzing sentiment..."):
-        try:
-            analyze_sentiment()
-            st.success("Sentiment analysis completed!")
-            logger.info("Manual sentiment analysis completed successfully")
-        except Exception as e:
-            st.error("Analysis failed!")
-            logger.error(f"Manual sentiment analysis failed: {str(e)}", exc_info=True)
+    finished = st.session_state.get('watched_tasks', set()) - running
+    st.session_state['watched_tasks'] = running
+    if finished:
+        st.rerun()
+
+with st.sidebar:
+    task_progress()
 
 # Scheduler Control
 st.sidebar.subheader("Scheduler Control")
@@ -118,7 +134,10 @@ with col1:
             'Task': task,
             'Schedule': info['schedule'],
             'Last Run': info['last_run'].strftime("%H:%M:%S") if info['last_run'] else "Never",
-            'Status': info['status']
+            'Duration': f"{info['last_duration']:.1f}s" if info['last_duration'] is not None else "-",
+            'Next Run': info['next_run'].strftime("%H:%M:%S") if info['next_run'] else "-",
+            'Status': info['status'],
+            'Skipped': info['skips']
         }
         for task, info in task_status.items()
     ])
@@ -126,71 +145,153 @@ with col1:
 
 with col2:
     st.subheader("System Status")
-    st.metric("Database Connections", "5/10")
-    st.metric("API Rate Limit", "95%")
+    pool_status = db_pool.pool_status()
+    pool_capacity = pool_status['settings'].get('pool_size', 0) + pool_status['settings'].get('max_overflow', 0)
+    st.metric("Database Connections", f"{pool_status.get('in_use', 0)}/{pool_capacity}")
+    st.caption(
+        f"Checkout wait p95: {pool_status['checkout_wait_ms']['p95']:.0f} ms, "
+        f"pool timeouts: {pool_status['timeouts']}"
+    )
+    # Filled in once this run's dashboard queries have gone through the cache
+    cache_status = st.container()
 
 # Data Overview
 st.header("Data Overview")
 
-# Use database session to fetch data
+def format_usd(value):
+    return f"${value:,.2f}" if value is not None else "-"
+
+def format_pct(value):
+    return f"{value:+.1%}" if pd.notna(value) else "-"
+
+# Queries are cached per process and shared across dashboard sessions
+sentiment_data = []
 try:
-    with db_pool.get_session() as session:
-        # Recent migrations
-        migrations = session.query(MigratedCoin).order_by(
-            MigratedCoin.migration_date.desc()
-        ).limit(5).all()
-        
-        if migrations:
-            migrations_df = pd.DataFrame([{
-                'Coin': m.coin_symbol,
-                'Market Cap': f"${m.market_cap:,.2f}",
-                'Volume': f"${m.volume:,.2f}",
-                'Migration Date': m.migration_date.strftime("%Y-%m-%d %H:%M")
-            } for m in migrations])
-            
-            st.subheader("Recent Migrations")
-            st.dataframe(migrations_df)
+    # Recent migrations
+    migrations = recent_migrations(limit=5)
+    
+    if migrations:
+        migrations_df = pd.DataFrame([{
+            'Coin': m['coin_symbol'],
+            'Market Cap': format_usd(m['market_cap']),
+            'Volume': format_usd(m['volume']),
+            'Migration Date': m['migration_date'].strftime("%Y-%m-%d %H:%M")
+        } for m in migrations])
         
-        # Sentiment Analysis
-        sentiment_data = session.query(
-            Tweet.coin_id,
-            MigratedCoin.coin_symbol,
-            Tweet.sentiment
-        ).join(MigratedCoin).all()
+        st.subheader("Recent Migrations")
+        st.dataframe(migrations_df)
+    
+    # Sentiment Analysis (read from the hourly per-coin rollups)
+    sentiment_data = sentiment_by_coin(time_range)
+    
+    if sentiment_data:
+        avg_sentiment = pd.DataFrame(sentiment_data)
         
-        if sentiment_data:
-            sentiment_df = pd.DataFrame(sentiment_data)
-            avg_sentiment = sentiment_df.groupby('coin_symbol')['sentiment'].mean().reset_index()
-            
-            st.subheader("Sentiment Analysis")
-            fig = px.bar(avg_sentiment, x='coin_symbol', y='sentiment',
-                        title='Average Sentiment by Coin')
-            st.plotly_chart(fig)
+        st.subheader("Sentiment Analysis")
+        fig = px.bar(avg_sentiment, x='coin_symbol', y='sentiment',
+                    title='Average Sentiment by Coin')
+        st.plotly_chart(fig)
 except Exception as e:
     logger.error("Failed to fetch dashboard data", exc_info=True)
     st.error("Failed to load dashboard data. Please check the logs.")
 
-# Market Overview
+with cache_status:
+    st.metric("Query Cache Hit Rate", f"{query_cache.hit_ratio():.0%}")
+    cache_stats = query_cache.stats()
+    if cache_stats:
+        st.dataframe(pd.DataFrame([
+            {
+                'Query': name,
+                'Hit Rate': f"{info['hit_ratio']:.0%}",
+                'Query (ms)': round(info['avg_query_ms'], 1),
+                'Cached (ms)': round(info['avg_hit_ms'], 3)
+            }
+            for name, info in cache_stats.items()
+        ]))
+
+# Market Overview (vectorized analytics over the stored 15m bars)
 st.header("Market Overview")
+try:
+    overview = market_overview(top=chart_coins)
+except Exception as e:
+    logger.error("Failed to compute market analytics", exc_info=True)
+    st.error("Failed to load market analytics. Please check the logs.")
+    overview = {'top_performers': [], 'volumes': []}
+
 col3, col4 = st.columns(2)
 
 with col3:
     st.subheader("Top Performers")
-    # Add performance metrics visualization
+    if overview['top_performers']:
+        top_df = pd.DataFrame(overview['top_performers'])
+        fig = px.bar(top_df, x='coin_symbol', y='return_24h', title='24h Return')
+        fig.update_yaxes(tickformat='.0%')
+        st.plotly_chart(fig)
+        st.dataframe(pd.DataFrame([{
+            'Coin': p['coin_symbol'],
+            '1h': format_pct(p['return_1h']),
+            '24h': format_pct(p['return_24h']),
+            '7d': format_pct(p['return_7d']),
+            'Rank Change': f"{p['rank_change']:+.0f}" if pd.notna(p['rank_change']) else "-"
+        } for p in overview['top_performers'][:10]]))
+    else:
+        st.info("No market history yet")
 
 with col4:
     st.subheader("Volume Distribution")
-    # Add volume distribution chart
+    if overview['volumes']:
+        fig = px.histogram(pd.DataFrame(overview['volumes']), x='volume', log_x=True,
+                           title='Latest Volume per Coin')
+        st.plotly_chart(fig)
+    else:
+        st.info("No market history yet")
+
+# History charts, downsampled on the server to about one point per pixel.
+# Each session keeps its charts' series, so a rerun only reads the points
+# newer than the ones already shown and appends them.
+def history_chart(view, coins, title, y_format=None):
+    if not coins:
+        st.info("No history yet")
+        return
+    windows = st.session_state.setdefault('chart_windows', {})
+    key = (view, time_range, frozenset(coins))
+    window = windows.get(key)
+    if window is None:
+        # A new range or coin set replaces the chart's previous series
+        for stale in [k for k in windows if k[0] == view]:
+            del windows[stale]
+        window = windows[key] = chart_window(view, time_range, list(coins))
+    series = window.refresh()
+    st.plotly_chart(history_figure(series, coins, title, y_format))
+    resolution = 'hourly' if view == 'sentiment' else chart_resolution(time_range, window.points)
+    st.caption(f"{len(coins)} coins, {resolution} buckets, {window.stats['points_rendered']:,} points shown")
 
-# Alerts and Notifications
+st.header("History")
+try:
+    history_chart('price', {p['coin_id']: p['coin_symbol'] for p in overview['top_performers']},
+                  'Top Performers: Close Price')
+    history_chart('volume', {v['coin_id']: v['coin_symbol'] for v in overview['volumes'][:chart_coins]},
+                  'Highest Volume: Volume per Bar')
+    discussed = sorted(sentiment_data or [], key=lambda row: row['tweet_count'], reverse=True)[:chart_coins]
+    history_chart('sentiment', {row['coin_id']: row['coin_symbol'] for row in discussed},
+                  'Most Discussed: Hourly Sentiment')
+except Exception as e:
+    logger.error("Failed to load history charts", exc_info=True)
+    st.error("Failed to load history charts. Please check the logs.")
+
+# Alerts and Notifications (fired by the alert engine during ingestion)
 st.header("Alerts")
-alerts = [
-    "High sentiment spike detected for COIN1",
-    "New migration detected: COIN2",
-    "Unusual volume increase: COIN3"
-]
-for alert in alerts:
-    st.warning(alert)
+try:
+    alerts = recent_alerts()
+except Exception as e:
+    logger.error("Failed to load alerts", exc_info=True)
+    st.error("Failed to load alerts. Please check the logs.")
+    alerts = []
+if alerts:
+    for alert in alerts:
+        st.warning(f"{alert['created_at']:%Y-%m-%d %H:%M} {alert['message']}")
+else:
+    st.info("No alerts")
 
 # Footer
 st.markdown("---")
@@ -199,4 +300,4 @@ st.markdown("Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 # Add refresh button
 if st.button("Refresh Data"):
     logger.info("Manual dashboard refresh triggered")
-    st.experimental_rerun()
+    st.rerun()
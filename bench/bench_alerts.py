@@ -0,0 +1,100 @@
+"""
+Incremental alert evaluation cost per ingest batch
+
+Seeds --coins coins, then feeds --batches market updates (one snapshot per
+coin, 15 minutes apart) and --batches sentiment chunks through the alert
+engine, as update_market_data and analyze_sentiment do, with anomalies
+injected for 1% of the coins in the last batch. Reports the time per batch
+spent in the engine (state load, rules, state save, alert insert) and in
+delivering alerts through a StubNotifier.
+
+Usage:
+    python -m bench.bench_alerts --coins 10000 --batches 20
+    DB_URL=postgresql://... python -m bench.bench_alerts
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+from bench.bench_market_history import seed_coins
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert engine benchmark')
+    parser.add_argument('--coins', type=int, default=10000)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--tweets', type=int, default=5000, help='Tweets per sentiment chunk')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.alert_engine import AlertEngine
+        from utils.db_pool import DatabasePool
+        from utils.models import Alert, CoinAlertState, MigratedCoin
+        from utils.notifier import StubNotifier
+
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            for model in (Alert, CoinAlertState, MigratedCoin):
+                conn.execute(model.__table__.delete())
+        coin_ids = seed_coins(db, args.coins)
+
+        now = [datetime.datetime.utcnow().replace(second=0, microsecond=0)]
+        notifier = StubNotifier()
+        engine = AlertEngine(notifier=notifier, clock=lambda: now[0])
+        rng = random.Random(4)
+        prices = {coin_id: rng.uniform(1e-6, 1e-3) for coin_id in coin_ids}
+        spiked = set(coin_ids[:max(len(coin_ids) // 100, 1)])
+
+        market, sentiment = [], []
+        for batch in range(args.batches):
+            now[0] += datetime.timedelta(minutes=15)
+            last = batch == args.batches - 1
+            snapshots = []
+            for coin_id in coin_ids:
+                prices[coin_id] *= rng.uniform(0.97, 1.03)
+                volume = rng.lognormvariate(8, 0.3)
+                if last and coin_id in spiked:
+                    prices[coin_id] *= 1.5
+                    volume *= 20
+                snapshots.append({
+                    'coin_id': coin_id, 'timestamp': now[0],
+                    'price': prices[coin_id], 'volume': volume,
+                })
+            rows = []
+            for _ in range(args.tweets):
+                coin_id = rng.choice(coin_ids)
+                rows.append((coin_id, now[0], rng.uniform(-0.3, 0.4), 0, 0))
+            if last:
+                rows.extend((coin_id, now[0], 0.95, 0, 0) for coin_id in spiked for _ in range(10))
+
+            with db.get_session() as session:
+                start = time.perf_counter()
+                engine.on_market_data(session, snapshots)
+                session.commit()
+                market.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                engine.on_sentiment(session, rows)
+                session.commit()
+                sentiment.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        delivered = engine.notify()
+        notify_time = time.perf_counter() - start
+
+        # Skip the first batch, which inserts every coin's state
+        steady = market[1:] or market
+        market_ms = sum(steady) / len(steady) * 1000
+        steady = sentiment[1:] or sentiment
+        sentiment_ms = sum(steady) / len(steady) * 1000
+        print(f"{db.engine.dialect.name}: {args.coins:,} coins, {args.batches} batches")
+        print(f"market batch:    {market_ms:8.1f} ms ({args.coins / market_ms * 1000:,.0f} snapshots/s)")
+        print(f"sentiment chunk: {sentiment_ms:8.1f} ms ({args.tweets / sentiment_ms * 1000:,.0f} tweets/s)")
+        print(f"notify:          {notify_time * 1000:8.1f} ms for {delivered} alerts in {len(notifier.batches)} batches")
+        print(f"stats: {engine.stats}")
+
+if __name__ == '__main__':
+    main()
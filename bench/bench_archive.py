@@ -0,0 +1,137 @@
+"""
+90-day sentiment vs volume scan: Parquet archive vs the database
+
+Seeds --days of synthetic tweets (scored) and market snapshots for --coins
+coins, archives them, then computes daily tweet count, mean sentiment and
+mean volume per coin twice: reading the archive through ArchiveReader and
+pulling the same rows through DatabasePool.get_session(). Both feed the same
+pandas aggregation, whose results must match. Also times a selective scan
+(--select coins over the last 30 days) to show the predicate pushdown, and a
+re-export to show that unchanged days are skipped.
+
+Usage:
+    python -m bench.bench_archive --coins 1000 --tweets 1000000 --ticks 1000000
+    DB_URL=postgresql://... python -m bench.bench_archive
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+import pandas as pd
+from bench import synthetic
+
+def seed(db, args, now):
+    from utils.models import MarketSnapshot, MigratedCoin, Tweet
+
+    coins = synthetic.coins(args.coins, now)
+    tweets = synthetic.tweets(args.tweets, coins, now, days=args.days)
+    rng = random.Random(4)
+    for tweet in tweets:
+        tweet['sentiment'] = rng.uniform(-1, 1)
+    interval = datetime.timedelta(days=args.days) / max(1, args.ticks // args.coins)
+    with db.engine.begin() as conn:
+        for model in (MarketSnapshot, Tweet, MigratedCoin):
+            conn.execute(model.__table__.delete())
+        conn.execute(MigratedCoin.__table__.insert(), coins)
+        for i in range(0, len(tweets), 50000):
+            conn.execute(Tweet.__table__.insert(), tweets[i:i + 50000])
+        for batch in synthetic.market_ticks(args.ticks, [coin['id'] for coin in coins], now, interval):
+            conn.execute(MarketSnapshot.__table__.insert(), batch)
+
+def daily(tweets, snapshots):
+    """Per coin and day: tweets, mean sentiment, mean volume"""
+    tweets = tweets.assign(day=tweets['created_at'].dt.floor('D'))
+    snapshots = snapshots.assign(day=snapshots['timestamp'].dt.floor('D'))
+    sentiment = tweets.groupby(['coin_id', 'day'])['sentiment'].agg(['count', 'mean'])
+    volume = snapshots.groupby(['coin_id', 'day'])['volume'].mean()
+    return sentiment.join(volume, how='inner').sort_index()
+
+def from_archive(reader, start, end, coin_ids=None):
+    tweets = reader.read('tweets', ['coin_id', 'created_at', 'sentiment'], coin_ids, start, end)
+    snapshots = reader.read('market_snapshots', ['coin_id', 'timestamp', 'volume'], coin_ids, start, end)
+    return daily(tweets, snapshots)
+
+def from_database(db, start, end, coin_ids=None):
+    from utils.models import MarketSnapshot, Tweet
+
+    with db.get_session() as session:
+        query = session.query(Tweet.coin_id, Tweet.created_at, Tweet.sentiment).filter(
+            Tweet.created_at >= start, Tweet.created_at < end
+        )
+        if coin_ids is not None:
+            query = query.filter(Tweet.coin_id.in_(coin_ids))
+        tweets = pd.DataFrame(query.all(), columns=['coin_id', 'created_at', 'sentiment'])
+        query = session.query(MarketSnapshot.coin_id, MarketSnapshot.timestamp, MarketSnapshot.volume).filter(
+            MarketSnapshot.timestamp >= start, MarketSnapshot.timestamp < end
+        )
+        if coin_ids is not None:
+            query = query.filter(MarketSnapshot.coin_id.in_(coin_ids))
+        snapshots = pd.DataFrame(query.all(), columns=['coin_id', 'timestamp', 'volume'])
+    return daily(tweets, snapshots)
+
+def best(func, repeat):
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive vs database scan benchmark')
+    parser.add_argument('--coins', type=int, default=1000)
+    parser.add_argument('--tweets', type=int, default=300000)
+    parser.add_argument('--ticks', type=int, default=300000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--select', type=int, default=10, help='Coins in the selective scan')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.archive import ArchiveReader, export_archive
+        from utils.db_pool import DatabasePool
+
+        db = DatabasePool()
+        db.create_all_tables()
+        # Archive everything up to today: the fixture ends at `now`
+        now = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        seed(db, args, now - datetime.timedelta(seconds=1))
+        root = os.path.join(tmp, 'archive')
+        datasets = ['tweets', 'market_snapshots']
+        export_now = now + datetime.timedelta(days=1)
+
+        start = time.perf_counter()
+        report = export_archive(db.engine, root, export_now, datasets)
+        exported = time.perf_counter() - start
+        start = time.perf_counter()
+        again = export_archive(db.engine, root, export_now, datasets)
+        reexported = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+        print(f"{db.engine.dialect.name}: {args.coins:,} coins, {args.tweets:,} tweets, "
+              f"{args.ticks:,} snapshots over {args.days} days")
+        print(f"export: {sum(r['rows'] for r in report.values()):,} rows in "
+              f"{sum(len(r['exported']) for r in report.values())} day files, {exported:.2f}s, "
+              f"{size / 1e6:.1f} MB")
+        print(f"re-export: {sum(len(r['exported']) for r in again.values())} days rewritten, "
+              f"{sum(r['unchanged'] for r in again.values())} unchanged, {reexported:.2f}s")
+
+        reader = ArchiveReader(root)
+        scans = {
+            f"{args.days}-day scan, all coins": (now - datetime.timedelta(days=args.days), now, None),
+            f"30-day scan, {args.select} coins": (
+                now - datetime.timedelta(days=30), now, list(range(1, args.select + 1))
+            ),
+        }
+        print(f"{'scan':<28} {'archive ms':>11} {'database ms':>12} {'speedup':>8} {'groups':>8}")
+        for label, (scan_start, scan_end, coin_ids) in scans.items():
+            archived, archive_s = best(lambda: from_archive(reader, scan_start, scan_end, coin_ids), args.repeat)
+            queried, database_s = best(lambda: from_database(db, scan_start, scan_end, coin_ids), args.repeat)
+            pd.testing.assert_frame_equal(archived, queried, check_dtype=False, check_index_type=False)
+            print(f"{label:<28} {archive_s * 1000:>11.0f} {database_s * 1000:>12.0f} "
+                  f"{database_s / archive_s:>7.1f}x {len(archived):>8,}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Tweet-to-coin attribution throughput with 10k and 100k indexed coins
+
+Indexes --coins synthetic coins (comma-separated sizes), then attributes
+--tweets synthetic tweets whose coin is mentioned by cashtag, @handle,
+contract address or name (or not at all), and reports tweets attributed
+per second, the share attributed to the coin the tweet was generated for,
+the full build time and the time to add --added coins incrementally. A
+naive scan testing every coin's patterns against each tweet is timed on a
+sample for comparison.
+
+Usage:
+    python -m bench.bench_attribution --coins 10000,100000 --tweets 100000
+"""
+import argparse
+import datetime
+import random
+import re
+import time
+from bench import synthetic
+
+# Share of tweets mentioning their coin each way; the rest mention none
+MENTIONS = (('cashtag', 0.5), ('handle', 0.15), ('address', 0.1), ('name', 0.15))
+
+def labelled_tweets(count, coins, now, seed=5):
+    """(content, expected coin id or None) pairs"""
+    rng = random.Random(seed)
+    by_id = {coin['id']: coin for coin in coins}
+    labelled = []
+    for row in synthetic.tweets(count, coins, now, seed=seed):
+        coin = by_id[row['coin_id']]
+        cashtag = re.compile(re.escape(f"${coin['coin_symbol']}"), re.IGNORECASE)
+        pick = rng.random()
+        for kind, share in MENTIONS:
+            if pick < share:
+                break
+            pick -= share
+        else:
+            kind = None
+        mention = {
+            'cashtag': f"${coin['coin_symbol']}",
+            'handle': f"@{coin['twitter_handle']}",
+            'address': coin['contract_address'],
+            'name': coin['coin_name'],
+            None: 'it',
+        }[kind]
+        content = cashtag.sub(lambda _: mention, row['content'], count=1)
+        labelled.append((content, coin['id'] if kind else None))
+    return labelled
+
+def naive_attribute(coins, text):
+    """First coin any of whose patterns occurs in text, testing every coin"""
+    lower = text.lower()
+    words = set(lower.split())
+    for coin in coins:
+        if coin['contract_address'] in text or f"${coin['coin_symbol'].lower()}" in words \
+                or f"@{coin['twitter_handle']}" in words or coin['coin_name'].lower() in lower:
+            return coin['id']
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribution index benchmark')
+    parser.add_argument('--coins', default='10000,100000', help='Comma-separated index sizes')
+    parser.add_argument('--tweets', type=int, default=100000)
+    parser.add_argument('--added', type=int, default=100, help='Coins added incrementally')
+    parser.add_argument('--naive-sample', type=int, default=200)
+    args = parser.parse_args()
+
+    from utils.attribution import AttributionIndex
+
+    now = datetime.datetime(2024, 1, 1)
+    print(f"{'coins':>8} {'build s':>8} {'add ' + str(args.added) + ' ms':>10} {'tweets/s':>10} "
+          f"{'naive/s':>9} {'speedup':>8} {'correct':>8} {'missed':>7}")
+    for size in (int(value) for value in args.coins.split(',')):
+        coins = synthetic.coins(size + args.added, now)
+        indexed, added = coins[:size], coins[size:]
+        tweets = labelled_tweets(args.tweets, indexed, now)
+        texts = [content for content, _ in tweets]
+
+        index = AttributionIndex()
+        start = time.perf_counter()
+        index.add_coins(indexed)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        attributed = index.attribute_many(texts)
+        rate = len(texts) / (time.perf_counter() - start)
+        correct = sum(got == want for got, (_, want) in zip(attributed, tweets) if want is not None)
+        expected = sum(want is not None for _, want in tweets)
+        missed = sum(got is None for got, (_, want) in zip(attributed, tweets) if want is not None)
+
+        sample = texts[:args.naive_sample]
+        start = time.perf_counter()
+        for text in sample:
+            naive_attribute(indexed, text)
+        naive_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.add_coins(added)
+        increment = time.perf_counter() - start
+        assert all(index.attribute(f"${coin['coin_symbol']} and @{coin['twitter_handle']}") == coin['id']
+                   for coin in added)
+
+        print(f"{size:>8,} {built:>8.2f} {increment * 1000:>10.1f} {rate:>10,.0f} {naive_rate:>9,.0f} "
+              f"{rate / naive_rate:>7.0f}x {correct / expected:>8.1%} {missed:>7,}")
+
+if __name__ == '__main__':
+    main()
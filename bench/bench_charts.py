@@ -0,0 +1,129 @@
+"""
+Dashboard history chart payload and render time, 1 day vs 1 month
+
+Seeds --coins coins with a day of 1m bars and --days of 15m, 1h and 1d
+bars, then builds the close price chart of 10 and of --coins coins for
+the "Last 24 Hours" and "Last Month" ranges twice: naively (every 1m or
+15m bar into px.line) and through chart_window()/history_figure()
+(coarser bars as coins are added, downsampled with LTTB or min/max
+buckets). Reports the bars read, the query, the figure build plus JSON
+serialization time and the payload Streamlit sends to the browser.
+Browser drawing time is not measured; it follows the points sent.
+
+Finally adds one bar per coin and times the incremental refresh of the
+downsampled chart against building it again from scratch.
+
+Usage:
+    python -m bench.bench_charts --coins 1000
+    DB_URL=postgresql://... python -m bench.bench_charts
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from bench.bench_market_history import load_bars, seed_coins
+
+# Finest bars kept for each range, read by the naive chart
+RANGES = {'Last 24 Hours': '1m', 'Last Month': '15m'}
+# Resolution -> days of bars seeded (None: --days)
+SEEDED = {'1m': 1, '15m': None, '1h': None, '1d': None}
+
+def naive_figure(series, symbols):
+    import pandas as pd
+    import plotly.express as px
+
+    frame = pd.DataFrame({
+        'timestamp': series['timestamp'],
+        'close': series['value'],
+        'coin': [symbols[coin_id] for coin_id in series['coin_id'].tolist()],
+    })
+    return px.line(frame, x='timestamp', y='close', color='coin')
+
+def add_bars(db, coin_ids, resolution, bucket):
+    from utils.models import MarketBar
+
+    with db.engine.begin() as conn:
+        conn.execute(MarketBar.__table__.insert(), [
+            {'resolution': resolution, 'coin_id': coin_id, 'bucket_start': bucket, 'first_at': bucket,
+             'last_at': bucket, 'open': 1e-4, 'high': 1e-4, 'low': 1e-4, 'close': 1e-4,
+             'market_cap': 1e5, 'volume': 1000.0, 'holders': 100, 'samples': 1}
+            for coin_id in coin_ids
+        ])
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard chart downsampling benchmark')
+    parser.add_argument('--coins', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30, help='Days of 15m bars')
+    parser.add_argument('--points', type=int, default=800, help='Points per coin (about the chart width)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        import logging
+        from utils.dashboard_data import chart_resolution, chart_window, history_figure, market_series
+        from utils.db_pool import DatabasePool
+        from utils.downsample import choose_method
+        from utils.market_history import RESOLUTIONS
+        from utils.models import MarketBar, MigratedCoin
+        from utils.rollups import TIME_RANGES
+
+        logging.disable(logging.WARNING)
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            for model in (MarketBar, MigratedCoin):
+                conn.execute(model.__table__.delete())
+
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        coin_ids = seed_coins(db, args.coins)
+        symbols = {coin_id: f"B{coin_id}" for coin_id in coin_ids}
+        for resolution, days in SEEDED.items():
+            start = time.perf_counter()
+            loaded = load_bars(db, coin_ids, days or args.days, resolution, now)
+            print(f"seeded {loaded:,} {resolution} bars in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'range':<14} {'coins':>6} {'chart':<8} {'bars':>4} {'points':>10} {'query ms':>9} "
+              f"{'build ms':>9} {'payload KB':>11}")
+        for time_range, finest in RANGES.items():
+            for count in sorted({min(10, args.coins), args.coins}):
+                ids = coin_ids[:count]
+                chart_symbols = {coin_id: symbols[coin_id] for coin_id in ids}
+
+                start = time.perf_counter()
+                series = market_series(ids, 'close', finest)(now - TIME_RANGES[time_range])
+                queried = time.perf_counter() - start
+                start = time.perf_counter()
+                payload = len(naive_figure(series, chart_symbols).to_json())
+                built = time.perf_counter() - start
+                print(f"{time_range:<14} {count:>6,} {'naive':<8} {finest:>4} {len(series['coin_id']):>10,} "
+                      f"{queried * 1000:>9.0f} {built * 1000:>9.0f} {payload / 1024:>11,.0f}")
+
+                window = chart_window('price', time_range, ids, args.points)
+                resolution = chart_resolution(time_range, window.points, now)
+                start = time.perf_counter()
+                series = window.refresh(now)
+                queried = time.perf_counter() - start
+                start = time.perf_counter()
+                payload = len(history_figure(series, chart_symbols, time_range).to_json())
+                built = time.perf_counter() - start
+                print(f"{time_range:<14} {count:>6,} {choose_method(count):<8} {resolution:>4} {len(series['coin_id']):>10,} "
+                      f"{queried * 1000:>9.0f} {built * 1000:>9.0f} {payload / 1024:>11,.0f}")
+
+                # One new bar per coin: append it vs build the chart again
+                step = RESOLUTIONS[resolution]
+                add_bars(db, ids, resolution, now)
+                before = window.stats['points_loaded']
+                start = time.perf_counter()
+                window.refresh(now + step)
+                appended = time.perf_counter() - start
+                start = time.perf_counter()
+                chart_window('price', time_range, ids, args.points).refresh(now + step)
+                rebuilt = time.perf_counter() - start
+                print(f"{'':<14} {'':>6} {'refresh':<8} {resolution:>4} {window.stats['points_loaded'] - before:>10,} "
+                      f"{appended * 1000:>9.0f} {'':>9} {'':>11}  (full reload {rebuilt * 1000:.0f} ms)")
+                with db.engine.begin() as conn:
+                    conn.execute(MarketBar.__table__.delete().where(MarketBar.bucket_start == now))
+
+if __name__ == '__main__':
+    main()
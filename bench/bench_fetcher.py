@@ -0,0 +1,42 @@
+"""
+Benchmark market data refresh throughput against a local stub API
+
+Usage:
+    python -m bench.bench_fetcher --coins 2000 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+from bench.stub_api import StubApiServer
+from utils import async_fetcher
+from utils.async_fetcher import AsyncFetcher
+from utils.data_fetcher import fetch_market_updates
+
+async def refresh(coins, concurrency):
+    async with AsyncFetcher(concurrency=concurrency, rate_limits={}, backoff=0.01) as fetcher:
+        start = time.perf_counter()
+        updates, failures = await fetch_market_updates(coins, fetcher)
+        return time.perf_counter() - start, len(updates), failures, fetcher.stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Async fetcher benchmark')
+    parser.add_argument('--coins', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Stub response latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Fraction of 503 responses')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    server = StubApiServer(coins=args.coins, latency=args.latency, error_rate=args.error_rate).start()
+    async_fetcher.APIS['pumpfun']['base_url'] = server.url
+    try:
+        coins = server.mints()
+        for concurrency in args.concurrency:
+            elapsed, refreshed, failures, stats = asyncio.run(refresh(coins, concurrency))
+            print(f"concurrency={concurrency:<4} coins={refreshed:<6} failed={failures:<4} "
+                  f"retries={stats['retries']:<4} elapsed={elapsed:.2f}s "
+                  f"rate={refreshed / elapsed:,.0f} coins/s")
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Incremental ingestion: rows fetched vs changed and database writes per run
+
+Runs the migrations fetch, the market refresh and tweet ingestion against
+the local stub API (and a synthetic tweet fixture) several times:
+
+1. initial load
+2. replay over the same fixture, which must perform zero writes (the
+   market replay refetches every coin: MARKET_MIN_AGE is set to 0)
+3. after the feed grows by --growth, market caps move and --edits of the
+   tweets change
+
+The migrations feed is then served newest first, grown and replayed
+again, which must switch the cursor from the feed position to the latest
+migration time.
+
+Write statements (INSERT/UPDATE/DELETE/COPY) are counted with a cursor
+event on the engine. Exits with status 1 if a replay
+writes anything.
+
+Usage:
+    python -m bench.bench_incremental --coins 2000 --tweets 20000
+    DB_URL=postgresql://... python -m bench.bench_incremental
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+for _api in ('PUMPFUN', 'RUGCHECK', 'TWEETSCOUT'):
+    os.environ.setdefault(f"{_api}_RATE_LIMIT", '100000')
+
+class WriteCounter:
+    """Counts write statements executed on an engine"""
+
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE', 'COPY'):
+            self.statements += 1
+
+    def reset(self):
+        statements, self.statements = self.statements, 0
+        return statements
+
+def tweet_fixture(count, coin_ids, seed=3):
+    rng = random.Random(seed)
+    start = datetime.datetime.utcnow().replace(microsecond=0) - datetime.timedelta(days=1)
+    return [
+        {
+            'tweet_id': str(1800000000000000000 + i),
+            'coin_id': rng.choice(coin_ids),
+            'content': f"tweet {i} about ${rng.randint(0, 999)} {'moon' if i % 3 else 'rug'}",
+            'created_at': start + datetime.timedelta(seconds=i),
+            'likes': rng.randint(0, 50),
+            'retweets': rng.randint(0, 10),
+        }
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental ingestion benchmark')
+    parser.add_argument('--coins', type=int, default=2000)
+    parser.add_argument('--tweets', type=int, default=20000)
+    parser.add_argument('--growth', type=float, default=0.1, help='Fraction of new migrations in run 3')
+    parser.add_argument('--edits', type=float, default=0.01, help='Fraction of tweets edited in run 3')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from sqlalchemy import event
+        from bench.stub_api import StubApiServer
+        from utils import async_fetcher, data_fetcher
+        from utils.db_pool import DatabasePool
+        from utils.models import MigratedCoin, RowHash, Tweet, Watermark
+
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            for model in (RowHash, Watermark, Tweet, MigratedCoin):
+                conn.execute(model.__table__.delete())
+
+        # Every replay refetches all coins; the stub's market caps only move when drift is on
+        data_fetcher.MARKET_MIN_AGE = datetime.timedelta(0)
+        server = StubApiServer(coins=args.coins, latency=0, drift=False).start()
+        for api in async_fetcher.APIS.values():
+            api['base_url'] = server.url
+        writes = WriteCounter()
+        event.listen(db.engine, 'before_cursor_execute', writes)
+
+        failed = []
+        print(f"{db.engine.dialect.name}: {args.coins:,} migrations, {args.tweets:,} tweets")
+        print(f"{'run':<28} {'fetched':>8} {'changed':>8} {'requests':>9} {'writes':>7} {'ms':>8}")
+
+        def run(name, func, replay=False):
+            writes.reset()
+            requests = server.requests
+            start = time.perf_counter()
+            stats = func()
+            elapsed = time.perf_counter() - start
+            statements = writes.reset()
+            print(f"{name:<28} {stats['fetched']:>8} {stats['changed']:>8} {server.requests - requests:>9} "
+                  f"{statements:>7} {elapsed * 1000:>8.0f}")
+            if replay and statements:
+                failed.append(name)
+
+        def market():
+            data_fetcher.update_market_data()
+            return data_fetcher.watermarks.stats()['market']['last']
+
+        try:
+            run('migrations: initial', data_fetcher.fetch_migrated_coins)
+            run('migrations: replay', data_fetcher.fetch_migrated_coins, replay=True)
+            server.coins = int(args.coins * (1 + args.growth))
+            run(f"migrations: +{args.growth:.0%} feed", data_fetcher.fetch_migrated_coins)
+
+            run('market: initial', market)
+            run('market: replay', market, replay=True)
+            server.drift = True
+            run('market: caps moved', market)
+
+            with db.get_session() as session:
+                coin_ids = [coin_id for coin_id, in session.query(MigratedCoin.id)]
+            tweets = tweet_fixture(args.tweets, coin_ids)
+            run('tweets: initial', lambda: data_fetcher.ingest_tweets(tweets))
+            run('tweets: replay', lambda: data_fetcher.ingest_tweets(tweets), replay=True)
+            rng = random.Random(5)
+            for tweet in rng.sample(tweets, int(len(tweets) * args.edits)):
+                tweet['likes'] += 1
+            run(f"tweets: {args.edits:.0%} edited", lambda: data_fetcher.ingest_tweets(tweets))
+
+            server.newest_first = True
+            server.coins = int(server.coins * (1 + args.growth))
+            run(f"newest first: +{args.growth:.0%} feed", data_fetcher.fetch_migrated_coins)
+            run('newest first: replay', data_fetcher.fetch_migrated_coins, replay=True)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', writes)
+            server.stop()
+
+        if failed:
+            raise SystemExit(f"Replay wrote to the database: {', '.join(failed)}")
+        print("replays performed zero writes")
+
+if __name__ == '__main__':
+    main()
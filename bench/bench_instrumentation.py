@@ -0,0 +1,106 @@
+"""
+Cost of the instrumentation spans, enabled and disabled
+
+Times a tight loop of a trivial body bare, inside `with span(...)` and
+through a @timed function, with metrics disabled and enabled, and reports
+the added nanoseconds per call (best of --repeat). Also times a
+sentiment-sized phase (VADER over --texts texts in chunks) with and
+without spans to put the per-span cost in proportion. A disabled span costs
+about as much as any Python with-statement; exits with status 1 when it
+costs more than --max-disabled-ns.
+
+Usage:
+    python -m bench.bench_instrumentation
+    python -m bench.bench_instrumentation --calls 2000000 --max-disabled-ns 300
+"""
+import argparse
+import random
+import time
+from utils.instrumentation import Metrics
+
+def per_call_ns(func, calls, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func(calls)
+        best = min(best, (time.perf_counter_ns() - start) / calls)
+    return best
+
+def loops(metrics):
+    span = metrics.span
+
+    def bare(calls):
+        total = 0
+        for i in range(calls):
+            total += i
+        return total
+
+    def spanned(calls):
+        total = 0
+        for i in range(calls):
+            with span('bench.loop'):
+                total += i
+        return total
+
+    def body(i):
+        return i
+
+    def timed_body(i):
+        with metrics.span('bench.timed'):
+            return i
+
+    def plain_calls(calls):
+        for i in range(calls):
+            body(i)
+
+    def timed_calls(calls):
+        for i in range(calls):
+            timed_body(i)
+
+    return bare, spanned, plain_calls, timed_calls
+
+def main():
+    parser = argparse.ArgumentParser(description='Instrumentation overhead benchmark')
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--texts', type=int, default=20000)
+    parser.add_argument('--chunk', type=int, default=500)
+    parser.add_argument('--max-disabled-ns', type=float, default=300)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'mode':<10} {'span ns':>9} {'timed ns':>9}")
+    for mode, enabled in (('disabled', False), ('enabled', True)):
+        bare, spanned, plain_calls, timed_calls = loops(Metrics(enabled=enabled))
+        span_ns = per_call_ns(spanned, args.calls, args.repeat) - per_call_ns(bare, args.calls, args.repeat)
+        timed_ns = per_call_ns(timed_calls, args.calls, args.repeat) - per_call_ns(plain_calls, args.calls, args.repeat)
+        results[mode] = span_ns
+        print(f"{mode:<10} {span_ns:>9.1f} {timed_ns:>9.1f}")
+
+    from utils.sentiment_analyzer import score_texts
+
+    rng = random.Random(2)
+    words = "moon rug wagmi ngmi great terrible pump dump love hate scam gem bullish bearish lol".split()
+    texts = [' '.join(rng.choice(words) for _ in range(12)) for _ in range(args.texts)]
+    chunks = [texts[i:i + args.chunk] for i in range(0, len(texts), args.chunk)]
+    score_texts(chunks[0])
+
+    for mode, enabled in (('none', None), ('disabled', False), ('enabled', True)):
+        metrics = Metrics(enabled=bool(enabled))
+        start = time.perf_counter()
+        for chunk in chunks:
+            if enabled is None:
+                score_texts(chunk)
+            else:
+                with metrics.span('sentiment.score'):
+                    score_texts(chunk)
+        elapsed = time.perf_counter() - start
+        added = len(chunks) * results.get(mode, 0) / 1e9
+        print(f"scoring {args.texts:,} texts in {len(chunks)} spans, {mode:<8}: {elapsed * 1000:8.1f} ms "
+              f"(span cost {added / elapsed:.5%})")
+
+    if results['disabled'] > args.max_disabled_ns:
+        raise SystemExit(f"Disabled span costs {results['disabled']:.0f} ns (limit {args.max_disabled_ns:.0f})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Distributed job rounds: throughput per worker count and lease recovery
+
+Runs a synthetic sharded job (each shard sleeps --work-ms, standing in for
+API calls, then writes one row in the shard's transaction) with 1, 2 and 4
+worker processes sharing the database through utils.leases, and reports
+shards/s per worker count. A final round kills one worker in the middle of
+a shard; the survivors reclaim its shard once the lease expires.
+
+Every round is checked for exactly-once effects: one row per shard, all
+shards done.
+
+Usage:
+    python -m bench.bench_leases --shards 32 --work-ms 200
+    DB_URL=postgresql://... python -m bench.bench_leases
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import tempfile
+import time
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select
+
+LEASE_TTL = datetime.timedelta(seconds=2)
+
+_metadata = MetaData()
+effects = Table(
+    'bench_shard_effects', _metadata,
+    Column('round_start', DateTime),
+    Column('shard', Integer),
+    Column('owner', String(128)),
+)
+
+_processed = 0
+
+def plan_shards(session, shards):
+    return [(shard, shard + 1) for shard in range(shards)]
+
+def synthetic_shard(session, range_start, range_end, fence):
+    """Sleep like a shard of API calls, then write this shard's effect"""
+    global _processed
+    _processed += 1
+    work = float(os.environ['BENCH_WORK_MS']) / 1000
+    if os.environ.get('BENCH_CRASH_ON') == str(_processed):
+        time.sleep(work / 2)
+        os._exit(1)
+    time.sleep(work)
+    session.execute(effects.insert().values(
+        round_start=datetime.datetime.fromisoformat(os.environ['BENCH_ROUND']),
+        shard=range_start, owner=str(os.getpid())
+    ))
+
+def worker(job, shards, started, ready, crash_on=None):
+    from utils.leases import DistributedJob, LeaseWorker
+
+    if crash_on:
+        os.environ['BENCH_CRASH_ON'] = str(crash_on)
+    os.environ['BENCH_ROUND'] = started.isoformat(sep=' ')
+    jobs = {job: DistributedJob('bench.bench_leases:synthetic_shard', shards, plan='bench.bench_leases:plan_shards')}
+    lease_worker = LeaseWorker(jobs=jobs, lease_ttl=LEASE_TTL, poll=0.2)
+    # Start together once every interpreter has imported its modules
+    ready.wait()
+    lease_worker.run_round(job, 3600, now=started)
+
+def run_round(job, shards, workers, started, crash_on=None):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(workers + 1)
+    processes = [
+        context.Process(target=worker, args=(job, shards, started, ready, crash_on if i == 0 else None))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start = time.perf_counter()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start, [process.exitcode for process in processes]
+
+def check(db, job, started, shards):
+    from utils.models import JobShard
+
+    with db.get_session() as session:
+        per_shard = session.execute(
+            select(effects.c.shard, func.count()).where(effects.c.round_start == started)
+            .group_by(effects.c.shard)
+        ).all()
+        states = dict(session.query(JobShard.state, func.count()).filter(
+            JobShard.job == job, JobShard.round_start == started
+        ).group_by(JobShard.state).all())
+        reclaimed = session.query(func.count()).filter(
+            JobShard.job == job, JobShard.round_start == started, JobShard.attempts > 1
+        ).scalar()
+        owners = session.query(func.count(func.distinct(JobShard.owner))).filter(
+            JobShard.job == job, JobShard.round_start == started
+        ).scalar()
+    counts = dict(per_shard)
+    exactly_once = len(counts) == shards and set(counts.values()) == {1}
+    return exactly_once, states, reclaimed, owners
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed job lease benchmark')
+    parser.add_argument('--shards', type=int, default=32)
+    parser.add_argument('--work-ms', type=float, default=200)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        os.environ['BENCH_WORK_MS'] = str(args.work_ms)
+        from utils.db_pool import DatabasePool
+        from utils.models import JobShard
+
+        db = DatabasePool()
+        db.create_all_tables()
+        _metadata.create_all(db.engine)
+        job = 'bench'
+        with db.engine.begin() as conn:
+            conn.execute(effects.delete())
+            conn.execute(JobShard.__table__.delete().where(JobShard.__table__.c.job == job))
+
+        base = datetime.datetime(2000, 1, 1)
+        failed = False
+        print(f"{db.engine.dialect.name}: {args.shards} shards x {args.work_ms:.0f} ms")
+        print(f"{'workers':>7} {'seconds':>8} {'shards/s':>9} {'speedup':>8} {'owners':>7}  exactly-once")
+        single = None
+        counts = [int(count) for count in args.workers.split(',')]
+        for i, workers in enumerate(counts):
+            started = base + datetime.timedelta(hours=i)
+            elapsed, _ = run_round(job, args.shards, workers, started)
+            exactly_once, states, _, owners = check(db, job, started, args.shards)
+            single = single or elapsed
+            failed |= not exactly_once or states != {'done': args.shards}
+            print(f"{workers:>7} {elapsed:>8.2f} {args.shards / elapsed:>9.1f} {single / elapsed:>8.2f} "
+                  f"{owners:>7}  {exactly_once} {states}")
+
+        started = base + datetime.timedelta(hours=len(counts))
+        elapsed, exits = run_round(job, args.shards, 2, started, crash_on=2)
+        exactly_once, states, reclaimed, _ = check(db, job, started, args.shards)
+        failed |= not exactly_once or states != {'done': args.shards} or reclaimed != 1
+        print(f"crash: worker exits {exits}, {reclaimed} shard reclaimed after the "
+              f"{LEASE_TTL.total_seconds():.0f}s lease, {elapsed:.2f}s, exactly-once {exactly_once} {states}")
+
+        _metadata.drop_all(db.engine)
+        if failed:
+            raise SystemExit("Lease check failed")
+
+if __name__ == '__main__':
+    main()
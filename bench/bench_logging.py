@@ -0,0 +1,77 @@
+"""
+Microbenchmark logging calls per second with database logging
+
+Compares no database handler, the old synchronous one-commit-per-record
+handler and the queue-backed DatabaseLogHandler.
+
+Usage:
+    python -m bench.bench_logging --records 20000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+class SynchronousDatabaseLogHandler(logging.Handler):
+    """The previous DatabaseLogHandler: one session and commit per record"""
+
+    def __init__(self, session_maker):
+        super().__init__()
+        self.session_maker = session_maker
+
+    def emit(self, record):
+        from utils.models import Log
+
+        with self.session_maker() as session:
+            session.add(Log(
+                timestamp=datetime.fromtimestamp(record.created),
+                level=record.levelname,
+                name=record.name,
+                message=record.getMessage()
+            ))
+            session.commit()
+
+def run(label, handler, records):
+    logger = logging.getLogger(f"bench.{label}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if handler:
+        logger.addHandler(handler)
+
+    start = time.perf_counter()
+    for i in range(records):
+        logger.info(f"Updated COIN{i % 100} market_cap: {i} -> {i + 1}")
+    elapsed = time.perf_counter() - start
+
+    extra = ''
+    if hasattr(handler, 'stats'):
+        handler.flush()
+        extra = f" drained={time.perf_counter() - start:.2f}s {handler.stats()}"
+    print(f"{label:<12} calls={records:<8} elapsed={elapsed:.3f}s "
+          f"rate={records / elapsed:,.0f} calls/s{extra}")
+    if handler:
+        logger.removeHandler(handler)
+        handler.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Logging throughput benchmark')
+    parser.add_argument('--records', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.db_pool import DatabasePool
+        from utils.log_util import DatabaseLogHandler
+        import utils.models  # noqa: F401 - registers the logs table
+
+        db = DatabasePool()
+        db.create_all_tables()
+
+        run('none', None, args.records)
+        run('sync', SynchronousDatabaseLogHandler(db.get_session), min(args.records, 2000))
+        run('queued', DatabaseLogHandler(db.get_session), args.records)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Storage per market snapshot and 30-day history query latency
+
+Records --runs market updates for --storage-coins coins through
+record_market_snapshots (one batch per run, as the scheduler does) and
+reports bytes per snapshot. Then loads --days of bars for --coins coins
+and times market_history() over the whole window.
+
+Usage:
+    python -m bench.bench_market_history --coins 10000 --days 30
+    DB_URL=postgresql://... python -m bench.bench_market_history --resolutions 1d 1h 15m
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import text
+
+def table_bytes(conn, name):
+    if conn.dialect.name == 'postgresql':
+        # pg_partition_tree lists the partitions of a partitioned table
+        return conn.execute(text(
+            "SELECT greatest(pg_total_relation_size(:name), "
+            "(SELECT coalesce(sum(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(:name)))"
+        ), {'name': name}).scalar()
+    try:
+        return conn.execute(text(
+            "SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name = :name "
+            "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name)"
+        ), {'name': name}).scalar()
+    except Exception:
+        return None
+
+def seed_coins(db, count):
+    from utils.models import MigratedCoin
+
+    with db.engine.begin() as conn:
+        conn.execute(MigratedCoin.__table__.insert(), [
+            {'coin_name': f"Bench {i}", 'coin_symbol': f"B{i}", 'contract_address': f"bench-{i}",
+             'migration_date': datetime.datetime.utcnow()}
+            for i in range(count)
+        ])
+        return [row[0] for row in conn.execute(text("SELECT id FROM migrated_coins ORDER BY id"))]
+
+def storage(db, coin_ids, runs, now):
+    from utils.market_history import record_market_snapshots
+
+    rng = random.Random(1)
+    prices = {coin_id: rng.uniform(1e-6, 1e-3) for coin_id in coin_ids}
+    start = time.perf_counter()
+    for run in range(runs):
+        timestamp = now - datetime.timedelta(minutes=15 * (runs - run))
+        snapshots = []
+        for coin_id in coin_ids:
+            prices[coin_id] *= rng.uniform(0.95, 1.06)
+            snapshots.append({
+                'coin_id': coin_id, 'timestamp': timestamp, 'price': prices[coin_id],
+                'market_cap': prices[coin_id] * 1e9, 'volume': rng.uniform(0, 1e5),
+                'holders': rng.randint(10, 5000),
+            })
+        with db.get_session() as session:
+            record_market_snapshots(session, snapshots)
+            session.commit()
+    elapsed = time.perf_counter() - start
+    total = runs * len(coin_ids)
+
+    with db.engine.connect() as conn:
+        raw = table_bytes(conn, 'market_snapshots')
+        bars = table_bytes(conn, 'market_bars')
+    print(f"recorded {total:,} snapshots in {runs} batches: {elapsed:.1f}s ({total / elapsed:,.0f}/s)")
+    if raw is not None:
+        print(f"storage per snapshot: raw {raw / total:.0f} B, bars (all resolutions) {bars / total:.0f} B")
+    else:
+        print("storage per snapshot: unavailable (SQLite built without dbstat)")
+
+def load_bars(db, coin_ids, days, resolution, now, batch=50000):
+    from utils.market_history import RESOLUTIONS, floor_time
+    from utils.models import MarketBar
+
+    step = RESOLUTIONS[resolution]
+    first = floor_time(now - datetime.timedelta(days=days), resolution)
+    buckets = []
+    bucket = first
+    while bucket < now:
+        buckets.append(bucket)
+        bucket += step
+
+    rng = random.Random(2)
+    rows = []
+    with db.engine.begin() as conn:
+        for coin_id in coin_ids:
+            price = rng.uniform(1e-6, 1e-3)
+            for bucket in buckets:
+                price *= rng.uniform(0.95, 1.06)
+                rows.append({
+                    'resolution': resolution, 'coin_id': coin_id, 'bucket_start': bucket,
+                    'first_at': bucket, 'last_at': bucket, 'open': price, 'high': price * 1.02,
+                    'low': price * 0.98, 'close': price, 'market_cap': price * 1e9,
+                    'volume': 1000.0, 'holders': 100, 'samples': 1,
+                })
+                if len(rows) >= batch:
+                    conn.execute(MarketBar.__table__.insert(), rows)
+                    rows = []
+        if rows:
+            conn.execute(MarketBar.__table__.insert(), rows)
+        conn.execute(text("ANALYZE"))
+    return len(coin_ids) * len(buckets)
+
+def main():
+    parser = argparse.ArgumentParser(description='Market history benchmark')
+    parser.add_argument('--coins', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--resolutions', nargs='+', default=['1d', '1h'])
+    parser.add_argument('--storage-coins', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=96, help='Market updates to record (15 min apart)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.db_pool import DatabasePool
+        from utils.market_history import market_history
+        from utils.models import MarketBar, MarketSnapshot, MigratedCoin
+
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                # TRUNCATE so dead tuples do not inflate the size measurements
+                conn.execute(text("TRUNCATE market_bars, market_snapshots"))
+            for model in (MarketBar, MarketSnapshot, MigratedCoin):
+                conn.execute(model.__table__.delete())
+
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        coin_ids = seed_coins(db, max(args.coins, args.storage_coins))
+        storage(db, coin_ids[:args.storage_coins], args.runs, now)
+
+        with db.engine.begin() as conn:
+            conn.execute(MarketBar.__table__.delete())
+        start_at = now - datetime.timedelta(days=args.days)
+        print(f"{'resolution':<10} {'bars':>11} {'load s':>8} {'query s':>8} {'rows/s':>11} {'1 coin ms':>10}")
+        for resolution in args.resolutions:
+            start = time.perf_counter()
+            loaded = load_bars(db, coin_ids[:args.coins], args.days, resolution, now)
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            history = market_history(start=start_at, end=now, resolution=resolution)
+            query_time = time.perf_counter() - start
+            rows = len(history['coin_id'])
+
+            single = float('inf')
+            for coin_id in coin_ids[:5]:
+                start = time.perf_counter()
+                market_history([coin_id], start=start_at, end=now, resolution=resolution, as_frame=True)
+                single = min(single, time.perf_counter() - start)
+
+            print(f"{resolution:<10} {loaded:>11,} {load_time:>8.1f} {query_time:>8.2f} "
+                  f"{rows / query_time:>11,.0f} {single * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare time-range queries and retention on the indexed (and, on
+PostgreSQL, partitioned) tweets table against an unindexed heap copy
+
+Usage:
+    python -m bench.bench_partitions --rows 200000
+    DB_URL=postgresql://... python -m bench.bench_partitions --rows 1000000
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import text
+
+QUERIES = {
+    'coin last 24h': (
+        "SELECT count(*), avg(sentiment) FROM {table} "
+        "WHERE coin_id = :coin_id AND created_at >= :day_ago"
+    ),
+    'all coins last 7d': (
+        "SELECT coin_id, count(*) FROM {table} WHERE created_at >= :week_ago GROUP BY coin_id"
+    ),
+    'coin 1 month window': (
+        "SELECT id, sentiment FROM {table} "
+        "WHERE coin_id = :coin_id AND created_at >= :month_start AND created_at < :month_end"
+    ),
+}
+
+def tweet_rows(count, coin_ids, days, now):
+    rng = random.Random(42)
+    return [
+        {
+            'coin_id': rng.choice(coin_ids),
+            'tweet_id': f"{i}",
+            'content': f"tweet {i}",
+            'sentiment': rng.uniform(-1, 1),
+            'created_at': now - datetime.timedelta(seconds=rng.uniform(0, days * 86400)),
+        }
+        for i in range(count)
+    ]
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-range query benchmark')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--coins', type=int, default=200)
+    parser.add_argument('--days', type=int, default=360)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.db_pool import DatabasePool
+        from utils.models import MigratedCoin, Tweet, upsert_migrated_coins, upsert_tweets
+        from utils.partitions import PARTITIONED_TABLES, apply_retention, is_partitioned
+
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS tweets_heap"))
+            conn.execute(Tweet.__table__.delete())
+            conn.execute(MigratedCoin.__table__.delete())
+            partitioned = is_partitioned(conn, 'tweets')
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            upsert_migrated_coins([
+                {'coin_name': f"Bench {i}", 'coin_symbol': f"B{i}", 'contract_address': f"bench-{i}"}
+                for i in range(args.coins)
+            ])
+        with db.get_session() as session:
+            coin_ids = [row.id for row in session.query(MigratedCoin.id)]
+
+        now = datetime.datetime.utcnow()
+        start = time.perf_counter()
+        upsert_tweets(tweet_rows(args.rows, coin_ids, args.days, now), use_copy=partitioned)
+        print(f"loaded {args.rows:,} tweets over {args.days} days in {time.perf_counter() - start:.1f}s "
+              f"({db.engine.dialect.name}, partitioned={partitioned})")
+
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE tweets_heap AS SELECT * FROM tweets"))
+            conn.execute(text("ANALYZE"))
+
+        month_start = (now - datetime.timedelta(days=45)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        params = {
+            'coin_id': coin_ids[len(coin_ids) // 2],
+            'day_ago': now - datetime.timedelta(days=1),
+            'week_ago': now - datetime.timedelta(days=7),
+            'month_start': month_start,
+            'month_end': (month_start + datetime.timedelta(days=32)).replace(day=1),
+        }
+
+        print(f"{'query':<22} {'heap ms':>10} {'tweets ms':>10} {'speedup':>8}")
+        with db.engine.connect() as conn:
+            for label, sql in QUERIES.items():
+                times = [
+                    timed(lambda: conn.execute(text(sql.format(table=table)), params).fetchall(), args.repeat)
+                    for table in ('tweets_heap', 'tweets')
+                ]
+                print(f"{label:<22} {times[0] * 1000:>10.2f} {times[1] * 1000:>10.2f} "
+                      f"{times[0] / times[1]:>7.1f}x")
+
+        # Retention: expire the oldest month, as the daily maintenance job would
+        keep = args.days - 30
+        cutoff = now - datetime.timedelta(days=keep)
+        with db.engine.begin() as conn:
+            heap = timed(lambda: conn.execute(
+                text("DELETE FROM tweets_heap WHERE created_at < :cutoff"), {'cutoff': cutoff}
+            ), 1)
+        retention_days = PARTITIONED_TABLES['tweets']['retention_days']
+        PARTITIONED_TABLES['tweets']['retention_days'] = keep
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                managed = timed(lambda: apply_retention(db.engine, now=now), 1)
+        finally:
+            PARTITIONED_TABLES['tweets']['retention_days'] = retention_days
+        print(f"{'retention (1 month)':<22} {heap * 1000:>10.2f} {managed * 1000:>10.2f} "
+              f"{heap / managed:>7.1f}x")
+
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE tweets_heap"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the batch sentiment pipeline on a synthetic tweet corpus
+
+Usage:
+    python -m bench.bench_sentiment --tweets 20000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+WORDS = [
+    'moon', 'pump', 'dump', 'rug', 'scam', 'love', 'great', 'amazing', 'terrible',
+    'buy', 'sell', 'hold', 'hodl', 'bullish', 'bearish', 'dev', 'chart', 'lol',
+    'not', 'very', 'really', 'never', 'best', 'worst', 'happy', 'sad', 'wow',
+    'gem', 'fake', 'legit', 'send', 'it', 'to', 'the', 'going', 'up', 'down', '!!!'
+]
+
+def synthetic_texts(count, duplicate_rate=0.0, seed=42):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if texts and rng.random() < duplicate_rate:
+            texts.append(rng.choice(texts).upper())
+            continue
+        texts.append(
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 30)))
+            + f" ${rng.choice(['PEPE', 'WIF', 'BONK', 'MEW'])}"
+        )
+    return texts
+
+def setup_database(path, count, duplicate_rate):
+    os.environ['DB_URL'] = f"sqlite:///{path}"
+    from utils.db_pool import DatabasePool
+    from utils.models import MigratedCoin, Tweet
+
+    db = DatabasePool()
+    db.create_all_tables()
+    now = datetime.datetime.utcnow()
+    with db.engine.begin() as conn:
+        conn.execute(MigratedCoin.__table__.insert(), [
+            {'id': 1, 'coin_name': 'Bench', 'coin_symbol': 'BENCH'}
+        ])
+        conn.execute(Tweet.__table__.insert(), [
+            {'coin_id': 1, 'tweet_id': str(i), 'content': text, 'created_at': now}
+            for i, text in enumerate(synthetic_texts(count, duplicate_rate))
+        ])
+    return db
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentiment scoring benchmark')
+    parser.add_argument('--tweets', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='Fraction of tweets that repeat an earlier text')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = setup_database(os.path.join(tmp, 'bench.db'), args.tweets, args.duplicate_rate)
+        from utils.models import Tweet
+        from utils.sentiment_analyzer import analyze_sentiment, sentiment_cache
+
+        cpu_count = os.cpu_count() or 1
+        for workers in sorted({1, 2, 4, cpu_count}):
+            with db.engine.begin() as conn:
+                conn.execute(Tweet.__table__.update().values(sentiment=None))
+            sentiment_cache.clear()
+            start = time.perf_counter()
+            scored = analyze_sentiment(chunk_size=args.chunk_size, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:<3} tweets={scored:<8} "
+                  f"elapsed={elapsed:.2f}s rate={scored / elapsed:,.0f} tweets/s "
+                  f"cache_hit_ratio={sentiment_cache.stats()['hit_ratio']:.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Startup import time per CLI subcommand, checked against a budget
+
+Each scenario starts a fresh interpreter with -X importtime and imports
+what the subcommand loads before doing any work (for tasks, main.load_task).
+The import time reported is the cumulative time of the modules imported
+beyond a bare interpreter's, best of --repeat runs. Exits with status 1
+when a scenario exceeds its budget.
+
+Usage:
+    python -m bench.bench_startup
+    python -m bench.bench_startup --repeat 10 --budget "task sentiment=400"
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# What each subcommand imports before it starts working
+SCENARIOS = {
+    '--help': ['main.py', '--help'],
+    'task fetch': ['-c', "import main; main.load_task('fetch')"],
+    'task market': ['-c', "import main; main.load_task('market')"],
+    'task sentiment': ['-c', "import main; main.load_task('sentiment')"],
+    'scheduler': ['-c', "import main; import utils.scheduler"],
+    'init': ['-c', "import main; import utils.db_pool, utils.models, utils.partitions"],
+    'pool-stats': ['-c', "import main; import utils.db_pool"],
+    'rebuild-rollups': ['-c', "import main; import utils.db_pool, utils.rollups"],
+    'maintain-partitions': ['-c', "import main; import utils.partitions"],
+    'shard-status': ['-c', "import main; import utils.leases"],
+}
+
+# Import time budgets in milliseconds (about 1.5x the times measured when
+# the lazy imports were introduced)
+BUDGETS = {
+    '--help': 30,
+    'task fetch': 600,
+    'task market': 600,
+    'task sentiment': 450,
+    'scheduler': 700,
+    'init': 400,
+    'pool-stats': 350,
+    'rebuild-rollups': 400,
+    'maintain-partitions': 300,
+    'shard-status': 375,
+}
+
+def import_times(args):
+    """Run an interpreter with -X importtime; returns ({module: cumulative us}, wall s)"""
+    env = dict(os.environ, DB_URL=os.environ.get('DB_URL', 'sqlite://'))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that imported them
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, wall
+
+def slowest(modules, count=3):
+    ranked = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:count]
+    return ', '.join(f"{name} {us / 1000:.0f}" for name, us in ranked)
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', action='append', default=[],
+                        help='Override a budget, e.g. "task sentiment=400" (ms)')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for override in args.budget:
+        name, value = override.rsplit('=', 1)
+        budgets[name.strip()] = float(value)
+
+    # Modules a bare interpreter imports (site, encodings, ...) are not counted
+    bare = set(import_times(['-c', 'pass'])[0])
+
+    failed = []
+    print(f"{'subcommand':<20} {'import ms':>10} {'budget':>8} {'wall ms':>8}  slowest imports (ms)")
+    for name, scenario in SCENARIOS.items():
+        best_import, best_wall, modules = float('inf'), float('inf'), {}
+        for _ in range(args.repeat):
+            times, wall = import_times(scenario)
+            times = {module: us for module, us in times.items() if module not in bare}
+            total = sum(times.values()) / 1000
+            if total < best_import:
+                best_import, modules = total, times
+            best_wall = min(best_wall, wall)
+        budget = budgets.get(name)
+        over = budget is not None and best_import > budget
+        if over:
+            failed.append(name)
+        print(f"{name:<20} {best_import:>10.1f} {budget if budget is not None else '-':>8} "
+              f"{best_wall * 1000:>8.0f}  {slowest(modules)}{'  OVER BUDGET' if over else ''}")
+
+    if failed:
+        print(f"Startup regression: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Streaming ingestion throughput, latency, backpressure and resume
+
+Seeds --coins synthetic coins, then runs StreamIngestor against the stub
+feed server (bench/stub_feed.py), emptying the streamed rows between runs:
+
+- WebSocket and SSE as fast as the pipeline takes events: sustained
+  events/s and end-to-end latency (feed send -> database commit)
+- WebSocket paced at --rate events/s: latency when the pipeline keeps up
+- a database slowed by --slow-write-ms per batch with small queues: the
+  queues stay bounded and the feed is pushed back instead
+- a feed that drops the connection every --close-every events, and an
+  ingestor stopped halfway and restarted from its checkpoint: every event
+  must end up persisted exactly once
+
+Exits with status 1 if a run loses or duplicates rows.
+
+Usage:
+    python -m bench.bench_stream --events 20000
+    DB_URL=postgresql://... python -m bench.bench_stream
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+from bench import synthetic
+from bench.stub_feed import StubFeedServer
+
+# Contract address prefix of the coins migrated by the stub feed
+FEED_PREFIX = 'Feed'
+
+def reset(db):
+    from utils.attribution import attribution_index
+    from utils.models import Alert, CoinAlertState, MigratedCoin, RowHash, Tweet, Watermark
+
+    with db.engine.begin() as conn:
+        for model in (Tweet, Alert, CoinAlertState, RowHash, Watermark):
+            conn.execute(model.__table__.delete())
+        conn.execute(MigratedCoin.__table__.delete().where(MigratedCoin.contract_address.startswith(FEED_PREFIX)))
+    attribution_index.load()
+
+def counts(db):
+    from utils.models import MigratedCoin, Tweet
+
+    with db.get_session() as session:
+        return (
+            session.query(MigratedCoin).filter(MigratedCoin.contract_address.startswith(FEED_PREFIX)).count(),
+            session.query(Tweet).count(),
+        )
+
+def ingest(url, max_events, slow_write=0.0, **options):
+    from utils.streaming import StreamIngestor
+
+    class SlowIngestor(StreamIngestor):
+        def _write(self, batch):
+            time.sleep(slow_write)
+            super()._write(batch)
+
+    ingestor = (SlowIngestor if slow_write else StreamIngestor)(url, **options)
+    return asyncio.run(ingestor.run(max_events=max_events))
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming ingestion benchmark')
+    parser.add_argument('--coins', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=1000, help='Events/s of the paced run')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--slow-write-ms', type=float, default=200)
+    parser.add_argument('--close-every', type=int, default=3000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('STREAM_RECONNECT_DELAY', '0.05')
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        import logging
+        from utils import async_fetcher
+        from utils.db_pool import DatabasePool
+        from utils.models import MigratedCoin
+
+        logging.disable(logging.WARNING)
+        db = DatabasePool()
+        db.create_all_tables()
+        coins = synthetic.coins(args.coins, datetime.datetime.utcnow())
+        with db.engine.begin() as conn:
+            conn.execute(MigratedCoin.__table__.delete())
+            # Without ids, so the id sequence stays ahead of the seeded rows
+            conn.execute(MigratedCoin.__table__.insert(), [
+                {key: value for key, value in coin.items() if key != 'id'} for coin in coins
+            ])
+        symbols = [coin['coin_symbol'] for coin in coins]
+
+        runs = [
+            ('websocket', {}, {}),
+            ('sse', {}, {}),
+            (f"websocket @ {args.rate:,.0f}/s", {'rate': args.rate}, {}),
+            (f"slow db +{args.slow_write_ms:.0f}ms/batch", {},
+             {'slow_write': args.slow_write_ms / 1000, 'queue_size': 200, 'batch_size': 100}),
+            (f"drop every {args.close_every:,}", {'close_every': args.close_every}, {}),
+            ('restart from checkpoint', {}, {}),
+        ]
+        print(f"{db.engine.dialect.name}: {args.events:,} events, {args.coins:,} coins seeded")
+        print(f"{'run':<26} {'events/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batches':>8} "
+              f"{'max q':>6} {'push back s':>11} {'feed wait s':>11} {'conns':>6} {'rows':>5}")
+        failures = []
+        for label, feed_options, options in runs:
+            feed = StubFeedServer(args.events, symbols, **feed_options).start()
+            async_fetcher.APIS['rugcheck']['base_url'] = feed.url
+            async_fetcher.APIS['rugcheck']['rate'] = 0
+            reset(db)
+            url = feed.url.replace('http://', 'ws://') + '/ws' if label != 'sse' else feed.url + '/sse'
+            options.setdefault('batch_size', args.batch_size)
+            try:
+                if label == 'restart from checkpoint':
+                    first = ingest(url, args.events // 2, **options)
+                    report = ingest(url, args.events - first['checkpoint'], **options)
+                    report['received'] += first['received']
+                else:
+                    report = ingest(url, args.events, **options)
+            finally:
+                feed.stop()
+            migrations, tweets = counts(db)
+            exact = (migrations, tweets) == (feed.count('migration'), feed.count('tweet')) \
+                and report['checkpoint'] == args.events
+            if not exact:
+                failures.append(f"{label}: {migrations} migrations and {tweets} tweets stored, expected "
+                                f"{feed.count('migration')} and {feed.count('tweet')} "
+                                f"(checkpoint {report['checkpoint']})")
+            print(f"{label:<26} {report['events_per_s']:>9,.0f} {report['latency_p50_s'] * 1000:>8.0f} "
+                  f"{report['latency_p95_s'] * 1000:>8.0f} {report['latency_p99_s'] * 1000:>8.0f} "
+                  f"{report['batches']:>8,} {report['max_queued']:>6,} {report['backpressure_s']:>11.2f} "
+                  f"{feed.blocked_s:>11.2f} {feed.connections:>6} {'ok' if exact else 'LOST':>5}")
+
+        if failures:
+            raise SystemExit('\n'.join(failures))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare peak RSS and rows/s of streaming reads against Query.all()
+
+Builds a SQLite tweets fixture (1M rows by default) and reads it back in a
+fresh subprocess per mode so each peak RSS figure stands alone.
+
+Usage:
+    python -m bench.bench_streaming --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('all', 'tuples', 'columnar')
+
+def build_fixture(path, rows, batch=50000):
+    os.environ['DB_URL'] = f"sqlite:///{path}"
+    from utils.db_pool import DatabasePool
+    from utils.models import MigratedCoin, Tweet
+
+    db = DatabasePool()
+    db.create_all_tables()
+    start = datetime.datetime(2026, 1, 1)
+    with db.engine.begin() as conn:
+        conn.execute(MigratedCoin.__table__.insert(), [
+            {'id': i, 'coin_name': f"Coin {i}", 'coin_symbol': f"C{i}"} for i in range(1, 101)
+        ])
+        for offset in range(0, rows, batch):
+            conn.execute(Tweet.__table__.insert(), [
+                {
+                    'coin_id': i % 100 + 1,
+                    'tweet_id': str(i),
+                    'content': f"tweet number {i} about coin {i % 100} going to the moon",
+                    'sentiment': (i % 200) / 100 - 1,
+                    'created_at': start + datetime.timedelta(seconds=i),
+                    'likes': i % 500,
+                    'retweets': i % 50,
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ])
+
+def read(mode):
+    """Read every tweet's coin_id, sentiment and created_at in the given mode"""
+    from utils.db_pool import DatabasePool
+    from utils.models import Tweet, stream_tweets
+
+    count = 0
+    start = time.perf_counter()
+    if mode == 'all':
+        with DatabasePool().get_session() as session:
+            count = len(session.query(Tweet).all())
+    else:
+        for chunk in stream_tweets(Tweet.coin_id, Tweet.sentiment, Tweet.created_at,
+                                   columnar=(mode == 'columnar')):
+            count += len(chunk['coin_id']) if mode == 'columnar' else len(chunk)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<9} rows={count:<9} elapsed={elapsed:.2f}s rate={count / elapsed:,.0f} rows/s "
+          f"peak_rss={peak_mb:,.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming query benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        read(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_fixture(path, args.rows)
+        env = dict(os.environ, DB_URL=f"sqlite:///{path}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'bench.bench_streaming', '--child', mode],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            print(output.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    main()
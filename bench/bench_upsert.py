@@ -0,0 +1,84 @@
+"""
+Compare the bulk upsert path with per-object ORM writes
+
+Usage:
+    python -m bench.bench_upsert --rows 20000
+    DB_URL=postgresql://... python -m bench.bench_upsert --rows 50000 --copy
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import tempfile
+import time
+
+def tweet_rows(count, coin_id, offset=0, suffix=''):
+    now = datetime.datetime.utcnow()
+    return [
+        {
+            'coin_id': coin_id,
+            'tweet_id': f"{i}",
+            'content': f"tweet {i} to the moon{suffix}",
+            'created_at': now,
+            'likes': i % 50,
+            'retweets': i % 7,
+        }
+        for i in range(offset, offset + count)
+    ]
+
+def per_object(session_factory, Tweet, rows):
+    """Current path: one ORM object and INFO log line per row"""
+    with session_factory() as session:
+        existing = {tweet.tweet_id: tweet for tweet in session.query(Tweet)}
+        for row in rows:
+            tweet = existing.get(row['tweet_id'])
+            if tweet:
+                tweet.update(**row)
+            else:
+                session.add(Tweet(**row))
+        session.commit()
+
+def timed(label, rows, func):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} rows={len(rows):<8} elapsed={elapsed:.2f}s rate={len(rows) / elapsed:,.0f} rows/s"
+          + (f" {result}" if result else ''))
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk upsert benchmark')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--copy', action='store_true', help='Use COPY staging on PostgreSQL')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('DB_URL', f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        from utils.db_pool import DatabasePool
+        from utils.models import MigratedCoin, Tweet, upsert_migrated_coins, upsert_tweets
+
+        db = DatabasePool()
+        db.create_all_tables()
+        with db.engine.begin() as conn:
+            conn.execute(Tweet.__table__.delete())
+            conn.execute(MigratedCoin.__table__.delete())
+        upsert_migrated_coins([
+            {'coin_name': 'Bench', 'coin_symbol': 'BENCH', 'contract_address': 'bench-ca'}
+        ])
+        with db.get_session() as session:
+            coin_id = session.query(MigratedCoin.id).filter_by(contract_address='bench-ca').scalar()
+
+        half = args.rows // 2
+        inserts = tweet_rows(args.rows, coin_id)
+        mixed = tweet_rows(args.rows, coin_id, offset=half, suffix=' again')
+
+        timed('per-object insert', inserts, lambda: per_object(db.get_session, Tweet, inserts))
+        timed('per-object upsert (50% new)', mixed, lambda: per_object(db.get_session, Tweet, mixed))
+
+        with db.engine.begin() as conn:
+            conn.execute(Tweet.__table__.delete())
+        timed('bulk insert', inserts, lambda: upsert_tweets(inserts, use_copy=args.copy))
+        timed('bulk upsert (50% new)', mixed, lambda: upsert_tweets(mixed, use_copy=args.copy))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+FastVader parity with stock VADER and per-core speedup
+
+Builds a corpus of the synthetic tweets plus generated sentences that
+exercise every VADER rule (boosters and dampeners in and out of caps,
+negations up to three words back, 'no', 'never so', 'without doubt',
+'least', 'kind of', idioms, 'but', emoji, emoticons, punctuation emphasis),
+scores it with SentimentIntensityAnalyzer.polarity_scores and with
+FastVader.score_many without an overlay, and exits with status 1 if any
+compound score differs. Then times both on one core, with and without the
+crypto slang overlay.
+
+Usage:
+    python -m bench.bench_vader --texts 200000
+"""
+import argparse
+import datetime
+import random
+import time
+from bench import synthetic
+
+RULE_WORDS = [
+    'no', 'not', "isn't", "don't", 'never', 'without', 'doubt', 'so', 'this', 'least', 'at', 'very',
+    'kind', 'of', 'sort', 'just', 'enough', 'but', 'BUT', 'or', 'nor', 'the', 'shit', 'bomb', 'bad', 'ass',
+    'yeah', 'right', 'kiss', 'death', 'to', 'die', 'for', 'beating', 'heart', 'bus', 'stop',
+    'extremely', 'EXTREMELY', 'barely', 'kinda', 'sorta', 'hardly', 'really', 'REALLY',
+    ':)', ':(', ':D', '<3', ':-)', '!', '?', '!!', '???', '...', 'rug', 'moon', 'wagmi', 'ngmi',
+]
+
+def rule_sentences(count, seed):
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    stock = SentimentIntensityAnalyzer()
+    rng = random.Random(seed)
+    lexicon = sorted(stock.lexicon)
+    emoji = sorted(char for char in stock.emojis if len(char) == 1)
+    plain = ['coin', 'chart', 'dev', 'today', 'team', 'price', 'it', 'is', 'was', 'we', 'are']
+    sentences = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(1, 25)):
+            pick = rng.random()
+            if pick < 0.35:
+                word = rng.choice(lexicon)
+            elif pick < 0.7:
+                word = rng.choice(RULE_WORDS)
+            elif pick < 0.8:
+                word = rng.choice(emoji)
+                if words and rng.random() < 0.5:
+                    words[-1] += word
+                    continue
+            else:
+                word = rng.choice(plain)
+            shape = rng.random()
+            if shape < 0.1:
+                word = word.upper()
+            elif shape < 0.15:
+                word = word.title()
+            elif shape < 0.2:
+                word += rng.choice(['!', '!!', '?', ',', '.', '...', '!?'])
+            elif shape < 0.23:
+                word = f"({word})"
+            words.append(word)
+        sentences.append(rng.choice([' ', ' ', '  ', ' \n ']).join(words))
+    sentences += ['', '   ', '!!!', 'BUT but', 'no no no', 'kind of', '😁😁 great', 'great😁', '💘']
+    return sentences
+
+def corpus(count, seed=11):
+    now = datetime.datetime(2024, 1, 1)
+    coins = synthetic.coins(200, now, seed)
+    tweets = [row['content'] for row in synthetic.tweets(count // 2, coins, now, seed=seed)]
+    return tweets + rule_sentences(count - len(tweets), seed)
+
+def rate(func, texts, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+def main():
+    parser = argparse.ArgumentParser(description='FastVader parity and speed benchmark')
+    parser.add_argument('--texts', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    from utils.fast_vader import CRYPTO_SLANG, FastVader
+
+    texts = corpus(args.texts)
+    stock = SentimentIntensityAnalyzer()
+    fast = FastVader()
+    expected = [stock.polarity_scores(text)['compound'] for text in texts]
+    actual = fast.score_many(texts)
+    mismatches = [(text, want, got) for text, want, got in zip(texts, expected, actual) if want != got]
+    print(f"parity: {len(texts) - len(mismatches):,}/{len(texts):,} compound scores identical")
+    for text, want, got in mismatches[:10]:
+        print(f"  {want:+.4f} != {got:+.4f}  {text!r}")
+
+    stock_rate = rate(lambda batch: [stock.polarity_scores(text)['compound'] for text in batch], texts, args.repeat)
+    print(f"{'scorer':<28} {'texts/s':>10} {'speedup':>8}")
+    print(f"{'stock polarity_scores':<28} {stock_rate:>10,.0f} {1:>7.1f}x")
+    for label, scorer in (('FastVader', FastVader()), ('FastVader + crypto slang', FastVader(CRYPTO_SLANG))):
+        cold = time.perf_counter()
+        scorer.score_many(texts)
+        cold = len(texts) / (time.perf_counter() - cold)
+        warm = rate(scorer.score_many, texts, args.repeat)
+        print(f"{label + ' (cold)':<28} {cold:>10,.0f} {cold / stock_rate:>7.1f}x")
+        print(f"{label:<28} {warm:>10,.0f} {warm / stock_rate:>7.1f}x")
+
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} compound scores differ from stock VADER")
+
+if __name__ == '__main__':
+    main()
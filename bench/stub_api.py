@@ -0,0 +1,123 @@
+"""
+Local stub of the PumpFun and RugCheck APIs for benchmarks
+
+Runs an aiohttp server on a background thread with configurable latency
+and a configurable fraction of transient 503 responses. The migrations
+feed is served oldest first, or newest first like a live feed that new
+migrations are prepended to.
+"""
+import asyncio
+import random
+import threading
+import time
+from aiohttp import web
+
+def _mint(i):
+    return f"Mint{i:040d}"
+
+class StubApiServer:
+    """
+    Args:
+        coins (int): Migrated coins in the feed
+        latency (float): Seconds before each response
+        error_rate (float): Fraction of 503 responses
+        newest_first (bool): Serve the migrations feed newest first
+        drift (bool): Market caps move with the clock (False: fixed, so
+            refetches return unchanged data)
+
+    Attributes:
+        scripted (list): Statuses (or (status, Retry-After) pairs) answered,
+            in order, to the next requests before any normal response
+        request_times (list): time.monotonic() of every request received
+    """
+
+    def __init__(self, coins=1000, latency=0.02, error_rate=0.0, seed=7, newest_first=False, drift=True):
+        self.coins = coins
+        self.newest_first = newest_first
+        self.drift = drift
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.scripted = []
+        self.request_times = []
+        self._rng = random.Random(seed)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.url = None
+
+    async def _respond(self, payload):
+        self.requests += 1
+        self.request_times.append(time.monotonic())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.scripted:
+            status, retry_after = (self.scripted.pop(0), None) if isinstance(self.scripted[0], int) \
+                else self.scripted.pop(0)
+            return web.Response(status=status, headers={'Retry-After': retry_after} if retry_after else None)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return web.Response(status=503)
+        return web.json_response(payload)
+
+    def _coin(self, i):
+        return {
+            'mint': _mint(i),
+            'name': f"Coin {i}",
+            'symbol': f"C{i}",
+            'creator': f"dev{i % 97}",
+            'twitter': f"coin{i}",
+            'usd_market_cap': 50000.0 + i + (time.time() % 1000 if self.drift else 0),
+            'volume': 1000.0 + i,
+            'total_supply': 1000000000000000,
+            'holder_count': 100 + i % 500,
+            'complete_timestamp': 1700000000000 + i * 1000,
+        }
+
+    async def migrated(self, request):
+        limit = int(request.query.get('limit', 50))
+        offset = int(request.query.get('offset', 0))
+        positions = range(offset, min(offset + limit, self.coins))
+        if self.newest_first:
+            return await self._respond([self._coin(self.coins - 1 - p) for p in positions])
+        return await self._respond([self._coin(p) for p in positions])
+
+    async def coin(self, request):
+        return await self._respond(self._coin(int(request.match_info['mint'][4:])))
+
+    async def report(self, request):
+        return await self._respond({'score': 100, 'risks': [{'level': 'warn'}]})
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/coins/migrated', self.migrated)
+        app.router.add_get('/coins/{mint}', self.coin)
+        app.router.add_get('/tokens/{mint}/report/summary', self.report)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def mints(self):
+        return [(i + 1, _mint(i)) for i in range(self.coins)]
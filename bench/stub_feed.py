@@ -0,0 +1,154 @@
+"""
+Local stub of a push feed (WebSocket and server-sent events) for benchmarks
+
+Serves a fixed sequence of migration and tweet events, numbered from 1, at
+/ws and /sse, resuming after the since query parameter (WebSocket) or the
+Last-Event-ID header (SSE). Events are sent as fast as the client reads
+them or at a fixed rate, and connections can be dropped every N events to
+exercise reconnects. RugCheck reports are served too, so enrichment can be
+pointed at the same server. Runs an aiohttp server on a background thread
+like bench.stub_api.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from aiohttp import web
+
+_WORDS = ['gm', 'send', 'it', 'chart', 'looks', 'ready', 'dev', 'based', 'buy', 'the', 'dip', 'moon', 'soon']
+
+class StubFeedServer:
+    """
+    Args:
+        events (int): Events in the feed
+        symbols (list): Coin symbols the tweets mention (by cashtag)
+        migration_share (float): Fraction of events that are migrations
+        rate (float): Events/second per connection (0: as fast as read)
+        close_every (int): Drop each connection after this many events (0: never)
+    """
+
+    def __init__(self, events=10000, symbols=('PEPE',), migration_share=0.1, rate=0, close_every=0, seed=7):
+        self.rate = rate
+        self.close_every = close_every
+        self.sent = 0
+        self.connections = 0
+        # Time spent waiting for the client to read (its backpressure)
+        self.blocked_s = 0.0
+        rng = random.Random(seed)
+        now = time.time()
+        self.events = []
+        for i in range(1, events + 1):
+            if rng.random() < migration_share:
+                self.events.append({'id': i, 'type': 'migration', 'data': {
+                    'mint': f"Feed{i:040d}",
+                    'name': f"Feed Coin {i}",
+                    'symbol': f"FEED{i}",
+                    'creator': f"dev{i % 97}",
+                    'twitter': f"feed{i}",
+                    'usd_market_cap': round(rng.lognormvariate(11, 1.5), 2),
+                    'volume': round(rng.lognormvariate(9, 2), 2),
+                    'complete_timestamp': int((now - events + i) * 1000),
+                }})
+            else:
+                words = [rng.choice(_WORDS) for _ in range(rng.randint(4, 16))]
+                words.insert(rng.randrange(len(words) + 1), f"${rng.choice(symbols)}")
+                self.events.append({'id': i, 'type': 'tweet', 'data': {
+                    'tweet_id': str(1900000000000000000 + i),
+                    'content': ' '.join(words),
+                    'created_at': now - events + i,
+                    'likes': int(rng.paretovariate(1.2)),
+                    'retweets': int(rng.paretovariate(1.5)),
+                }})
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.url = None
+
+    def count(self, kind):
+        return sum(1 for event in self.events if event['type'] == kind)
+
+    async def _send(self, start, send):
+        """Send events after start, paced by rate; returns False when the connection was dropped"""
+        began = time.monotonic()
+        sent = 0
+        for event in self.events[start:]:
+            if self.close_every and sent >= self.close_every:
+                return False
+            if self.rate:
+                delay = began + sent / self.rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            payload = json.dumps(dict(event, ts=time.time()))
+            before = time.monotonic()
+            await send(event['id'], payload)
+            self.blocked_s += time.monotonic() - before
+            sent += 1
+            self.sent += 1
+        return True
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.connections += 1
+
+        async def send(_, payload):
+            await ws.send_str(payload)
+
+        if await self._send(int(request.query.get('since', 0)), send):
+            async for _ in ws:
+                pass
+        await ws.close()
+        return ws
+
+    async def sse(self, request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        self.connections += 1
+
+        async def send(event_id, payload):
+            await response.write(f"id: {event_id}\ndata: {payload}\n\n".encode('utf-8'))
+
+        try:
+            if await self._send(int(request.headers.get('Last-Event-ID', 0)), send):
+                while True:
+                    await asyncio.sleep(1)
+                    await response.write(b": ping\n\n")
+        except ConnectionError:
+            pass
+        return response
+
+    async def report(self, request):
+        return web.json_response({'score': 100, 'risks': [{'level': 'warn'}]})
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/ws', self.websocket)
+        app.router.add_get('/sse', self.sse)
+        app.router.add_get('/tokens/{mint}/report/summary', self.report)
+        self._runner = web.AppRunner(app, access_log=None, shutdown_timeout=1)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -0,0 +1,435 @@
+"""
+End-to-end benchmark suite behind `python main.py bench`
+
+Runs the ingestion, scoring, dashboard and logging scenarios against one
+database on deterministic synthetic data (bench/synthetic.py), and returns
+the results as a JSON document that can be compared with the result of
+another commit:
+
+    {"commit": ..., "dialect": "sqlite", "scale": "10k", ...,
+     "results": {"ingest.migrations": {"coins_per_s": {"value": 812.4,
+                 "unit": "coins/s", "better": "higher"}, ...}, ...}}
+
+Metrics marked 'higher' or 'lower' are checked by compare(); the others
+(e.g. cache hit ratios) are informational. The suite empties every table of
+the database it runs on, so point it at a scratch database.
+
+The focused scripts in bench/ (bench_upsert, bench_partitions, ...) remain
+for investigating one component; this suite is the one to run per commit.
+"""
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from bench import synthetic
+
+for _api in ('PUMPFUN', 'RUGCHECK', 'TWEETSCOUT'):
+    os.environ.setdefault(f"{_api}_RATE_LIMIT", '100000')
+
+SCENARIOS = {}
+
+# Rows per insert when seeding fixtures outside the timed sections
+_SEED_BATCH = 10000
+
+def scenario(name, description):
+    """Register a Suite method as a scenario"""
+    def decorator(func):
+        SCENARIOS[name] = (func, description)
+        return func
+    return decorator
+
+def metric(value, unit, better=None):
+    return {'value': round(value, 4), 'unit': unit, 'better': better}
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+def _slug(text):
+    return '_'.join(text.lower().split())
+
+class Suite:
+    """
+    Fixtures and scenarios for one database and scale
+
+    Scenarios share the database in registration order: the ingestion
+    scenarios load the coins and tweets that scoring and the dashboard then
+    read. A scenario run on its own seeds what it needs from the generator
+    first, outside its timed section.
+
+    Args:
+        scale (str): Key of synthetic.SCALES
+        seed (int): Generator seed
+        workers (int): Sentiment scoring processes
+        repeat (int): Timed repetitions of each dashboard query (median reported)
+    """
+
+    def __init__(self, scale='10k', seed=42, workers=1, repeat=20):
+        from utils.db_pool import DatabasePool
+
+        self.scale = scale
+        self.sizes = synthetic.scale_sizes(scale)
+        self.seed = seed
+        self.workers = workers
+        self.repeat = repeat
+        self.now = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        self.db = DatabasePool()
+        self.db.create_all_tables()
+        self.server = None
+
+    @property
+    def dialect(self):
+        return self.db.engine.dialect.name
+
+    def run(self, names=None):
+        """Run scenarios (all by default) on an emptied database"""
+        names = names or list(SCENARIOS)
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self.reset()
+        results = {}
+        previous = logging.root.manager.disable
+        logging.disable(logging.INFO)
+        try:
+            for name in SCENARIOS:
+                if name in names:
+                    func, _ = SCENARIOS[name]
+                    results[name] = func(self)
+        finally:
+            logging.disable(previous)
+            if self.server:
+                self.server.stop()
+                self.server = None
+        return results
+
+    def reset(self):
+        """Empty every application table"""
+        from sqlalchemy import text
+        from utils.models import Base
+
+        tables = [table.name for table in reversed(Base.metadata.sorted_tables)]
+        with self.db.engine.begin() as conn:
+            if self.dialect == 'postgresql':
+                conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+            else:
+                for table in tables:
+                    conn.execute(text(f"DELETE FROM {table}"))
+        from utils.query_cache import query_cache
+        from utils.sentiment_cache import sentiment_cache
+
+        query_cache.invalidate()
+        sentiment_cache.clear()
+
+    def api(self):
+        """Stub PumpFun/RugCheck/TweetScout server serving sizes['coins'] migrations"""
+        if self.server is None:
+            from bench.stub_api import StubApiServer
+            from utils import async_fetcher
+
+            self.server = StubApiServer(coins=self.sizes['coins'], latency=0, seed=self.seed).start()
+            for api in async_fetcher.APIS.values():
+                api['base_url'] = self.server.url
+        return self.server
+
+    def _count(self, model):
+        with self.db.get_session() as session:
+            return session.query(model).count()
+
+    def _insert(self, model, rows):
+        with self.db.engine.begin() as conn:
+            for i in range(0, len(rows), _SEED_BATCH):
+                conn.execute(model.__table__.insert(), rows[i:i + _SEED_BATCH])
+
+    def coin_rows(self):
+        """Coins in the database, seeding synthetic ones if there are none"""
+        from utils.models import MigratedCoin
+
+        if not self._count(MigratedCoin):
+            self._insert(MigratedCoin, synthetic.coins(self.sizes['coins'], self.now, self.seed))
+        with self.db.get_session() as session:
+            return [
+                {'id': coin_id, 'coin_symbol': symbol}
+                for coin_id, symbol in session.query(MigratedCoin.id, MigratedCoin.coin_symbol).order_by(MigratedCoin.id)
+            ]
+
+    def tweet_rows(self):
+        return synthetic.tweets(self.sizes['tweets'], self.coin_rows(), self.now, seed=self.seed + 1)
+
+    def ensure_tweets(self):
+        from utils.models import Tweet
+
+        if not self._count(Tweet):
+            self._insert(Tweet, self.tweet_rows())
+
+    def ensure_scored(self):
+        from utils.models import Tweet
+        from utils.sentiment_analyzer import analyze_sentiment
+
+        self.ensure_tweets()
+        with self.db.get_session() as session:
+            unscored = session.query(Tweet).filter(Tweet.sentiment.is_(None)).count()
+        if unscored:
+            analyze_sentiment(workers=self.workers)
+
+    @scenario('ingest.migrations', 'fetch_migrated_coins from the stub API, then a replay')
+    def ingest_migrations(self):
+        from utils.data_fetcher import fetch_migrated_coins
+
+        server = self.api()
+        requests = server.requests
+        start = time.perf_counter()
+        stats = fetch_migrated_coins()
+        elapsed = time.perf_counter() - start
+        initial_requests = server.requests - requests
+
+        requests = server.requests
+        start = time.perf_counter()
+        fetch_migrated_coins()
+        replay = time.perf_counter() - start
+        return {
+            'coins': metric(stats['changed'], 'coins'),
+            'seconds': metric(elapsed, 's', 'lower'),
+            'coins_per_s': metric(_rate(stats['changed'], elapsed), 'coins/s', 'higher'),
+            'requests': metric(initial_requests, 'requests', 'lower'),
+            'replay_ms': metric(replay * 1000, 'ms', 'lower'),
+            'replay_requests': metric(server.requests - requests, 'requests', 'lower'),
+        }
+
+    @scenario('ingest.market', 'update_market_data for every migrated coin')
+    def ingest_market(self):
+        from utils.data_fetcher import fetch_migrated_coins, update_market_data, watermarks
+        from utils.models import MigratedCoin
+
+        self.api()
+        if not self._count(MigratedCoin):
+            fetch_migrated_coins()
+        start = time.perf_counter()
+        update_market_data()
+        elapsed = time.perf_counter() - start
+        fetched = watermarks.stats()['market']['last']['fetched']
+        return {
+            'coins': metric(fetched, 'coins'),
+            'seconds': metric(elapsed, 's', 'lower'),
+            'coins_per_s': metric(_rate(fetched, elapsed), 'coins/s', 'higher'),
+        }
+
+    @scenario('ingest.tweets', 'ingest_tweets of the synthetic corpus, then a replay')
+    def ingest_tweets(self):
+        from utils.data_fetcher import ingest_tweets
+
+        rows = self.tweet_rows()
+        start = time.perf_counter()
+        ingest_tweets(rows)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        ingest_tweets(rows)
+        replay = time.perf_counter() - start
+        return {
+            'tweets': metric(len(rows), 'tweets'),
+            'tweets_per_s': metric(_rate(len(rows), elapsed), 'tweets/s', 'higher'),
+            'replay_tweets_per_s': metric(_rate(len(rows), replay), 'tweets/s', 'higher'),
+        }
+
+    @scenario('ingest.ticks', 'record_market_snapshots of synthetic ticks, one commit per round')
+    def ingest_ticks(self):
+        from utils.market_history import record_market_snapshots
+
+        coin_ids = [coin['id'] for coin in self.coin_rows()]
+        batches = list(synthetic.market_ticks(self.sizes['ticks'], coin_ids, self.now, seed=self.seed + 2))
+        written = 0
+        start = time.perf_counter()
+        with self.db.get_session() as session:
+            for batch in batches:
+                written += record_market_snapshots(session, batch)
+                session.commit()
+        elapsed = time.perf_counter() - start
+        return {
+            'ticks': metric(written, 'rows'),
+            'ticks_per_s': metric(_rate(written, elapsed), 'rows/s', 'higher'),
+        }
+
+    @scenario('scoring.sentiment', 'analyze_sentiment over every tweet, starting from a cold cache')
+    def scoring_sentiment(self):
+        from utils.models import Alert, CoinAlertState, SentimentCacheEntry, SentimentRollup, Tweet
+        from utils.sentiment_analyzer import analyze_sentiment, sentiment_cache
+
+        self.ensure_tweets()
+        with self.db.engine.begin() as conn:
+            conn.execute(Tweet.__table__.update().values(sentiment=None))
+            for model in (Alert, CoinAlertState, SentimentRollup, SentimentCacheEntry):
+                conn.execute(model.__table__.delete())
+        sentiment_cache.clear()
+        start = time.perf_counter()
+        scored = analyze_sentiment(workers=self.workers)
+        elapsed = time.perf_counter() - start
+        return {
+            'tweets': metric(scored, 'tweets'),
+            'workers': metric(self.workers, 'processes'),
+            'tweets_per_s': metric(_rate(scored, elapsed), 'tweets/s', 'higher'),
+            'cache_hit_ratio': metric(sentiment_cache.stats()['hit_ratio'], 'ratio'),
+        }
+
+    def _median_ms(self, func):
+        func()
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    @scenario('dashboard.migrations', "Home.py's recent migrations query, uncached")
+    def dashboard_migrations(self):
+        from utils.dashboard_data import recent_migrations
+
+        self.coin_rows()
+        return {'median_ms': metric(self._median_ms(lambda: recent_migrations.__wrapped__(limit=5)), 'ms', 'lower')}
+
+    @scenario('dashboard.sentiment', "Home.py's sentiment by coin query per time range, uncached")
+    def dashboard_sentiment(self):
+        from utils.dashboard_data import sentiment_by_coin
+        from utils.rollups import TIME_RANGES
+
+        self.ensure_scored()
+        return {
+            f"{_slug(time_range)}_ms": metric(
+                self._median_ms(lambda: sentiment_by_coin.__wrapped__(time_range)), 'ms', 'lower'
+            )
+            for time_range in TIME_RANGES
+        }
+
+    @scenario('logging.overhead', 'Cost per log call with the database handler, and its drain rate')
+    def logging_overhead(self):
+        from utils.log_util import DatabaseLogHandler
+
+        records = min(self.sizes['tweets'], 100000)
+        logging.disable(logging.NOTSET)
+        try:
+            bare = self._log_calls(None, records)
+            handler = DatabaseLogHandler(self.db.get_session, capacity=records)
+            start = time.perf_counter()
+            queued = self._log_calls(handler, records)
+            handler.close()
+            drained = time.perf_counter() - start
+        finally:
+            logging.disable(logging.INFO)
+        return {
+            'call_us': metric(queued * 1e6 / records, 'us', 'lower'),
+            'overhead_us': metric((queued - bare) * 1e6 / records, 'us', 'lower'),
+            'drain_rows_per_s': metric(_rate(handler.flushed, drained), 'rows/s', 'higher'),
+        }
+
+    def _log_calls(self, handler, records):
+        logger = logging.getLogger('bench.suite.logging')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if handler:
+            logger.addHandler(handler)
+        start = time.perf_counter()
+        for i in range(records):
+            logger.info(f"Updated COIN{i % 100} market_cap: {i} -> {i + 1}")
+        elapsed = time.perf_counter() - start
+        if handler:
+            logger.removeHandler(handler)
+        return elapsed
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ['git', *args], capture_output=True, text=True, check=True, timeout=30
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_suite(scale='10k', scenarios=None, seed=42, workers=1, repeat=20):
+    """
+    Run the suite on the database in DB_URL
+
+    Returns:
+        dict: The JSON-serializable result document
+    """
+    suite = Suite(scale, seed, workers, repeat)
+    started = datetime.datetime.utcnow()
+    results = suite.run(scenarios)
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'started_at': started.isoformat(timespec='seconds'),
+        'dialect': suite.dialect,
+        'scale': scale,
+        'sizes': suite.sizes,
+        'seed': seed,
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+def compare(document, baseline, threshold=0.15):
+    """
+    Compare a result document with a baseline of the same dialect and scale
+
+    A metric regresses when it is worse than the baseline by more than
+    threshold (a fraction): lower for 'higher' metrics, higher for 'lower'
+    ones.
+
+    Returns:
+        list: (scenario, metric, baseline value, value, relative change,
+            regressed) for every metric present in both
+    """
+    for key in ('dialect', 'scale'):
+        if document[key] != baseline.get(key):
+            raise ValueError(f"Baseline {key} is {baseline.get(key)!r}, this run is {document[key]!r}")
+    rows = []
+    for name, metrics in document['results'].items():
+        for key, current in metrics.items():
+            previous = baseline.get('results', {}).get(name, {}).get(key)
+            if previous is None or not current['better']:
+                continue
+            before, after = previous['value'], current['value']
+            change = (after - before) / before if before else 0.0
+            if current['better'] == 'higher':
+                regressed = after < before * (1 - threshold)
+            else:
+                regressed = after > before * (1 + threshold)
+            rows.append((name, key, before, after, change, regressed))
+    return rows
+
+def format_results(document):
+    lines = [
+        f"{document['dialect']} scale={document['scale']} commit={document['commit']}"
+        f"{' (dirty)' if document['dirty'] else ''}",
+        f"{'scenario':<22} {'metric':<28} {'value':>14} unit",
+    ]
+    for name, metrics in document['results'].items():
+        for key, current in metrics.items():
+            lines.append(f"{name:<22} {key:<28} {current['value']:>14,.2f} {current['unit']}")
+    return '\n'.join(lines)
+
+def format_comparison(rows, baseline):
+    lines = [
+        f"vs {baseline.get('commit')}:",
+        f"{'scenario':<22} {'metric':<28} {'baseline':>12} {'current':>12} {'change':>8}",
+    ]
+    for name, key, before, after, change, regressed in rows:
+        lines.append(
+            f"{name:<22} {key:<28} {before:>12,.2f} {after:>12,.2f} {change:>+8.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return '\n'.join(lines)
+
+def default_output(document):
+    return os.path.join(
+        'bench', 'results',
+        f"{document['commit'] or 'unknown'}-{document['dialect']}-{document['scale']}.json"
+    )
+
+def write_results(document, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=False)
+        f.write('\n')
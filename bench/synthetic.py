@@ -0,0 +1,168 @@
+"""
+Deterministic synthetic data for benchmarks
+
+Generates migrated coins, tweets and market ticks from a seed: the same
+seed, scale and `now` always give the same rows, so runs on different
+commits (or databases) measure the same workload. Timestamps are laid out
+backwards from `now`, which the suite floors to the hour.
+
+Tweets repeat earlier texts at `duplicate_rate` the way shill campaigns and
+retweets do: a few popular texts account for most repeats, copied verbatim,
+as 'RT @user: ...' or with different case and spacing.
+"""
+import datetime
+import math
+import random
+
+# Rows per table at each named scale (coins are a tenth of the tweets/ticks)
+SCALES = {
+    '10k': {'coins': 1000, 'tweets': 10000, 'ticks': 10000},
+    '100k': {'coins': 10000, 'tweets': 100000, 'ticks': 100000},
+    '1m': {'coins': 100000, 'tweets': 1000000, 'ticks': 1000000},
+}
+
+# Share of repeated tweets in samples of coin timelines
+DUPLICATE_RATE = 0.35
+
+TICK_INTERVAL = datetime.timedelta(minutes=15)
+
+_BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+_STEMS = [
+    'PEPE', 'WIF', 'BONK', 'MEW', 'POPCAT', 'DOGE', 'SHIB', 'FLOKI', 'MOG', 'BRETT',
+    'TRUMP', 'CAT', 'FROG', 'MOON', 'CHAD', 'GIGA', 'WOJAK', 'BOME', 'SLERF', 'MYRO',
+]
+
+_WORDS = [
+    'moon', 'pump', 'dump', 'rug', 'scam', 'love', 'great', 'amazing', 'terrible',
+    'buy', 'sell', 'hold', 'hodl', 'bullish', 'bearish', 'dev', 'chart', 'lol',
+    'not', 'very', 'really', 'never', 'best', 'worst', 'happy', 'sad', 'wow',
+    'gem', 'fake', 'legit', 'send', 'it', 'to', 'the', 'going', 'up', 'down',
+    'wagmi', 'ngmi', 'lfg', 'ape', 'jeet', 'dip', 'floor', 'ath', '!!!', '🚀', '💎',
+]
+
+def scale_sizes(scale):
+    """Row counts for a named scale ('10k', '100k', '1m')"""
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale: {scale} (choose from {', '.join(SCALES)})")
+    return dict(SCALES[scale])
+
+def base58_address(rng, length=44):
+    return ''.join(rng.choice(_BASE58) for _ in range(length))
+
+def coins(count, now, seed=1):
+    """
+    Migrated coin rows (ids 1..count), newest migration first
+
+    Symbols reuse a small set of stems with numeric suffixes, so several
+    coins share a name stem as they do on pump.fun.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, count + 1):
+        stem = rng.choice(_STEMS)
+        symbol = f"{stem}{i}" if i > len(_STEMS) else stem
+        rows.append({
+            'id': i,
+            'coin_name': f"{stem.title()} {i}",
+            'coin_symbol': symbol,
+            'migration_date': now - datetime.timedelta(minutes=5 * i),
+            'market_cap': round(rng.lognormvariate(11, 1.5), 2),
+            'volume': round(rng.lognormvariate(9, 2), 2),
+            'developer_id': f"dev{rng.randint(0, count // 10 + 1)}",
+            'twitter_handle': f"{symbol.lower()}_sol",
+            'contract_address': base58_address(rng),
+            'contract_status': rng.choice(['Good', 'Good', 'Warning', 'Danger']),
+            'supply_bundled': rng.random() < 0.1,
+        })
+    return rows
+
+def _original_text(rng, symbol):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 30))]
+    words.insert(rng.randrange(len(words) + 1), f"${symbol}")
+    return ' '.join(words)
+
+def _repeat(rng, text):
+    kind = rng.random()
+    if kind < 0.6:
+        return text
+    if kind < 0.85:
+        return f"RT @user{rng.randint(0, 9999)}: {text}"
+    return '  '.join(text.upper().split())
+
+def tweets(count, coin_rows, now, duplicate_rate=DUPLICATE_RATE, days=7, seed=2):
+    """
+    Tweet rows about coin_rows, spread over the last `days` days
+
+    Coins get tweets in proportion to a heavy-tailed popularity, and a
+    repeated tweet picks its original with a bias towards the first texts of
+    the corpus (the viral ones).
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(coin_rows))]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    originals = []
+    rows = []
+    span = days * 86400
+    for i in range(count):
+        coin = coin_rows[_weighted_index(rng, cumulative, total)]
+        if originals and rng.random() < duplicate_rate:
+            coin_id, text = originals[int(len(originals) * rng.random() ** 3)]
+            coin = {'id': coin_id}
+            content = _repeat(rng, text)
+        else:
+            content = _original_text(rng, coin['coin_symbol'])
+            originals.append((coin['id'], content))
+        rows.append({
+            'tweet_id': str(1800000000000000000 + i),
+            'coin_id': coin['id'],
+            'content': content,
+            'created_at': now - datetime.timedelta(seconds=span * (count - i) / count),
+            'likes': int(rng.paretovariate(1.2)) - 1,
+            'retweets': int(rng.paretovariate(1.5)) - 1,
+        })
+    return rows
+
+def _weighted_index(rng, cumulative, total):
+    target = rng.random() * total
+    low, high = 0, len(cumulative) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if cumulative[middle] < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def market_ticks(count, coin_ids, now, interval=TICK_INTERVAL, seed=3):
+    """
+    Market snapshot rows: a random walk per coin, every interval up to now
+
+    Yields lists of one tick per coin, oldest first, count rows in total
+    (the last round may be partial).
+    """
+    rng = random.Random(seed)
+    prices = {coin_id: rng.uniform(1e-6, 1e-3) for coin_id in coin_ids}
+    holders = {coin_id: rng.randint(10, 5000) for coin_id in coin_ids}
+    rounds = math.ceil(count / len(coin_ids))
+    remaining = count
+    for tick in range(rounds):
+        timestamp = now - interval * (rounds - tick - 1)
+        batch = []
+        for coin_id in coin_ids[:remaining]:
+            prices[coin_id] *= rng.uniform(0.95, 1.06)
+            holders[coin_id] = max(1, holders[coin_id] + rng.randint(-5, 8))
+            batch.append({
+                'coin_id': coin_id,
+                'timestamp': timestamp,
+                'price': prices[coin_id],
+                'market_cap': prices[coin_id] * 1e9,
+                'volume': rng.uniform(0, 1e5),
+                'holders': holders[coin_id],
+            })
+        remaining -= len(batch)
+        yield batch
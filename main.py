@@ -1,17 +1,28 @@
 import argparse
+import importlib
+import json
 import logging
+import os
 import sys
+import threading
 import time
-from utils.db_pool import DatabasePool
-from utils.scheduler import TaskScheduler
-from utils.data_fetcher import fetch_migrated_coins, update_market_data
-from utils.sentiment_analyzer import analyze_sentiment
 from utils.log_util import setup_logging as setup_log
+from utils.task_runner import TASKS
+
+# Modules are imported by the command that needs them, so short-lived
+# invocations (and --help) do not load SQLAlchemy, aiohttp or VADER
 
 def setup_logging():
     return setup_log(__name__)
 
+def load_task(name):
+    """Import and return the function behind a task name"""
+    module, func = TASKS[name][1].split(':')
+    return getattr(importlib.import_module(module), func)
+
 def init_database():
+    from utils.db_pool import DatabasePool
+
     try:
         db = DatabasePool()
         db.create_all_tables()
@@ -20,10 +31,84 @@ def init_database():
         logging.error(f"Failed to initialize database: {e}")
         raise
 
-def run_scheduler(duration=None):
+def rebuild_rollups():
+    """Recompute the sentiment rollups from all scored tweets"""
+    from utils.db_pool import DatabasePool
+    from utils.rollups import rebuild_sentiment_rollups
+
+    db = DatabasePool()
+    with db.get_session() as session:
+        rebuild_sentiment_rollups(session)
+
+def maintain_partitions():
+    """Create upcoming partitions and drop data past its retention"""
+    from utils.partitions import run_partition_maintenance
+
+    print(json.dumps(run_partition_maintenance(), indent=2, default=str))
+
+def pool_stats(threads=0, seconds=10, hold_ms=50):
+    """
+    Print connection pool settings and metrics, optionally after generating
+    load from several threads that each check out a connection, run a
+    trivial query and hold it for hold_ms
+    """
+    from sqlalchemy import text
+    from utils.db_pool import DatabasePool
+
+    db = DatabasePool()
+    if threads:
+        deadline = time.monotonic() + seconds
+        errors = []
+
+        def worker():
+            while time.monotonic() < deadline:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+                        time.sleep(hold_ms / 1000)
+                except Exception as e:
+                    errors.append(e)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        if errors:
+            logging.warning(f"{len(errors)} checkouts failed, last error: {errors[-1]}")
+
+    print(json.dumps(db.pool_status(), indent=2, default=str))
+
+def shard_status(job=None):
+    """Print the shards of the latest round of each distributed job"""
+    from utils.leases import shard_status as latest_rounds
+
+    print(json.dumps(latest_rounds(job), indent=2, default=str))
+
+def show_watermarks():
+    """Print the ingestion cursors and the number of row hashes per source"""
+    from sqlalchemy import func
+    from utils.db_pool import DatabasePool
+    from utils.models import RowHash, Watermark
+
+    with DatabasePool().get_session() as session:
+        cursors = {
+            name: {'value': json.loads(value), 'updated_at': updated_at}
+            for name, value, updated_at in session.query(Watermark.name, Watermark.value, Watermark.updated_at)
+        }
+        hashes = dict(session.query(RowHash.source, func.count()).group_by(RowHash.source).all())
+    print(json.dumps({'cursors': cursors, 'row_hashes': hashes}, indent=2, default=str))
+
+def run_scheduler(duration=None, distributed=False):
     """Run the scheduler for a specified duration (in minutes) or indefinitely"""
-    scheduler = TaskScheduler()
-    scheduler.start()
+    from utils.instrumentation import METRICS_PORT, metrics
+    from utils.scheduler import get_scheduler
+
+    scheduler = get_scheduler(distributed=distributed)
+    metrics.start_export()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        logging.info(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
     
     try:
         if duration:
@@ -35,20 +120,95 @@ def run_scheduler(duration=None):
         scheduler.stop()
         logging.info("Scheduler stopped by user")
 
-def run_single_task(task_name):
-    """Run a single task once"""
-    tasks = {
-        'fetch': fetch_migrated_coins,
-        'market': update_market_data,
-        'sentiment': analyze_sentiment
-    }
-    
-    if task_name not in tasks:
+def run_single_task(task_name, profile=False, profile_output=None, profile_interval_ms=5):
+    """
+    Run a single task once
+
+    With profile, the run is sampled by a wall-clock profiler whose
+    collapsed stacks are written to profile_output (flamegraph.pl,
+    speedscope), and the span summary is printed.
+    """
+    if task_name not in TASKS:
         logging.error(f"Unknown task: {task_name}")
         return
     
     logging.info(f"Running task: {task_name}")
-    tasks[task_name]()
+    if not profile:
+        try:
+            load_task(task_name)()
+        finally:
+            export_metrics()
+        return
+
+    from utils.instrumentation import SamplingProfiler, metrics
+
+    profile_output = profile_output or f"profile-{task_name}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    profiler = SamplingProfiler(profile_interval_ms / 1000)
+    try:
+        with profiler:
+            load_task(task_name)()
+    finally:
+        profiler.write(profile_output)
+        logging.info(f"Wrote {profiler.samples} samples to {profile_output}")
+        print(metrics.report())
+        export_metrics()
+
+def run_stream(url=None, duration=None, max_events=None, since=None, enrich=True):
+    """Ingest from a push feed until stopped and print the throughput and latency report"""
+    from utils.streaming import run_stream as stream
+
+    report = stream(url, duration, max_events, since=since, enrich=enrich)
+    print(json.dumps(report, indent=2, default=str))
+
+def export_metrics():
+    """Write the span metrics to METRICS_FILE, if set"""
+    path = os.getenv('METRICS_FILE')
+    if path:
+        from utils.instrumentation import metrics
+
+        metrics.write(path)
+
+def export_archive(root=None, datasets=None, force=False):
+    from utils.archive import export_archive as export
+
+    report = export(root=root, datasets=datasets, force=force)
+    print(json.dumps(report, indent=2))
+
+def run_benchmarks(scale, scenarios=None, db_url=None, output=None, baseline=None,
+                   threshold=0.15, workers=1, repeat=20, seed=42, wipe=False):
+    """
+    Run the benchmark suite and write its JSON results
+
+    Without db_url the suite runs on a temporary SQLite file. The suite
+    empties the tables of the database it runs on, so a db_url is refused
+    unless wipe is set. With a baseline result file, exits with status 1
+    when a metric regressed by more than threshold.
+    """
+    import tempfile
+
+    if db_url and not wipe:
+        raise ValueError(f"The benchmark suite empties every table of {db_url}; "
+                         f"pass --yes-wipe to run it on a scratch database")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URL'] = db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from bench import suite
+
+        document = suite.run_suite(scale, scenarios, seed, workers, repeat)
+    print(suite.format_results(document))
+    output = output or suite.default_output(document)
+    suite.write_results(document, output)
+    print(f"Wrote {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)
+        rows = suite.compare(document, previous, threshold)
+        print(suite.format_comparison(rows, previous))
+        regressed = [f"{name}.{key}" for name, key, *_, failed in rows if failed]
+        if regressed:
+            print(f"Regressed by more than {threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
 
 def main():
     logger = setup_logging()
@@ -65,33 +225,162 @@ def main():
         type=int,
         help='Duration to run in minutes (default: run indefinitely)'
     )
+    scheduler_parser.add_argument(
+        '--distributed',
+        action='store_true',
+        help='Share each round with the other distributed schedulers through database leases'
+    )
     
     # Task command
     task_parser = subparsers.add_parser('task', help='Run a single task')
     task_parser.add_argument(
         'name',
-        choices=['fetch', 'market', 'sentiment'],
-        help='Task to run (fetch: fetch migrated coins, market: update market data, sentiment: analyze sentiment)'
+        choices=list(TASKS),
+        help='Task to run (' + ', '.join(f"{name}: {label}" for name, (label, _, _) in TASKS.items()) + ')'
     )
+    task_parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Sample the run and write collapsed stacks for a flame graph'
+    )
+    task_parser.add_argument('--profile-output', help='Collapsed stack file (default: profile-<task>-<time>.folded)')
+    task_parser.add_argument('--profile-interval', type=float, default=5, help='Sampling interval in ms')
     
     # Initialize command
     init_parser = subparsers.add_parser('init', help='Initialize the database')
     
+    # Pool stats command
+    pool_parser = subparsers.add_parser('pool-stats', help='Show connection pool settings and metrics')
+    pool_parser.add_argument(
+        '--threads',
+        type=int,
+        default=0,
+        help='Generate load from this many threads before reporting (default: no load)'
+    )
+    pool_parser.add_argument('--seconds', type=float, default=10, help='Load duration in seconds')
+    pool_parser.add_argument('--hold-ms', type=float, default=50, help='How long each checkout is held')
+    
+    # Rollups command
+    rollups_parser = subparsers.add_parser(
+        'rebuild-rollups',
+        help='Recompute sentiment rollups from scored tweets'
+    )
+    
+    # Partition maintenance command
+    partitions_parser = subparsers.add_parser(
+        'maintain-partitions',
+        help='Create upcoming partitions and apply retention'
+    )
+    
+    # Shard status command
+    shards_parser = subparsers.add_parser(
+        'shard-status',
+        help='Show the shards and leases of the latest distributed rounds'
+    )
+    shards_parser.add_argument('--job', help='Only this job (e.g. market)')
+    
+    # Watermarks command
+    subparsers.add_parser('watermarks', help='Show ingestion cursors and row hash counts')
+    
+    # Stream command
+    stream_parser = subparsers.add_parser('stream', help='Ingest migrations and tweets from a push feed')
+    stream_parser.add_argument('--url', help='ws(s):// WebSocket or http(s):// SSE feed (default: STREAM_URL)')
+    stream_parser.add_argument('--duration', type=float, help='Seconds to run (default: until interrupted)')
+    stream_parser.add_argument('--max-events', type=int, help='Stop after this many events')
+    stream_parser.add_argument('--since', type=int, help='Resume after this event id (default: the checkpoint)')
+    stream_parser.add_argument(
+        '--no-enrich',
+        action='store_true',
+        help='Skip the RugCheck lookup of streamed migrations'
+    )
+    
+    # Archive command
+    archive_parser = subparsers.add_parser('archive', help='Export closed days to the Parquet archive')
+    archive_parser.add_argument('--root', help='Archive directory (default: ARCHIVE_DIR)')
+    archive_parser.add_argument(
+        '--dataset',
+        action='append',
+        dest='datasets',
+        choices=['tweets', 'migrated_coins', 'market_snapshots', 'market_bars'],
+        help='Only this table (repeatable)'
+    )
+    archive_parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Rewrite every closed day still in the database'
+    )
+    
+    # Benchmark command
+    bench_parser = subparsers.add_parser('bench', help='Run the benchmark suite and write JSON results')
+    bench_parser.add_argument('--scale', choices=['10k', '100k', '1m'], default='10k', help='Synthetic data size')
+    bench_parser.add_argument(
+        '--scenario',
+        action='append',
+        dest='scenarios',
+        help='Only this scenario (repeatable, e.g. ingest.market)'
+    )
+    bench_parser.add_argument(
+        '--db-url',
+        help='Scratch database to run on, emptied first; requires --yes-wipe (default: a temporary SQLite file)'
+    )
+    bench_parser.add_argument(
+        '--yes-wipe',
+        action='store_true',
+        help='Confirm that every table of --db-url may be emptied'
+    )
+    bench_parser.add_argument('--output', help='Result file (default: bench/results/<commit>-<dialect>-<scale>.json)')
+    bench_parser.add_argument('--baseline', help='Result file to compare with; exits 1 on regressions')
+    bench_parser.add_argument('--threshold', type=float, default=0.15, help='Allowed regression as a fraction')
+    bench_parser.add_argument('--workers', type=int, default=1, help='Sentiment scoring processes')
+    bench_parser.add_argument('--repeat', type=int, default=20, help='Runs of each dashboard query')
+    bench_parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    
     args = parser.parse_args()
     
     try:
         if args.command == 'scheduler':
             logger.info("Starting scheduler...")
-            run_scheduler(args.duration)
+            run_scheduler(args.duration, args.distributed)
             
         elif args.command == 'task':
             logger.info(f"Running single task: {args.name}")
-            run_single_task(args.name)
+            run_single_task(args.name, args.profile, args.profile_output, args.profile_interval)
             
         elif args.command == 'init':
             logger.info("Initializing database...")
             init_database()
             
+        elif args.command == 'pool-stats':
+            pool_stats(args.threads, args.seconds, args.hold_ms)
+            
+        elif args.command == 'rebuild-rollups':
+            logger.info("Rebuilding sentiment rollups...")
+            rebuild_rollups()
+            
+        elif args.command == 'maintain-partitions':
+            logger.info("Running partition maintenance...")
+            maintain_partitions()
+            
+        elif args.command == 'shard-status':
+            shard_status(args.job)
+            
+        elif args.command == 'watermarks':
+            show_watermarks()
+            
+        elif args.command == 'stream':
+            logger.info("Starting stream ingestion...")
+            run_stream(args.url, args.duration, args.max_events, args.since, not args.no_enrich)
+            
+        elif args.command == 'archive':
+            logger.info("Exporting archive...")
+            export_archive(args.root, args.datasets, args.force)
+            
+        elif args.command == 'bench':
+            run_benchmarks(
+                args.scale, args.scenarios, args.db_url, args.output, args.baseline,
+                args.threshold, args.workers, args.repeat, args.seed, args.yes_wipe
+            )
+            
         else:
             parser.print_help()
             
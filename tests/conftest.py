@@ -0,0 +1,14 @@
+import pytest
+from utils.db_pool import DatabasePool
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """DatabasePool on a fresh SQLite file with all tables created"""
+    monkeypatch.setenv('DB_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    db = DatabasePool()
+    # A fresh engine for this test's database; restored afterwards
+    monkeypatch.setattr(db, '_engine', None)
+    monkeypatch.setattr(db, '_Session', None)
+    db.create_all_tables()
+    yield db
+    db.engine.dispose()
@@ -0,0 +1,207 @@
+import datetime
+import pandas as pd
+import pytest
+import requests
+from utils.alert_engine import COOLDOWNS, RULE_THRESHOLDS, AlertEngine, ewm_update, zscore
+from utils.analytics import detect_alerts
+from utils.dashboard_data import recent_alerts
+from utils.models import Alert, MigratedCoin
+from utils.notifier import StubNotifier, TelegramNotifier
+from utils.query_cache import COINS, query_cache
+
+NOW = datetime.datetime(2024, 1, 10)
+
+def add_coins(db, count):
+    with db.get_session() as session:
+        session.add_all(MigratedCoin(id=i, coin_name=f"Coin {i}", coin_symbol=f"C{i}",
+                                     contract_address=f"Mint{i:040d}", migration_date=NOW)
+                        for i in range(1, count + 1))
+        session.commit()
+
+def stored_alerts(db):
+    with db.get_session() as session:
+        return sorted(session.query(Alert.coin_id, Alert.kind).all())
+
+def analytics_metrics():
+    """Metrics of two coins: coin 1 crosses the mention and rank thresholds"""
+    return pd.DataFrame({
+        'volume_z': [0.0, 0.0], 'return_1h': [0.0, 0.0], 'mention_z': [5.0, 0.0],
+        'sentiment_z': [0.0, 0.0], 'tweets': [20, 20], 'rank_change': [80.0, 0.0], 'rank': [3, 50],
+    }, index=pd.Index([1, 2], name='coin_id'))
+
+def test_analytics_alerts_are_stored_once_per_cooldown(db):
+    add_coins(db, 2)
+    engine = AlertEngine(notifier=None, clock=lambda: NOW)
+    alerts = detect_alerts(analytics_metrics(), NOW, {1: 'C1', 2: 'C2'})
+    with db.get_session() as session:
+        assert len(engine.on_analytics(session, alerts)) == 2
+        # The next overview within the cooldown stores nothing new
+        assert engine.on_analytics(session, detect_alerts(analytics_metrics(), NOW, {1: 'C1'})) == []
+        session.commit()
+
+    assert stored_alerts(db) == [(1, 'mention_spike'), (1, 'rank_jump')]
+    query_cache.invalidate(COINS)
+    assert {alert['kind'] for alert in recent_alerts()} == {'mention_spike', 'rank_jump'}
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class Response:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {}
+        self._json = {'parameters': {'retry_after': retry_after}} if retry_after is not None else {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+class FakeTelegram:
+    """Stands in for requests.post, answering with the given statuses in order"""
+
+    def __init__(self, monkeypatch, *responses):
+        self.responses = list(responses)
+        self.texts = []
+        monkeypatch.setattr(requests, 'post', self.post)
+
+    def post(self, url, json=None, timeout=None):
+        self.texts.append(json['text'])
+        response = self.responses.pop(0) if self.responses else Response(200)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def telegram(sleeps):
+    return TelegramNotifier(token='t', chat_id='c', backoff=1.0, sleep=sleeps.append)
+
+def snapshot(coin_id, volume=None, price=None):
+    return {'coin_id': coin_id, 'timestamp': NOW, 'volume': volume, 'price': price}
+
+def fire_alerts(db, count):
+    """Store count undelivered alerts, each long enough that two fill a Telegram message"""
+    with db.engine.begin() as conn:
+        conn.execute(Alert.__table__.insert(), [
+            {'coin_id': 1, 'kind': 'price_move', 'value': 1.0, 'message': f"alert {i} " + 'x' * 1500,
+             'created_at': NOW}
+            for i in range(count)
+        ])
+
+def notified(db):
+    with db.get_session() as session:
+        return session.query(Alert).filter(Alert.notified_at.isnot(None)).count()
+
+def test_ewm_update_tracks_mean_and_variance():
+    mean, var, samples = None, None, 0
+    for value in [1.0, 3.0] * 500:
+        mean, var, samples = ewm_update(mean, var, samples, value, 0.05)
+    assert samples == 1000
+    assert abs(mean - 2.0) < 0.1
+    assert abs(var - 1.0) < 0.1
+    assert zscore(2.0, mean, var) == pytest.approx((2.0 - mean) / var ** 0.5)
+    assert zscore(5.0, mean, 0.0) is None
+
+def test_volume_spike_fires_above_the_threshold_once_warmed_up(db):
+    add_coins(db, 1)
+    clock = Clock()
+    engine = AlertEngine(notifier=None, clock=clock, min_samples=20)
+    with db.get_session() as session:
+        # Not enough samples yet: even a huge volume does not alert
+        assert engine.on_market_data(session, [snapshot(1, volume=1e9)]) == []
+        for i in range(40):
+            engine.on_market_data(session, [snapshot(1, volume=1000.0 * (1.2 if i % 2 else 0.8))])
+        # Within 4 sd of the log-volume average: no alert
+        assert engine.on_market_data(session, [snapshot(1, volume=1300.0)]) == []
+        fired = engine.on_market_data(session, [snapshot(1, volume=1e6)])
+        assert [alert['kind'] for alert in fired] == ['volume_spike']
+        assert fired[0]['value'] >= RULE_THRESHOLDS['volume_z']
+
+def test_cooldown_fires_a_coin_and_rule_once(db):
+    add_coins(db, 2)
+    clock = Clock()
+    engine = AlertEngine(notifier=None, clock=clock)
+    with db.get_session() as session:
+        engine.on_market_data(session, [snapshot(1, price=1.0), snapshot(2, price=1.0)])
+        fired = engine.on_market_data(session, [snapshot(1, price=2.0), snapshot(2, price=2.0)])
+        assert len(fired) == 2
+        clock.now += datetime.timedelta(minutes=30)
+        # Same coins and rule within the cooldown: suppressed
+        assert engine.on_market_data(session, [snapshot(1, price=4.0), snapshot(2, price=4.0)]) == []
+        assert engine.stats['suppressed'] == 2
+        clock.now += COOLDOWNS['price_move']
+        assert len(engine.on_market_data(session, [snapshot(1, price=8.0)])) == 1
+        session.commit()
+    assert stored_alerts(db) == [(1, 'price_move'), (1, 'price_move'), (2, 'price_move')]
+
+def test_stub_notifier_delivers_in_batches(db):
+    add_coins(db, 1)
+    notifier = StubNotifier()
+    engine = AlertEngine(notifier=notifier, clock=Clock(NOW + datetime.timedelta(hours=1)))
+    fire_alerts(db, 120)
+    assert engine.notify(batch_size=50) == 120
+    assert [len(batch) for batch in notifier.batches] == [50, 50, 20]
+    assert engine.notify(batch_size=50) == 0
+    assert notified(db) == 120
+
+def test_failed_batch_is_retried_on_the_next_notify(db):
+    add_coins(db, 1)
+
+    class Flaky(StubNotifier):
+        fail = True
+
+        def send(self, alerts):
+            if self.fail:
+                raise ConnectionError('down')
+            super().send(alerts)
+
+    notifier = Flaky()
+    engine = AlertEngine(notifier=notifier, clock=Clock(NOW + datetime.timedelta(hours=1)))
+    fire_alerts(db, 3)
+    assert engine.notify() == 0
+    assert engine.stats['notify_failures'] == 1
+    notifier.fail = False
+    assert engine.notify() == 3
+    assert len(notifier.sent) == 3
+
+def test_telegram_retries_with_backoff(monkeypatch):
+    sleeps = []
+    fake = FakeTelegram(monkeypatch, Response(503), requests.ConnectionError('reset'), Response(200))
+    telegram(sleeps).send([{'kind': 'price_move', 'message': 'up'}])
+    assert len(fake.texts) == 3
+    assert sleeps == [1.0, 2.0]
+
+def test_telegram_honors_retry_after(monkeypatch):
+    sleeps = []
+    FakeTelegram(monkeypatch, Response(429, retry_after=7), Response(200))
+    telegram(sleeps).send([{'kind': 'price_move', 'message': 'up'}])
+    assert sleeps == [7.0]
+
+def test_telegram_gives_up_after_its_retries(monkeypatch):
+    sleeps = []
+    fake = FakeTelegram(monkeypatch, *[Response(500)] * 10)
+    with pytest.raises(requests.HTTPError):
+        telegram(sleeps).send([{'kind': 'price_move', 'message': 'up'}])
+    assert len(fake.texts) == 4
+    assert sleeps == [1.0, 2.0, 4.0]
+
+def test_telegram_resends_only_undelivered_messages(db, monkeypatch):
+    add_coins(db, 1)
+    sleeps = []
+    # Two alerts fit a message: the second message fails on every attempt
+    fake = FakeTelegram(monkeypatch, Response(200), *[Response(400)])
+    engine = AlertEngine(notifier=telegram(sleeps), clock=Clock(NOW + datetime.timedelta(hours=1)))
+    fire_alerts(db, 4)
+    assert engine.notify() == 2
+    assert notified(db) == 2
+    assert [text.count('[price_move]') for text in fake.texts] == [2, 2]
+
+    assert engine.notify() == 2
+    # Only the second message is sent again
+    assert [text.count('alert 2 ') + text.count('alert 3 ') for text in fake.texts[2:]] == [2]
+    assert notified(db) == 4
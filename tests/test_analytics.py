@@ -0,0 +1,39 @@
+import datetime
+import numpy as np
+from utils.analytics import compute_metrics, detect_alerts
+
+NOW = datetime.datetime(2024, 1, 10)
+STEP = datetime.timedelta(minutes=15)
+
+def bars(prices):
+    """15m bars ending at NOW from {coin_id: [close, ...]} (oldest first)"""
+    coin_ids, timestamps, closes = [], [], []
+    for coin_id, series in sorted(prices.items()):
+        for i, close in enumerate(series):
+            coin_ids.append(coin_id)
+            timestamps.append(NOW - STEP * (len(series) - 1 - i))
+            closes.append(close)
+    return {
+        'coin_id': np.array(coin_ids, dtype=np.int64),
+        'timestamp': np.array(timestamps, dtype='datetime64[s]'),
+        'close': np.array(closes, dtype=float),
+        'volume': np.full(len(closes), 1000.0),
+    }
+
+def test_new_coin_has_no_rank_change():
+    periods = 4 * 24 * 3
+    prices = {coin_id: list(np.linspace(1.0, 1.0 + coin_id / 100, periods)) for coin_id in range(1, 101)}
+    # Listed 36 hours ago and up 10x: has a 24h return but no previous 24h window
+    prices[101] = list(np.linspace(1.0, 10.0, 4 * 36))
+    metrics = compute_metrics(bars(prices), now=NOW, lookback=datetime.timedelta(days=3))
+
+    assert metrics.loc[101, 'rank'] == 1
+    assert np.isnan(metrics.loc[101, 'rank_change'])
+    assert not np.isnan(metrics.loc[1, 'rank_change'])
+    assert not any(alert['kind'] == 'rank_jump' and alert['coin_id'] == 101
+                   for alert in detect_alerts(metrics, NOW))
+
+def test_no_previous_window_means_no_rank_change():
+    prices = {coin_id: [1.0, 1.0 + coin_id] for coin_id in range(1, 5)}
+    metrics = compute_metrics(bars(prices), now=NOW, lookback=datetime.timedelta(hours=12))
+    assert metrics['rank_change'].isna().all()
@@ -0,0 +1,59 @@
+import datetime
+from sqlalchemy import insert
+from utils.archive import ArchiveReader, archived_counts, export_archive
+from utils.models import MarketSnapshot
+
+NOW = datetime.datetime(2024, 1, 10, 12)
+DAY = datetime.datetime(2024, 1, 1)
+
+def snapshots(days, per_day, coins=3, start=0):
+    return [
+        {'coin_id': coin_id, 'timestamp': DAY + datetime.timedelta(days=day, minutes=10 * i),
+         'price': day + i / 100 + coin_id, 'market_cap': 1000.0 * coin_id, 'volume': float(i), 'holders': i}
+        for day in range(days)
+        for i in range(start, start + per_day)
+        for coin_id in range(1, coins + 1)
+    ]
+
+def store(db, rows):
+    with db.engine.begin() as conn:
+        conn.execute(insert(MarketSnapshot.__table__), rows)
+
+def export(db, root, **options):
+    return export_archive(db.engine, str(root), NOW, ['market_snapshots'], **options)['market_snapshots']
+
+def test_exported_days_scan_back_unchanged(db, tmp_path):
+    rows = snapshots(3, 20)
+    store(db, rows)
+    report = export(db, tmp_path)
+    assert report['exported'] == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert report['rows'] == len(rows)
+
+    reader = ArchiveReader(str(tmp_path))
+    assert reader.partitions('market_snapshots') == report['exported']
+    table = reader.scan('market_snapshots')
+    key = lambda row: (row['coin_id'], row['timestamp'])
+    assert sorted(table.to_pylist(), key=key) == sorted(rows, key=key)
+
+    day_two = reader.scan('market_snapshots', columns=['coin_id', 'timestamp'], coin_ids=[2],
+                          start=DAY + datetime.timedelta(days=1), end=DAY + datetime.timedelta(days=2))
+    assert day_two.num_rows == 20
+    assert set(day_two.column('coin_id').to_pylist()) == {2}
+
+def test_reexport_rewrites_only_days_with_late_rows(db, tmp_path):
+    store(db, snapshots(2, 10))
+    export(db, tmp_path)
+    assert export(db, tmp_path) == {'exported': [], 'rows': 0, 'unchanged': 2}
+
+    # Late rows for the first day, which is already archived
+    store(db, snapshots(1, 5, start=10))
+    report = export(db, tmp_path)
+    assert report['exported'] == ['2024-01-01']
+    assert report['rows'] == 45
+    assert archived_counts(str(tmp_path), 'market_snapshots') == {'2024-01-01': 45, '2024-01-02': 30}
+    assert ArchiveReader(str(tmp_path)).scan('market_snapshots').num_rows == 75
+
+    # force rewrites every day in place without duplicating rows
+    assert export(db, tmp_path, force=True)['exported'] == ['2024-01-01', '2024-01-02']
+    assert ArchiveReader(str(tmp_path)).scan('market_snapshots').num_rows == 75
+    assert not [path for path in tmp_path.rglob('*.tmp')]
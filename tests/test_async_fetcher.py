@@ -0,0 +1,86 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+import pytest
+from bench.stub_api import StubApiServer
+from utils.async_fetcher import AsyncFetcher, FetchError
+
+@pytest.fixture(scope='module')
+def server():
+    server = StubApiServer(coins=200, latency=0)
+    yield server.start()
+    server.stop()
+
+@pytest.fixture(autouse=True)
+def reset(server):
+    server.scripted = []
+    server.request_times = []
+    server.requests = 0
+
+def coin_url(server, i):
+    return f"{server.url}/coins/Mint{i:040d}"
+
+def fetch(urls, **options):
+    """Fetch urls concurrently; returns the results (or exceptions) and the fetcher's stats"""
+    options.setdefault('rate_limits', {})
+    options.setdefault('backoff', 0.01)
+
+    async def run():
+        async with AsyncFetcher(**options) as fetcher:
+            results = await asyncio.gather(*(fetcher.get_json(url) for url in urls), return_exceptions=True)
+        return results, fetcher.stats
+    return asyncio.run(run())
+
+def test_transient_statuses_are_retried(server):
+    server.scripted = [503, 500, 502]
+    (coin,), stats = fetch([coin_url(server, 5)], retries=3)
+    assert coin['symbol'] == 'C5'
+    assert stats['retries'] == 3
+    assert server.requests == 4
+
+def test_retry_after_is_honored(server):
+    server.scripted = [(429, '0.3')]
+    start = time.monotonic()
+    (coin,), stats = fetch([coin_url(server, 5)], backoff=0.001)
+    assert coin['symbol'] == 'C5'
+    assert stats['retries'] == 1
+    assert server.request_times[1] - server.request_times[0] >= 0.3
+    assert time.monotonic() - start < 2
+
+def test_gives_up_after_its_retries(server):
+    server.scripted = [503] * 5
+    (error,), stats = fetch([coin_url(server, 5)], retries=2)
+    assert isinstance(error, FetchError)
+    assert server.requests == 3
+    assert (stats['retries'], stats['failures']) == (2, 1)
+
+def test_client_errors_are_not_retried(server):
+    server.scripted = [404, 503]
+    (error,), stats = fetch([coin_url(server, 5)], retries=3)
+    assert isinstance(error, FetchError)
+    assert server.requests == 1
+    assert stats['retries'] == 0
+
+def test_rate_ceiling(server):
+    rate, count = 50, 100
+    start = time.monotonic()
+    results, _ = fetch([coin_url(server, i) for i in range(count)],
+                       rate_limits={urlsplit(server.url).netloc: rate})
+    elapsed = time.monotonic() - start
+    assert [coin['symbol'] for coin in results] == [f"C{i}" for i in range(count)]
+    # A burst of one second's tokens, then rate per second
+    assert elapsed >= (count - rate) / rate * 0.95
+    times = sorted(server.request_times)
+    for i, at in enumerate(times):
+        in_window = sum(1 for other in times[i:] if other < at + 0.5)
+        assert in_window <= rate + rate * 0.5 + 1
+
+def test_concurrent_requests_are_coalesced(server):
+    server.latency = 0.05
+    try:
+        results, stats = fetch([coin_url(server, 5)] * 10)
+    finally:
+        server.latency = 0
+    assert all(result['symbol'] == 'C5' for result in results)
+    assert server.requests == 1
+    assert stats['coalesced'] == 9
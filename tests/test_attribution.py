@@ -0,0 +1,31 @@
+import datetime
+import threading
+from bench import synthetic
+from utils.attribution import AttributionIndex
+from utils.models import MigratedCoin
+
+NOW = datetime.datetime(2024, 1, 1)
+
+def test_tweets_are_attributed_while_the_index_reloads(db):
+    coins = synthetic.coins(3000, NOW)
+    with db.engine.begin() as conn:
+        conn.execute(MigratedCoin.__table__.insert(), coins)
+    index = AttributionIndex()
+    index.load()
+    tweets = [f"aping into {coin['contract_address']} now" for coin in coins[::30]]
+    expected = [coin['id'] for coin in coins[::30]]
+
+    stop = threading.Event()
+
+    def reload():
+        while not stop.is_set():
+            index.load()
+
+    reloader = threading.Thread(target=reload)
+    reloader.start()
+    try:
+        for _ in range(100):
+            assert index.attribute_many(tweets) == expected
+    finally:
+        stop.set()
+        reloader.join()
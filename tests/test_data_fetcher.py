@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import pytest
+from utils import data_fetcher
+from utils.data_fetcher import MIGRATIONS_PATH, fetch_migrations, ingest_tweets, update_market_data
+from utils.models import MigratedCoin, Tweet
+from utils.watermarks import watermarks
+
+START = 1700000000000
+
+class FakeFeed:
+    """Answers the migrations feed from a list of coins, in either order"""
+
+    def __init__(self, count, newest_first=False, undated=()):
+        self.count = count
+        self.newest_first = newest_first
+        self.undated = set(undated)
+        self.offsets = []
+
+    def coin(self, i):
+        coin = {'mint': f"Mint{i:040d}", 'symbol': f"C{i}", 'complete_timestamp': START + i * 1000}
+        if i in self.undated:
+            del coin['complete_timestamp']
+        return coin
+
+    async def get_json(self, url, params=None, headers=None, key=None):
+        if not url.endswith(MIGRATIONS_PATH):
+            return {'risks': []}
+        offset, limit = params['offset'], params['limit']
+        self.offsets.append(offset)
+        positions = range(offset, min(offset + limit, self.count))
+        if self.newest_first:
+            return [self.coin(self.count - 1 - p) for p in positions]
+        return [self.coin(p) for p in positions]
+
+def migrated_at(i):
+    return datetime.datetime.utcfromtimestamp((START + i * 1000) / 1000)
+
+def fetch(feed, **options):
+    return asyncio.run(fetch_migrations(feed, page_size=10, **options))
+
+def mints(coins):
+    return {int(coin['contract_address'][4:]) for coin in coins}
+
+def test_oldest_first_reads_from_offset():
+    feed = FakeFeed(45)
+    coins, fetched, position = fetch(feed, offset=20, since=migrated_at(29))
+    assert mints(coins) == set(range(20, 45))
+    assert (fetched, position) == (25, 45)
+    assert feed.offsets == [20, 30, 40]
+
+def test_newest_first_reads_back_to_since():
+    feed = FakeFeed(45, newest_first=True)
+    coins, fetched, position = fetch(feed, offset=20, since=migrated_at(29))
+    # The stale offset is dropped; reading stops at the page reaching past since
+    assert feed.offsets == [20, 0, 10]
+    assert mints(coins) == set(range(25, 45))
+    assert position == 0
+
+def test_newest_first_without_since_reads_everything():
+    coins, fetched, position = fetch(FakeFeed(45, newest_first=True))
+    assert mints(coins) == set(range(45))
+    assert (fetched, position) == (45, 0)
+
+@pytest.mark.parametrize('newest_first', [False, True])
+def test_new_migrations_are_found(newest_first):
+    feed = FakeFeed(30, newest_first=newest_first)
+    _, _, position = fetch(feed)
+    feed.count = 37
+    coins, _, _ = fetch(feed, offset=max(position - 10, 0), since=migrated_at(29))
+    assert set(range(30, 37)) <= mints(coins)
+
+def skipped(source):
+    return watermarks.stats().get(source, {}).get('skipped', 0)
+
+def test_migrations_without_a_timestamp_are_skipped():
+    before = skipped('migrations')
+    coins, fetched, _ = fetch(FakeFeed(20, undated={3, 7}))
+    assert mints(coins) == set(range(20)) - {3, 7}
+    assert fetched == 18
+    assert skipped('migrations') - before == 2
+
+def test_tweets_without_a_timestamp_are_skipped(db):
+    tweet = {'tweet_id': '1', 'coin_id': 1, 'content': 'gm', 'likes': 1, 'retweets': 0,
+             'created_at': datetime.datetime(2024, 1, 1)}
+    undated = dict(tweet, tweet_id='2', created_at=None)
+    before = skipped('tweets')
+    ingest_tweets([tweet, undated])
+    # Refetched with new engagement counts: updated in place, not duplicated
+    ingest_tweets([dict(tweet, likes=5), dict(undated, likes=5)])
+    with db.get_session() as session:
+        assert session.query(Tweet.tweet_id, Tweet.likes).all() == [('1', 5)]
+    assert skipped('tweets') - before == 2
+
+def test_market_fetch_holds_no_connection(db, monkeypatch):
+    with db.get_session() as session:
+        session.add_all([MigratedCoin(id=i, coin_name=f"Coin {i}", coin_symbol=f"C{i}",
+                                      contract_address=f"Mint{i}") for i in range(1, 4)])
+        session.commit()
+
+    checked_out = []
+
+    async def fetch_market_updates(coins, fetcher):
+        checked_out.append(db.engine.pool.checkedout())
+        return [{'coin_pk': coin_id, 'new_market_cap': 1000.0 * coin_id, 'new_volume': 1.0,
+                 'new_price': 0.5, 'new_holders': 10} for coin_id, _ in coins], 0
+
+    monkeypatch.setattr(data_fetcher, 'fetch_market_updates', fetch_market_updates)
+    update_market_data()
+    assert checked_out == [0]
+    with db.get_session() as session:
+        assert session.query(MigratedCoin.id, MigratedCoin.market_cap).order_by(MigratedCoin.id).all() == \
+            [(1, 1000.0), (2, 2000.0), (3, 3000.0)]
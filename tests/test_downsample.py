@@ -0,0 +1,78 @@
+import datetime
+import numpy as np
+from utils.downsample import SeriesWindow, lttb, minmax
+
+NOW = datetime.datetime(2024, 1, 1, 12)
+
+def walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), rng.standard_normal(n).cumsum()
+
+def test_lttb_keeps_endpoints_within_threshold():
+    x, y = walk(10000)
+    for threshold in (3, 10, 800, 9999):
+        kept = lttb(x, y, threshold)
+        assert len(kept) <= threshold
+        assert kept[0] == 0 and kept[-1] == len(x) - 1
+        assert (np.diff(kept) > 0).all()
+    # Nothing to drop
+    assert (lttb(x[:50], y[:50], 800) == np.arange(50)).all()
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    _, y = walk(3000, seed=1)
+    keys = np.repeat([1, 2, 3], 1000)
+    x = np.tile(np.arange(1000, dtype=np.int64), 3)
+    buckets = 25
+    kept = set(minmax(keys, x, y, 0, 1000, buckets).tolist())
+    for key in (1, 2, 3):
+        series = np.flatnonzero(keys == key)
+        assert {series[0], series[-1]} <= kept
+        for bucket in np.array_split(series, buckets):
+            assert bucket[y[bucket].argmin()] in kept
+            assert bucket[y[bucket].argmax()] in kept
+    assert len(kept) <= 3 * (2 * buckets + 2)
+
+class Ticks:
+    """Loader over per-coin minute ticks up to a moving now"""
+
+    def __init__(self, coins=3):
+        self.coins = coins
+        self.now = NOW
+
+    def __call__(self, start):
+        minutes = np.arange(np.datetime64(NOW - datetime.timedelta(hours=6), 'm'),
+                            np.datetime64(self.now, 'm') + 1).astype('datetime64[us]')
+        if start is not None:
+            minutes = minutes[minutes >= np.datetime64(start)]
+        timestamps = np.tile(minutes, self.coins)
+        coin_ids = np.repeat(np.arange(1, self.coins + 1), len(minutes))
+        values = np.sin(timestamps.astype(np.int64) / 6e8) * coin_ids
+        return {'coin_id': coin_ids, 'timestamp': timestamps, 'value': values}
+
+def assert_same(series, expected):
+    assert series.keys() == expected.keys()
+    for name in expected:
+        assert (series[name] == expected[name]).all(), name
+
+def test_appending_refresh_matches_a_full_reload():
+    ticks = Ticks()
+    window = SeriesWindow(ticks, datetime.timedelta(hours=2), points=1000)
+    for step in range(5):
+        ticks.now = NOW + datetime.timedelta(minutes=7 * step)
+        appended = window.refresh(ticks.now)
+        reloaded = SeriesWindow(ticks, window.span, points=1000).refresh(ticks.now)
+        assert_same(appended, reloaded)
+    assert window.stats['full_loads'] == 1
+    assert window.stats['appends'] == 4
+
+def test_appending_refresh_stays_downsampled():
+    ticks = Ticks()
+    window = SeriesWindow(ticks, datetime.timedelta(hours=4), points=50)
+    for step in range(5):
+        ticks.now = NOW + datetime.timedelta(minutes=7 * step)
+        series = window.refresh(ticks.now)
+        for coin_id in (1, 2, 3):
+            timestamps = series['timestamp'][series['coin_id'] == coin_id]
+            assert len(timestamps) <= 50
+            # The newest tick is always shown
+            assert timestamps[-1] == np.datetime64(ticks.now)
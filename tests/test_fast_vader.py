@@ -0,0 +1,67 @@
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from bench.bench_vader import corpus
+from utils import sentiment_analyzer
+from utils.fast_vader import CRYPTO_SLANG, FastVader
+from utils.sentiment_cache import SentimentCache, text_hash
+
+# One or more sentences per rule FastVader reimplements
+RULE_SENTENCES = [
+    # Boosters and dampeners, in and out of caps
+    'the dev is extremely good', 'the dev is EXTREMELY good', 'the chart is barely good',
+    'it is kinda bad', 'it is sorta great', 'the team is hardly nice',
+    # ALL-CAPS emphasis next to lower case words
+    'this coin is GREAT', 'GREAT', 'THIS COIN IS GREAT',
+    # Negation up to three words back
+    'not good', 'not very good', "isn't really very good", 'never so good',
+    'no way it is good', "don't think it's that bad", 'not the least bit good',
+    'without doubt good', 'at least good', 'this is not bad',
+    # 'kind of', 'least' and 'so' special cases
+    'kind of good', 'sort of bad', 'least good', 'never so bad',
+    # 'but' weighs the clause after it more
+    'the chart is good but the dev is bad', 'bad team BUT great coin', 'good but',
+    # Idioms
+    'yeah right', 'kiss of death', 'the shit', 'the bomb', 'bad ass', 'to die for',
+    'beating heart', 'under the bus', 'cut the mustard', 'hand to mouth',
+    # Emoji and emoticons
+    'great😁', '😁😁 great', '💘', 'gm :)', 'rekt :(', 'lol :D', '<3',
+    # Punctuation emphasis
+    'good!', 'good!!!', 'good!!!!!!', 'good?', 'good???', 'good?!', 'bad!!!',
+    # Empty and punctuation-only text
+    '', '   ', '!!!', '...',
+]
+
+@pytest.fixture(scope='module')
+def stock():
+    return SentimentIntensityAnalyzer()
+
+def compound(stock, texts):
+    return [stock.polarity_scores(text)['compound'] for text in texts]
+
+def test_rule_sentences_match_stock_vader(stock):
+    assert FastVader(overlay=None).score_many(RULE_SENTENCES) == compound(stock, RULE_SENTENCES)
+
+def test_generated_corpus_matches_stock_vader(stock):
+    texts = corpus(4000)
+    actual = FastVader(overlay=None).score_many(texts)
+    mismatches = [(text, want, got) for text, want, got in zip(texts, compound(stock, texts), actual)
+                  if want != got]
+    assert mismatches == []
+
+def test_overlay_changes_the_fingerprint_and_cache_key():
+    plain, slang = FastVader(overlay=None), FastVader(CRYPTO_SLANG)
+    assert plain.fingerprint == ''
+    assert slang.fingerprint and slang.fingerprint == FastVader(dict(CRYPTO_SLANG)).fingerprint
+    assert FastVader({'wagmi': 1.0}).fingerprint != slang.fingerprint
+    text = 'wagmi fam'
+    assert plain.score(text) != slang.score(text)
+    assert text_hash(text, plain.fingerprint) != text_hash(text, slang.fingerprint)
+
+def test_cached_scores_follow_the_overlay(monkeypatch):
+    cache = SentimentCache(persistent=False)
+    scores = {}
+    for overlay in (None, CRYPTO_SLANG):
+        monkeypatch.setattr(sentiment_analyzer, '_analyzer', FastVader(overlay))
+        scores[bool(overlay)], _ = sentiment_analyzer.score_with_cache(['wagmi fam'], cache=cache)
+    assert scores[False] != scores[True]
+    assert scores[True] == [FastVader(CRYPTO_SLANG).score('wagmi fam')]
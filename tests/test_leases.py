@@ -0,0 +1,92 @@
+import datetime
+import threading
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select, update
+from utils.db_pool import DatabasePool
+from utils.leases import DistributedJob, LeaseWorker
+from utils.models import JobShard
+
+NOW = datetime.datetime(2024, 1, 1, 12)
+INTERVAL = 3600
+
+_metadata = MetaData()
+effects = Table(
+    'test_shard_effects', _metadata,
+    Column('shard', Integer),
+    Column('owner', String(128)),
+)
+
+@pytest.fixture(autouse=True)
+def effects_table(db):
+    _metadata.create_all(db.engine)
+
+def plan(session, shards):
+    return [(shard, shard + 1) for shard in range(shards)]
+
+def write_effect(session, range_start, range_end, fence):
+    session.execute(effects.insert().values(shard=range_start, owner='handler'))
+
+def commit_own_session():
+    """What task functions do: commit (and close) the thread's shared session"""
+    with DatabasePool().get_session() as own:
+        own.execute(select(1))
+        own.commit()
+
+def effect_counts(db):
+    with db.engine.connect() as conn:
+        return dict(conn.execute(select(effects.c.shard, func.count()).group_by(effects.c.shard)).all())
+
+def shard_states(db):
+    with db.engine.connect() as conn:
+        return dict(conn.execute(
+            select(JobShard.state, func.count()).group_by(JobShard.state)
+        ).all())
+
+def worker(handler, shards=4, **options):
+    jobs = {'test': DistributedJob(handler, shards, plan=plan)}
+    return LeaseWorker(jobs=jobs, poll=0.01, **options)
+
+def test_each_shard_applies_once_across_workers(db):
+    def handler(session, range_start, range_end, fence):
+        write_effect(session, range_start, range_end, fence)
+        commit_own_session()
+
+    workers = [worker(handler, shards=8, worker_id=f"w{i}") for i in range(3)]
+    threads = [threading.Thread(target=w.run_round, args=('test', INTERVAL, NOW)) for w in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert effect_counts(db) == {shard: 1 for shard in range(8)}
+    assert shard_states(db) == {'done': 8}
+
+    # A later worker in the same round finds nothing left to do
+    assert worker(handler, shards=8).run_round('test', INTERVAL, NOW)['processed'] == 0
+    assert effect_counts(db) == {shard: 1 for shard in range(8)}
+
+def test_expired_lease_is_reclaimed_once(db):
+    crashed = worker(write_effect, lease_ttl=datetime.timedelta(seconds=-1), worker_id='crashed')
+    started = NOW.replace(minute=0)
+    crashed.ensure_round('test', started)
+    # Claimed, then the worker dies: no heartbeat, and the lease is already expired
+    assert crashed.claim('test', started) is not None
+
+    summary = worker(write_effect, worker_id='survivor').run_round('test', INTERVAL, NOW)
+    assert summary['processed'] == 4
+    assert effect_counts(db) == {shard: 1 for shard in range(4)}
+    with db.engine.connect() as conn:
+        attempts = conn.execute(select(JobShard.shard, JobShard.attempts).order_by(JobShard.shard)).all()
+    assert [count for _, count in attempts] == [2, 1, 1, 1]
+
+def test_lost_lease_discards_the_shard_even_if_the_handler_commits(db):
+    def handler(session, range_start, range_end, fence):
+        # Another worker takes the shard over and finishes it while this one works
+        with db.engine.begin() as conn:
+            conn.execute(update(JobShard.__table__).where(JobShard.shard == range_start)
+                         .values(owner='other', state='done'))
+        write_effect(session, range_start, range_end, fence)
+        commit_own_session()
+
+    summary = worker(handler, shards=1).run_round('test', INTERVAL, NOW)
+    assert summary['processed'] == 0
+    assert effect_counts(db) == {}
@@ -0,0 +1,44 @@
+import datetime
+from sqlalchemy import select
+from utils.market_history import record_market_snapshots
+from utils.models import MarketBar, MarketSnapshot
+
+NOW = datetime.datetime(2024, 1, 1, 12)
+
+def snapshots(start, count, coins=3):
+    return [
+        {'coin_id': coin_id, 'timestamp': NOW + datetime.timedelta(minutes=5 * i),
+         'price': 1.0 + i / 10 + coin_id, 'market_cap': 1000.0 * (i + 1), 'volume': 10.0 * (i + 1), 'holders': i}
+        for i in range(start, start + count)
+        for coin_id in range(1, coins + 1)
+    ]
+
+def bars(db):
+    with db.engine.connect() as conn:
+        return sorted(tuple(row) for row in conn.execute(select(MarketBar.__table__)).all())
+
+def record(db, rows):
+    with db.get_session() as session:
+        written = record_market_snapshots(session, rows)
+        session.commit()
+    return written
+
+def test_replayed_snapshots_leave_bars_unchanged(db):
+    assert record(db, snapshots(0, 12)) == 36
+    before = bars(db)
+    assert record(db, snapshots(0, 12)) == 0
+    assert bars(db) == before
+
+def test_overlapping_refetch_merges_only_new_snapshots(db):
+    record(db, snapshots(0, 6))
+    # Half of this batch is already stored, and one snapshot is sent twice
+    overlap = snapshots(3, 6)
+    assert record(db, overlap + overlap[-1:]) == 9
+
+    merged = bars(db)
+    # The same bars as recording the nine distinct snapshots once
+    with db.engine.begin() as conn:
+        conn.execute(MarketBar.__table__.delete())
+        conn.execute(MarketSnapshot.__table__.delete())
+    record(db, snapshots(0, 9))
+    assert bars(db) == merged
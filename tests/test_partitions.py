@@ -0,0 +1,33 @@
+import datetime
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine
+from utils.db_pool import Base
+from utils.models import Tweet
+from utils.partitions import check_unique_keys, create_partitioned_tables, period_start
+
+def test_models_only_declare_keys_with_the_partition_column():
+    check_unique_keys(Base.metadata)
+
+def test_column_level_unique_is_rejected():
+    metadata = MetaData()
+    Table('tweets', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('tweet_id', String, unique=True),
+          Column('created_at', DateTime))
+    with pytest.raises(ValueError, match='tweet_id'):
+        create_partitioned_tables(create_engine('sqlite://'), metadata)
+
+def test_sqlite_tweets_use_the_composite_key():
+    engine = create_engine('sqlite://')
+    Tweet.__table__.create(engine)
+    row = {'coin_id': 1, 'tweet_id': '1', 'content': 'gm', 'created_at': datetime.datetime(2024, 1, 1)}
+    with engine.begin() as conn:
+        conn.execute(Tweet.__table__.insert(), [row, dict(row, created_at=datetime.datetime(2024, 2, 1))])
+    with pytest.raises(Exception):
+        with engine.begin() as conn:
+            conn.execute(Tweet.__table__.insert(), [row])
+
+def test_period_start():
+    timestamp = datetime.datetime(2024, 3, 17, 12, 30)
+    assert period_start(timestamp, 'month') == datetime.datetime(2024, 3, 1)
+    assert period_start(timestamp, 'day') == datetime.datetime(2024, 3, 17)
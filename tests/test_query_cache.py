@@ -0,0 +1,65 @@
+import threading
+import time
+from utils.query_cache import QueryCache
+
+def loader(results, during=None):
+    """Loader returning the next of results, running during() while it loads"""
+    calls = []
+
+    def load():
+        calls.append(1)
+        if during:
+            during()
+        return results[len(calls) - 1]
+    return load, calls
+
+def test_invalidation_during_a_load_drops_its_result():
+    cache = QueryCache()
+    load, _ = loader(['stale', 'fresh'], during=lambda: cache.invalidate('coins'))
+    assert cache.get_or_load('q', 'key', 60, ('coins',), load) == 'stale'
+    load_again, _ = loader(['fresh'])
+    assert cache.get_or_load('q', 'key', 60, ('coins',), load_again) == 'fresh'
+    assert cache.get_or_load('q', 'key', 60, ('coins',), load_again) == 'fresh'
+
+def test_clearing_everything_during_a_load_drops_its_result():
+    cache = QueryCache()
+    load, _ = loader(['stale'], during=cache.invalidate)
+    cache.get_or_load('q', 'key', 60, ('coins',), load)
+    assert cache.stats()['q']['misses'] == 1
+    load_again, calls = loader(['fresh'])
+    assert cache.get_or_load('q', 'key', 60, ('coins',), load_again) == 'fresh'
+    assert calls == [1]
+
+def test_other_tags_do_not_drop_the_result():
+    cache = QueryCache()
+    load, _ = loader(['value'], during=lambda: cache.invalidate('sentiment'))
+    cache.get_or_load('q', 'key', 60, ('coins',), load)
+    unused, calls = loader(['other'])
+    assert cache.get_or_load('q', 'key', 60, ('coins',), unused) == 'value'
+    assert calls == []
+
+def test_key_locks_are_released_after_loads():
+    cache = QueryCache()
+    for i in range(100):
+        cache.get_or_load('q', ('key', i), 60, (), lambda: i)
+    assert cache._key_locks == {}
+
+def test_concurrent_misses_share_one_load():
+    cache = QueryCache()
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('q', 'key', 60, (), load)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['value'] * 8
+    assert calls == [1]
+    assert cache._key_locks == {}
@@ -0,0 +1,140 @@
+import datetime
+import pytest
+from utils.scheduler import Job, TaskScheduler
+
+WALL = datetime.datetime(2024, 1, 1)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ManualExecutor:
+    """Holds submitted runs until run_all(), so a test controls when jobs finish"""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def run_all(self):
+        while self.pending:
+            fn, args = self.pending.pop(0)
+            fn(*args)
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def executor():
+    return ManualExecutor()
+
+@pytest.fixture
+def scheduler(clock, executor):
+    scheduler = TaskScheduler(clock=clock, now=lambda: WALL, executor=executor, tick=3600, default_jobs=False)
+    yield scheduler
+    scheduler.stop()
+
+def add(scheduler, func=lambda: None, interval=10, **options):
+    return scheduler.add_job(Job('Test', func, interval, 'Every 10s', **options))
+
+def test_no_default_jobs(scheduler):
+    assert scheduler.jobs == {}
+
+def test_runs_when_due(scheduler, clock, executor):
+    calls = []
+    add(scheduler, lambda: calls.append(clock()))
+    scheduler.run_pending()
+    assert executor.pending == []
+
+    clock.now = 10
+    scheduler.run_pending()
+    clock.now = 12
+    executor.run_all()
+    status = scheduler.get_task_status()['Test']
+    assert calls == [12]
+    assert status['status'] == 'succeeded'
+    assert status['last_duration'] == 2
+    assert status['last_run'] == WALL
+    assert status['runs'] == 1
+
+def test_next_run_catches_up_missed_ticks(scheduler, clock, executor):
+    add(scheduler)
+    scheduler.start()
+    clock.now = 35
+    scheduler.run_pending()
+    assert len(executor.pending) == 1
+    # Due again at 40, five seconds after the fake clock
+    assert scheduler.get_task_status()['Test']['next_run'] == WALL + datetime.timedelta(seconds=5)
+
+def test_next_run_hidden_when_stopped(scheduler):
+    add(scheduler)
+    assert scheduler.get_task_status()['Test']['next_run'] is None
+
+def test_skip_overlapping_run(scheduler, clock, executor):
+    add(scheduler, overlap='skip', timeout=100)
+    clock.now = 10
+    scheduler.run_pending()
+    clock.now = 20
+    scheduler.run_pending()
+    status = scheduler.get_task_status()['Test']
+    assert status['skips'] == 1
+    assert status['last_dispatch'] == 'skipped'
+
+    executor.run_all()
+    assert scheduler.get_task_status()['Test']['runs'] == 1
+
+def test_queue_overlapping_run(scheduler, clock, executor):
+    add(scheduler, overlap='queue', timeout=100)
+    clock.now = 10
+    scheduler.run_pending()
+    clock.now = 20
+    scheduler.run_pending()
+    clock.now = 30
+    scheduler.run_pending()
+    status = scheduler.get_task_status()['Test']
+    # At most one run is queued; the third tick is skipped
+    assert status['last_dispatch'] == 'skipped'
+    assert status['skips'] == 1
+
+    executor.run_all()
+    status = scheduler.get_task_status()['Test']
+    assert status['runs'] == 2
+    assert status['status'] == 'succeeded'
+
+def test_timed_out(scheduler, clock, executor):
+    add(scheduler, timeout=5)
+    clock.now = 10
+    scheduler.run_pending()
+    clock.now = 16
+    scheduler.run_pending()
+    assert scheduler.get_task_status()['Test']['status'] == 'timed_out'
+
+    executor.run_all()
+    status = scheduler.get_task_status()['Test']
+    assert status['status'] == 'timed_out'
+    assert status['last_duration'] == 6
+    assert status['failures'] == 0
+
+def test_failed(scheduler, clock, executor):
+    def fail():
+        raise RuntimeError('boom')
+
+    add(scheduler, fail)
+    clock.now = 10
+    scheduler.run_pending()
+    executor.run_all()
+    status = scheduler.get_task_status()['Test']
+    assert status['status'] == 'failed'
+    assert status['last_error'] == 'boom'
+    assert status['failures'] == 1
+
+    # A failed job is still scheduled again
+    clock.now = 20
+    scheduler.run_pending()
+    executor.run_all()
+    assert scheduler.get_task_status()['Test']['runs'] == 2
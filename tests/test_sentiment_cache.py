@@ -0,0 +1,53 @@
+import datetime
+from bench import synthetic
+from utils.sentiment_analyzer import get_analyzer, score_with_cache
+from utils.sentiment_cache import SentimentCache, text_hash
+
+ADDRESS = '7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr'
+
+VARIANTS = [
+    'this coin is GREAT',
+    'this coin is great',
+    'this  coin is great ',
+    'THIS COIN IS GREAT',
+    '$MOON is great',
+    '$PEPE is great',
+    '$pepe is great',
+    'great project https://t.co/abc',
+    'great project https://t.co/abc?ref=1!!',
+    'great project https://t.co/xyz',
+    f"great project {ADDRESS}",
+    f"great project {ADDRESS[::-1]}",
+    'great project!!',
+    'great project https://t.co/abc!!',
+]
+
+def scores_through(cache, texts):
+    scores, _ = score_with_cache(texts, cache=cache)
+    return scores
+
+def test_cached_scores_match_uncached():
+    analyzer = get_analyzer()
+    uncached = [analyzer.score(text) for text in VARIANTS]
+    cache = SentimentCache(persistent=False)
+    # Scored in both orders, so whichever variant is seen first fills the cache
+    assert scores_through(cache, VARIANTS) == uncached
+    assert scores_through(cache, VARIANTS[::-1]) == uncached[::-1]
+    assert cache.stats()['hits'] > 0
+
+def test_synthetic_corpus_cached_scores_match_uncached():
+    now = datetime.datetime(2024, 1, 1)
+    rows = synthetic.tweets(3000, synthetic.coins(50, now), now)
+    texts = [row['content'] for row in rows]
+    analyzer = get_analyzer()
+    assert scores_through(SentimentCache(persistent=False), texts) == [analyzer.score(text) for text in texts]
+
+def test_case_variants_get_their_own_key():
+    assert text_hash('this coin is GREAT') != text_hash('this coin is great')
+    assert text_hash('$PEPE is great') != text_hash('$WIF is great')
+
+def test_score_neutral_variants_share_a_key():
+    assert text_hash('this  coin is great ') == text_hash('this coin is great')
+    assert text_hash('gm https://t.co/abc') == text_hash('gm https://t.co/xyz')
+    assert text_hash('gm https://t.co/abc?x') != text_hash('gm https://t.co/abc')
+    assert text_hash(f"gm {ADDRESS}") == text_hash(f"gm {ADDRESS[::-1]}")
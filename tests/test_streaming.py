@@ -0,0 +1,38 @@
+import asyncio
+from utils.streaming import StreamIngestor
+
+def enrich(events):
+    """Run the enrich stage over events; returns the ingestor and what it passed on"""
+    ingestor = StreamIngestor('ws://feed.invalid', enrich=False)
+
+    async def run():
+        ingestor._received = asyncio.Queue()
+        ingestor._enriched = asyncio.Queue()
+        for event in events:
+            ingestor._received.put_nowait(event)
+        ingestor._received.put_nowait(None)
+        await ingestor._enrich(fetcher=None)
+        passed = []
+        while (event := ingestor._enriched.get_nowait()) is not None:
+            passed.append(event)
+        return passed
+
+    return ingestor, asyncio.run(run())
+
+def test_malformed_payloads_are_counted_and_dropped():
+    tweet = {'tweet_id': '1', 'coin_id': 7, 'content': 'gm', 'created_at': 1718000000}
+    ingestor, passed = enrich([
+        {'id': 1, 'type': 'migration'},
+        {'id': 2, 'type': 'tweet', 'data': None},
+        {'id': 3, 'type': 'tweet', 'data': dict(tweet, created_at='yesterday')},
+        {'id': 4, 'type': 'tweet', 'data': dict(tweet, likes='many')},
+        {'id': 5, 'type': 'tweet', 'data': tweet},
+        {'id': 6, 'type': 'migration', 'data': {'symbol': 'NOMINT'}},
+        {'id': 7, 'type': 'tweet', 'data': dict(tweet, created_at=None)},
+        {'id': 8, 'type': 'migration', 'data': {'mint': 'Mint1', 'symbol': 'UNDATED'}},
+    ])
+    assert ingestor.stats['malformed'] == 4
+    assert [event['id'] for event in passed] == [5, 6, 7, 8]
+    assert passed[0]['row']['coin_id'] == 7
+    # Without a mint or a timestamp the event is passed on and skipped when written
+    assert [event['row'] for event in passed[1:]] == [None, None, None]
@@ -0,0 +1,384 @@
+import datetime
+import logging
+import math
+import os
+from sqlalchemy import func, select
+from utils.db_pool import DatabasePool, dialect_insert, execute_values
+from utils.instrumentation import timed
+from utils.models import Alert, CoinAlertState, MigratedCoin
+from utils.notifier import PartialDelivery, get_notifier
+
+logger = logging.getLogger(__name__)
+
+# Smoothing for the per-coin volume and sentiment averages
+VOLUME_ALPHA = float(os.getenv('ALERT_VOLUME_ALPHA', 0.1))
+SENTIMENT_ALPHA = float(os.getenv('ALERT_SENTIMENT_ALPHA', 0.02))
+# Observations needed before a coin's averages are trusted
+MIN_SAMPLES = int(os.getenv('ALERT_MIN_SAMPLES', 20))
+COOLDOWN = datetime.timedelta(minutes=int(os.getenv('ALERT_COOLDOWN_MINUTES', 60)))
+
+RULE_THRESHOLDS = {
+    # Higher than the batch analytics: a short EWMA variance is itself noisy
+    'volume_z': 4.0,
+    'price_move': 0.25,
+    'sentiment_z': 3.0,
+    'min_tweets': 5,
+    # Only migrations newer than this alert (avoids a flood on first run)
+    'migration_window': datetime.timedelta(hours=12),
+}
+
+# Minimum time between two alerts of the same kind for the same coin
+COOLDOWNS = {
+    'volume_spike': COOLDOWN,
+    'price_move': COOLDOWN,
+    'sentiment_spike': COOLDOWN,
+    'new_migration': datetime.timedelta(days=365),
+    # Only fired from the market analytics (on_analytics)
+    'mention_spike': COOLDOWN,
+    'rank_jump': COOLDOWN,
+}
+
+NOTIFY_BATCH_SIZE = 50
+NOTIFY_MAX_AGE = datetime.timedelta(days=1)
+_IN_BATCH = 500
+
+_STATE_FIELDS = [column.name for column in CoinAlertState.__table__.columns]
+
+def ewm_update(mean, var, samples, value, alpha):
+    """
+    One O(1) update of an exponentially weighted mean and variance
+
+    Returns:
+        tuple: (mean, var, samples)
+    """
+    if not samples or mean is None:
+        return value, 0.0, 1
+    diff = value - mean
+    increment = alpha * diff
+    return mean + increment, (1 - alpha) * ((var or 0.0) + diff * increment), samples + 1
+
+def zscore(value, mean, var, samples=None, alpha=None):
+    """
+    z-score against a running mean/variance; with samples and alpha the
+    variance is corrected for its zero start in ewm_update
+    """
+    if mean is None or not var or var <= 0:
+        return None
+    if samples and alpha:
+        var /= 1 - (1 - alpha) ** (samples - 1)
+    return (value - mean) / math.sqrt(var)
+
+def _chunks(items, size=_IN_BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class AlertEngine:
+    """
+    Incremental alert rules evaluated as data is ingested
+
+    Each coin has a CoinAlertState row holding an exponentially weighted
+    mean/variance of its log volume and tweet sentiment, its last price and the
+    last migration seen. The on_* hooks are called by the ingestion tasks
+    inside their transaction with just the new rows: they load the state
+    for the coins involved, evaluate the rules against it, update it in
+    O(1) per row and persist any alerts that are not within the cooldown of
+    an earlier alert of the same kind for the same coin. notify() is called
+    after commit and delivers undelivered alerts in batches.
+
+    Args:
+        notifier: Notifier to deliver alerts (default: from ALERT_NOTIFIER)
+        thresholds (dict): Rule thresholds, see RULE_THRESHOLDS
+        cooldowns (dict): Alert kind -> timedelta
+        clock: Returns the current UTC time
+    """
+
+    def __init__(self, notifier=None, thresholds=RULE_THRESHOLDS, cooldowns=COOLDOWNS,
+                 volume_alpha=VOLUME_ALPHA, sentiment_alpha=SENTIMENT_ALPHA,
+                 min_samples=MIN_SAMPLES, clock=datetime.datetime.utcnow):
+        self._notifier = notifier
+        self._notifier_loaded = notifier is not None
+        self.thresholds = thresholds
+        self.cooldowns = cooldowns
+        self.volume_alpha = volume_alpha
+        self.sentiment_alpha = sentiment_alpha
+        self.min_samples = min_samples
+        self._clock = clock
+        self.stats = {'evaluated': 0, 'fired': 0, 'suppressed': 0, 'notified': 0, 'notify_failures': 0}
+
+    @property
+    def notifier(self):
+        if not self._notifier_loaded:
+            self._notifier = get_notifier()
+            self._notifier_loaded = True
+        return self._notifier
+
+    @timed('alerts.market')
+    def on_market_data(self, session, snapshots):
+        """
+        Evaluate volume and price rules for new market snapshots
+
+        Args:
+            snapshots (list): Dicts with coin_id, timestamp, price and volume
+
+        Returns:
+            list: Alerts fired
+        """
+        states = self._load_states(session, {snap['coin_id'] for snap in snapshots})
+        candidates = []
+        for snap in snapshots:
+            state = states.get(snap['coin_id'])
+            if state is None:
+                continue
+            volume, price = snap.get('volume'), snap.get('price')
+
+            if volume is not None:
+                # Volumes are heavy-tailed, so the average is kept on a log scale
+                volume = math.log1p(max(volume, 0))
+                z = zscore(volume, state['volume_mean'], state['volume_var'],
+                           state['volume_samples'], self.volume_alpha)
+                if state['volume_samples'] >= self.min_samples and z is not None \
+                        and z >= self.thresholds['volume_z']:
+                    candidates.append(self._alert(
+                        state, 'volume_spike', z,
+                        f"Unusual volume for {state['coin_symbol']}: {z:+.1f} sd above its average"
+                    ))
+                state['volume_mean'], state['volume_var'], state['volume_samples'] = ewm_update(
+                    state['volume_mean'], state['volume_var'], state['volume_samples'],
+                    volume, self.volume_alpha
+                )
+
+            if price is not None:
+                if state['last_price']:
+                    change = price / state['last_price'] - 1
+                    if abs(change) >= self.thresholds['price_move']:
+                        candidates.append(self._alert(
+                            state, 'price_move', change,
+                            f"{state['coin_symbol']} moved {change:+.0%} since the last update"
+                        ))
+                state['last_price'] = price
+            state['market_updated_at'] = snap.get('timestamp')
+
+        self._save_states(session, states.values())
+        return self._fire(session, candidates, len(snapshots))
+
+    @timed('alerts.sentiment')
+    def on_sentiment(self, session, rows):
+        """
+        Evaluate the sentiment rule for newly scored tweets
+
+        A coin alerts when the mean score of its new tweets is more than
+        sentiment_z standard errors away from its running mean.
+
+        Args:
+            rows (list): (coin_id, created_at, sentiment, ...) tuples
+
+        Returns:
+            list: Alerts fired
+        """
+        scores = {}
+        for row in rows:
+            if row[0] is not None and row[2] is not None:
+                scores.setdefault(row[0], []).append(row[2])
+        states = self._load_states(session, scores)
+
+        candidates = []
+        for coin_id, values in scores.items():
+            state = states.get(coin_id)
+            if state is None:
+                continue
+            count = len(values)
+            if count >= self.thresholds['min_tweets'] and state['sentiment_samples'] >= self.min_samples:
+                batch_mean = sum(values) / count
+                z = zscore(batch_mean, state['sentiment_mean'], (state['sentiment_var'] or 0.0) / count,
+                           state['sentiment_samples'], self.sentiment_alpha)
+                if z is not None and abs(z) >= self.thresholds['sentiment_z']:
+                    direction = 'positive' if z > 0 else 'negative'
+                    candidates.append(self._alert(
+                        state, 'sentiment_spike', z,
+                        f"Sentiment for {state['coin_symbol']} turned {direction}: "
+                        f"{batch_mean:+.2f} over {count} tweets ({z:+.1f} sd)"
+                    ))
+            for value in values:
+                state['sentiment_mean'], state['sentiment_var'], state['sentiment_samples'] = ewm_update(
+                    state['sentiment_mean'], state['sentiment_var'], state['sentiment_samples'],
+                    value, self.sentiment_alpha
+                )
+
+        self._save_states(session, states.values())
+        return self._fire(session, candidates, len(rows))
+
+    @timed('alerts.migrations')
+    def on_migrations(self, session, coins):
+        """
+        Alert on migrations not seen before
+
+        Args:
+            coins (list): Dicts with coin_id and migration_date
+
+        Returns:
+            list: Alerts fired
+        """
+        states = self._load_states(session, {coin['coin_id'] for coin in coins})
+        horizon = self._clock() - self.thresholds['migration_window']
+        candidates = []
+        for coin in coins:
+            state = states.get(coin['coin_id'])
+            if state is None:
+                continue
+            migrated = coin.get('migration_date')
+            if migrated is None or (state['last_migration_at'] and migrated <= state['last_migration_at']):
+                continue
+            if migrated >= horizon:
+                candidates.append(self._alert(
+                    state, 'new_migration', None, f"New migration detected: {state['coin_symbol']}"
+                ))
+            state['last_migration_at'] = migrated
+
+        self._save_states(session, states.values())
+        return self._fire(session, candidates, len(coins))
+
+    def on_analytics(self, session, alerts):
+        """
+        Store alert records from utils.analytics.detect_alerts
+
+        The batch analytics cover rules the incremental ones do not
+        (mention_spike, rank_jump); its alerts go through the same cooldowns,
+        so a spike both paths see is stored once.
+
+        Returns:
+            list: Alerts fired
+        """
+        candidates = [
+            {key: alert[key] for key in ('coin_id', 'kind', 'value', 'message', 'created_at')}
+            for alert in alerts
+        ]
+        return self._fire(session, candidates, len(candidates))
+
+    @timed('alerts.notify')
+    def notify(self, batch_size=NOTIFY_BATCH_SIZE):
+        """
+        Deliver undelivered alerts in batches through the notifier
+
+        Alerts are marked as notified only after their batch was sent, so a
+        failed batch is retried on the next call; after a PartialDelivery
+        only the alerts not delivered are. Alerts older than NOTIFY_MAX_AGE
+        are not sent.
+
+        Returns:
+            int: Number of alerts delivered
+        """
+        notifier = self.notifier
+        if notifier is None:
+            return 0
+
+        sent = 0
+        now = self._clock()
+        with DatabasePool().get_session() as session:
+            while True:
+                rows = session.query(
+                    Alert.id, Alert.coin_id, MigratedCoin.coin_symbol, Alert.kind,
+                    Alert.value, Alert.message, Alert.created_at
+                ).join(MigratedCoin, MigratedCoin.id == Alert.coin_id).filter(
+                    Alert.notified_at.is_(None),
+                    Alert.created_at >= now - NOTIFY_MAX_AGE
+                ).order_by(Alert.id).limit(batch_size).all()
+                if not rows:
+                    break
+                delivered, error = [row.id for row in rows], None
+                try:
+                    notifier.send([dict(row._mapping) for row in rows])
+                except PartialDelivery as e:
+                    delivered, error = [alert['id'] for alert in e.delivered], e
+                except Exception as e:
+                    delivered, error = [], e
+                if delivered:
+                    session.query(Alert).filter(Alert.id.in_(delivered)).update(
+                        {'notified_at': now}, synchronize_session=False
+                    )
+                    session.commit()
+                    sent += len(delivered)
+                if error is not None:
+                    self.stats['notify_failures'] += 1
+                    logger.error(f"Failed to deliver {len(rows) - len(delivered)} alerts: {error}")
+                    break
+
+        self.stats['notified'] += sent
+        if sent:
+            logger.info(f"Delivered {sent} alerts")
+        return sent
+
+    def _alert(self, state, kind, value, message):
+        return {
+            'coin_id': state['coin_id'],
+            'kind': kind,
+            'value': value,
+            'message': message,
+            'created_at': self._clock(),
+        }
+
+    def _load_states(self, session, coin_ids):
+        """State dicts (with coin_symbol) for coin_ids; new coins get empty state"""
+        table = CoinAlertState.__table__
+        states = {}
+        for chunk in _chunks(coin_ids):
+            query = select(MigratedCoin.id, MigratedCoin.coin_symbol, *table.c).select_from(
+                MigratedCoin.__table__.outerjoin(table, table.c.coin_id == MigratedCoin.id)
+            ).where(MigratedCoin.id.in_(chunk))
+            for row in session.execute(query):
+                state = {name: getattr(row, name) for name in _STATE_FIELDS}
+                state['coin_id'] = row.id
+                state['coin_symbol'] = row.coin_symbol
+                state['volume_samples'] = state['volume_samples'] or 0
+                state['sentiment_samples'] = state['sentiment_samples'] or 0
+                states[row.id] = state
+        return states
+
+    def _save_states(self, session, states):
+        rows = [{name: state[name] for name in _STATE_FIELDS} for state in states]
+        if not rows:
+            return
+        table = CoinAlertState.__table__
+        stmt = dialect_insert(session.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['coin_id'],
+            set_={name: stmt.excluded[name] for name in _STATE_FIELDS if name != 'coin_id'}
+        )
+        execute_values(session, stmt, rows)
+
+    def _fire(self, session, candidates, evaluated):
+        """Persist candidates that are outside their cooldown"""
+        self.stats['evaluated'] += evaluated
+        if not candidates:
+            return []
+
+        now = self._clock()
+        horizon = now - max(self.cooldowns.values())
+        last = {}
+        for chunk in _chunks({alert['coin_id'] for alert in candidates}):
+            for coin_id, kind, created_at in session.query(
+                Alert.coin_id, Alert.kind, func.max(Alert.created_at)
+            ).filter(
+                Alert.coin_id.in_(chunk),
+                Alert.created_at >= horizon
+            ).group_by(Alert.coin_id, Alert.kind):
+                last[(coin_id, kind)] = created_at
+
+        fired = []
+        for alert in candidates:
+            key = (alert['coin_id'], alert['kind'])
+            previous = last.get(key)
+            if previous is not None and alert['created_at'] - previous < self.cooldowns[alert['kind']]:
+                self.stats['suppressed'] += 1
+                continue
+            last[key] = alert['created_at']
+            fired.append(alert)
+
+        if fired:
+            session.execute(Alert.__table__.insert(), fired)
+            self.stats['fired'] += len(fired)
+            logger.info(f"Fired {len(fired)} alerts")
+        return fired
+
+# Shared by the ingestion tasks
+alert_engine = AlertEngine()
@@ -0,0 +1,264 @@
+import datetime
+import logging
+import warnings
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from utils.alert_engine import alert_engine
+from utils.db_pool import DatabasePool
+from utils.market_history import RESOLUTIONS, epoch_seconds, floor_time, market_history
+from utils.models import MigratedCoin, SentimentRollup
+
+logger = logging.getLogger(__name__)
+
+BAR = '15m'
+SENTIMENT_BAR = datetime.timedelta(hours=1)
+LOOKBACK = datetime.timedelta(days=30)
+
+# Return windows reported per coin
+RETURN_WINDOWS = {
+    'return_1h': datetime.timedelta(hours=1),
+    'return_24h': datetime.timedelta(hours=24),
+    'return_7d': datetime.timedelta(days=7),
+}
+# Window whose return ranks coins (and whose previous window gives rank_change)
+RANK_BY = 'return_24h'
+# History the latest volume / mentions / sentiment are compared against
+BASELINE = datetime.timedelta(days=7)
+
+ALERT_THRESHOLDS = {
+    'volume_z': 3.0,
+    'price_move': 0.25,
+    'mention_z': 3.0,
+    'sentiment_z': 3.0,
+    'min_tweets': 5,
+    'rank_change': 50,
+    'rank_top': 100,
+}
+
+def to_matrix(coin_ids, timestamps, columns, start, step, periods, coins=None):
+    """
+    Scatter long-format series into dense (coins x periods) float32 matrices
+
+    Args:
+        coin_ids (ndarray): Coin id per observation
+        timestamps (ndarray): datetime64 per observation
+        columns (list): Value arrays aligned with coin_ids
+        start (datetime): Start of the first period
+        step (timedelta): Period length
+        periods (int): Number of periods
+        coins (ndarray): Sorted coin ids defining the rows (default: all
+            coins present); observations of other coins are dropped
+
+    Returns:
+        tuple: (coins, list of matrices); cells without data are NaN
+    """
+    if coins is None:
+        coins = np.unique(coin_ids)
+    if not len(coins):
+        return coins, [np.empty((0, periods), dtype=np.float32) for _ in columns]
+    rows = np.searchsorted(coins, coin_ids)
+    cols = (timestamps.astype('datetime64[s]') - np.datetime64(start, 's')) // np.timedelta64(step)
+    keep = (coins[np.minimum(rows, len(coins) - 1)] == coin_ids) & (cols >= 0) & (cols < periods)
+
+    matrices = []
+    for values in columns:
+        matrix = np.full((len(coins), periods), np.nan, dtype=np.float32)
+        matrix[rows[keep], cols[keep]] = values[keep]
+        matrices.append(matrix)
+    return coins, matrices
+
+def ffill(matrix):
+    """Forward-fill NaNs along each row"""
+    index = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[1], dtype=np.int32))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return np.take_along_axis(matrix, index, axis=1)
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+def _zscore(latest, history):
+    """z-score of latest against the per-row mean/std of history"""
+    with warnings.catch_warnings():
+        # All-NaN rows (no history) are expected and yield NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(history, axis=1)
+        std = np.nanstd(history, axis=1)
+    return _ratio(latest - mean, std)
+
+def _rank(values):
+    """1-based descending rank; NaN ranks last"""
+    order = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind='stable')
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    return ranks
+
+def _periods(window, step):
+    return int(window / step)
+
+def compute_metrics(bars, sentiment=None, now=None, lookback=LOOKBACK):
+    """
+    Per-coin market and sentiment metrics for all coins at once
+
+    Args:
+        bars (dict): market_history() arrays with coin_id, timestamp, close
+            and volume (15m bars)
+        sentiment (dict): Hourly rollup arrays with coin_id, timestamp,
+            tweet_count and sentiment_sum (optional)
+        now (datetime): Evaluation time (default: utcnow)
+        lookback (timedelta): History covered by bars
+
+    Returns:
+        DataFrame: Indexed by coin_id with close, volume, return_1h,
+            return_24h, return_7d, volume_z, rank, rank_change, tweets,
+            sentiment, mention_z and sentiment_z
+    """
+    now = now or datetime.datetime.utcnow()
+    step = RESOLUTIONS[BAR]
+    periods = _periods(lookback, step) + 1
+    # The last period is the bar containing now
+    start = floor_time(now, BAR) - step * (periods - 1)
+
+    coins, (close, volume) = to_matrix(
+        bars['coin_id'], bars['timestamp'], [bars['close'], bars['volume']], start, step, periods
+    )
+    close = ffill(close)
+    latest = close[:, -1]
+
+    metrics = {'close': latest, 'volume': volume[:, -1]}
+    for name, window in RETURN_WINDOWS.items():
+        offset = _periods(window, step)
+        metrics[name] = _ratio(latest, close[:, -1 - offset]) - 1 if offset < periods else np.full(len(coins), np.nan)
+
+    offset = _periods(RETURN_WINDOWS[RANK_BY], step)
+    metrics['rank'] = _rank(metrics[RANK_BY])
+    if 2 * offset < periods:
+        previous = _ratio(close[:, -1 - offset], close[:, -1 - 2 * offset]) - 1
+        # Unranked in either window (e.g. newly listed): no rank change, not a jump from last place
+        metrics['rank_change'] = np.where(
+            np.isnan(previous) | np.isnan(metrics[RANK_BY]), np.nan, _rank(previous) - metrics['rank']
+        )
+    else:
+        metrics['rank_change'] = np.full(len(coins), np.nan)
+
+    baseline = min(_periods(BASELINE, step), periods - 1)
+    metrics['volume_z'] = _zscore(volume[:, -1], volume[:, -1 - baseline:-1])
+
+    if sentiment is not None and len(sentiment['coin_id']):
+        hours = _periods(BASELINE, SENTIMENT_BAR) + 1
+        _, (counts, sums) = to_matrix(
+            sentiment['coin_id'], sentiment['timestamp'],
+            [sentiment['tweet_count'], sentiment['sentiment_sum']],
+            floor_time(now, '1h') - SENTIMENT_BAR * (hours - 1), SENTIMENT_BAR, hours, coins=coins
+        )
+        counts = np.nan_to_num(counts)
+        means = _ratio(sums, counts)
+        metrics['tweets'] = counts[:, -1]
+        metrics['sentiment'] = means[:, -1]
+        metrics['mention_z'] = _zscore(counts[:, -1], counts[:, :-1])
+        metrics['sentiment_z'] = _zscore(means[:, -1], means[:, :-1])
+    else:
+        for name in ('tweets', 'sentiment', 'mention_z', 'sentiment_z'):
+            metrics[name] = np.full(len(coins), np.nan)
+
+    return pd.DataFrame(metrics, index=pd.Index(coins, name='coin_id'))
+
+def detect_alerts(metrics, now=None, symbols=None, thresholds=ALERT_THRESHOLDS):
+    """
+    Alert records for coins whose metrics cross the thresholds
+
+    Args:
+        metrics (DataFrame): Output of compute_metrics
+        symbols (dict): coin_id -> symbol used in messages
+
+    Returns:
+        list: Dicts with coin_id, coin_symbol, kind, value, message and
+            created_at, strongest signal first within each kind
+    """
+    now = now or datetime.datetime.utcnow()
+    symbols = symbols or {}
+    checks = [
+        ('volume_spike', 'volume_z', metrics['volume_z'] >= thresholds['volume_z'],
+         "Unusual volume for {symbol}: {value:+.1f} sd vs 7-day baseline"),
+        ('price_move', 'return_1h', metrics['return_1h'].abs() >= thresholds['price_move'],
+         "{symbol} moved {value:+.0%} in the last hour"),
+        ('mention_spike', 'mention_z',
+         (metrics['mention_z'] >= thresholds['mention_z']) & (metrics['tweets'] >= thresholds['min_tweets']),
+         "Tweet volume spike for {symbol}: {value:+.1f} sd"),
+        ('sentiment_spike', 'sentiment_z',
+         (metrics['sentiment_z'].abs() >= thresholds['sentiment_z']) & (metrics['tweets'] >= thresholds['min_tweets']),
+         "Sentiment shift for {symbol}: {value:+.1f} sd"),
+        ('rank_jump', 'rank_change',
+         (metrics['rank_change'] >= thresholds['rank_change']) & (metrics['rank'] <= thresholds['rank_top']),
+         "{symbol} climbed {value:.0f} places to #{rank} by 24h return"),
+    ]
+
+    alerts = []
+    for kind, column, mask, template in checks:
+        flagged = metrics.loc[mask.fillna(False).to_numpy()]
+        flagged = flagged.reindex(flagged[column].abs().sort_values(ascending=False).index)
+        for coin_id, row in flagged.iterrows():
+            symbol = symbols.get(coin_id, f"#{coin_id}")
+            alerts.append({
+                'coin_id': int(coin_id),
+                'coin_symbol': symbol,
+                'kind': kind,
+                'value': float(row[column]),
+                'message': template.format(symbol=symbol, value=row[column], rank=int(row['rank'])),
+                'created_at': now,
+            })
+    return alerts
+
+def load_sentiment_history(since=None, coin_ids=None):
+    """Hourly sentiment rollups since a time (None: all) as columnar arrays"""
+    engine = DatabasePool().engine
+    query = select(
+        SentimentRollup.coin_id,
+        epoch_seconds(SentimentRollup.bucket_start, engine.dialect.name),
+        SentimentRollup.tweet_count,
+        SentimentRollup.sentiment_sum
+    )
+    if since is not None:
+        query = query.where(SentimentRollup.bucket_start >= since)
+    if coin_ids is not None:
+        query = query.where(SentimentRollup.coin_id.in_(list(coin_ids)))
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+    columns = list(zip(*rows)) or [(), (), (), ()]
+    return {
+        'coin_id': np.array(columns[0], dtype=np.int64),
+        'timestamp': np.array(columns[1], dtype=np.int64).astype('datetime64[s]'),
+        'tweet_count': np.array(columns[2], dtype=float),
+        'sentiment_sum': np.array(columns[3], dtype=float),
+    }
+
+def run_analytics(now=None, lookback=LOOKBACK):
+    """
+    Compute metrics and alerts from the stored market and sentiment history
+
+    The alerts are stored through the alert engine (subject to its
+    cooldowns) and delivered after commit.
+
+    Returns:
+        tuple: (metrics DataFrame with a coin_symbol column, list of alerts)
+    """
+    now = now or datetime.datetime.utcnow()
+    bars = market_history(
+        start=now - lookback - RESOLUTIONS[BAR], end=now,
+        resolution=BAR, fields=('close', 'volume')
+    )
+    sentiment = load_sentiment_history(now - BASELINE - SENTIMENT_BAR)
+    metrics = compute_metrics(bars, sentiment, now, lookback)
+
+    with DatabasePool().get_session() as session:
+        symbols = dict(session.query(MigratedCoin.id, MigratedCoin.coin_symbol))
+        metrics['coin_symbol'] = metrics.index.map(symbols)
+        alerts = detect_alerts(metrics, now, symbols)
+        fired = alert_engine.on_analytics(session, alerts)
+        session.commit()
+    alert_engine.notify()
+    logger.info(f"Analytics computed for {len(metrics)} coins: {len(alerts)} alerts, {len(fired)} fired")
+    return metrics, alerts
@@ -0,0 +1,248 @@
+import datetime
+import logging
+import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from sqlalchemy import func, select
+from utils.models import Base
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')
+# A day is closed (and archived) once it ended this long ago
+ARCHIVE_LAG = datetime.timedelta(hours=int(os.getenv('ARCHIVE_LAG_HOURS', 24)))
+# Archived days re-checked against the database for late rows
+ARCHIVE_RECHECK_DAYS = int(os.getenv('ARCHIVE_RECHECK_DAYS', 7))
+
+ROW_GROUP_SIZE = 65536
+COMPRESSION = 'zstd'
+_READ_BATCH = 50000
+
+# Archived tables: day column, sort order inside a partition, Arrow schema.
+# Sorting by coin first keeps each coin in few row groups, whose min/max
+# statistics then let coin filters skip the rest.
+DATASETS = {
+    'tweets': {
+        'time': 'created_at',
+        'sort': ('coin_id', 'created_at'),
+        'schema': pa.schema([
+            ('id', pa.int64()), ('tweet_id', pa.string()), ('coin_id', pa.int32()),
+            ('content', pa.string()), ('sentiment', pa.float64()), ('created_at', pa.timestamp('us')),
+            ('likes', pa.int32()), ('retweets', pa.int32()),
+        ]),
+    },
+    'migrated_coins': {
+        'time': 'migration_date',
+        'sort': ('id',),
+        'schema': pa.schema([
+            ('id', pa.int32()), ('coin_name', pa.string()), ('coin_symbol', pa.string()),
+            ('migration_date', pa.timestamp('us')), ('market_cap', pa.float64()), ('volume', pa.float64()),
+            ('developer_id', pa.string()), ('twitter_handle', pa.string()), ('contract_status', pa.string()),
+            ('supply_bundled', pa.bool_()), ('contract_address', pa.string()),
+        ]),
+    },
+    'market_snapshots': {
+        'time': 'timestamp',
+        'sort': ('coin_id', 'timestamp'),
+        'schema': pa.schema([
+            ('coin_id', pa.int32()), ('timestamp', pa.timestamp('us')), ('price', pa.float64()),
+            ('market_cap', pa.float64()), ('volume', pa.float64()), ('holders', pa.int32()),
+        ]),
+    },
+    'market_bars': {
+        'time': 'bucket_start',
+        'sort': ('resolution', 'coin_id', 'bucket_start'),
+        'schema': pa.schema([
+            ('resolution', pa.string()), ('coin_id', pa.int32()), ('bucket_start', pa.timestamp('us')),
+            ('first_at', pa.timestamp('us')), ('last_at', pa.timestamp('us')),
+            ('open', pa.float64()), ('high', pa.float64()), ('low', pa.float64()), ('close', pa.float64()),
+            ('market_cap', pa.float64()), ('volume', pa.float64()), ('holders', pa.int32()),
+            ('samples', pa.int32()),
+        ]),
+    },
+}
+
+_PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+def partition_path(root, dataset, day):
+    return os.path.join(root, dataset, f"date={day}", 'part-0.parquet')
+
+def archived_counts(root, dataset):
+    """Rows per archived day, read from the Parquet footers"""
+    directory = os.path.join(root, dataset)
+    if not os.path.isdir(directory):
+        return {}
+    counts = {}
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry, 'part-0.parquet')
+        if entry.startswith('date=') and os.path.exists(path):
+            counts[entry[5:]] = pq.ParquetFile(path).metadata.num_rows
+    return counts
+
+def _day_start(day):
+    return datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time())
+
+def write_partition(conn, dataset, day, root):
+    """
+    Write one day of a table to its Parquet file
+
+    The file is written next to its final path and renamed over it, so a
+    partition is either the previous complete export or the new one.
+
+    Returns:
+        int: Rows written
+    """
+    spec = DATASETS[dataset]
+    schema = spec['schema']
+    table = Base.metadata.tables[dataset]
+    column = table.c[spec['time']]
+    start = _day_start(day)
+    stmt = select(*[table.c[name] for name in schema.names]).where(
+        column >= start, column < start + datetime.timedelta(days=1)
+    ).order_by(*[table.c[name] for name in spec['sort']])
+
+    path = partition_path(root, dataset, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    try:
+        with pq.ParquetWriter(staging, schema, compression=COMPRESSION) as writer:
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            for chunk in result.partitions(_READ_BATCH):
+                columns = list(zip(*chunk))
+                writer.write_batch(
+                    pa.record_batch([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                    schema=schema),
+                    row_group_size=ROW_GROUP_SIZE
+                )
+                rows += len(chunk)
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    return rows
+
+def export_dataset(engine, dataset, root, now=None, force=False, recheck_days=ARCHIVE_RECHECK_DAYS):
+    """
+    Archive the closed days of one table that are missing or out of date
+
+    A day is exported when it has no file yet or its row count in the
+    database differs from the archived one (late rows). Days older than the
+    last recheck_days archived ones are not compared again, so rows that
+    retention deleted stay archived. Rows updated in place after their day
+    was exported are only picked up with force, which rewrites every closed
+    day still in the database.
+
+    Returns:
+        dict: 'exported' days, 'rows' written and 'unchanged' days
+    """
+    now = now or datetime.datetime.utcnow()
+    spec = DATASETS[dataset]
+    table = Base.metadata.tables[dataset]
+    column = table.c[spec['time']]
+    closed = datetime.datetime.combine((now - ARCHIVE_LAG).date(), datetime.time())
+    archived = archived_counts(root, dataset)
+
+    day = func.date(column)
+    stmt = select(day, func.count()).where(column < closed).group_by(day)
+    if archived and not force:
+        stmt = stmt.where(column >= _day_start(max(archived)) - datetime.timedelta(days=recheck_days))
+
+    exported = []
+    rows = 0
+    with engine.connect() as conn:
+        counts = {str(key): count for key, count in conn.execute(stmt) if key is not None}
+        stale = sorted(key for key, count in counts.items() if force or archived.get(key) != count)
+        for key in stale:
+            rows += write_partition(conn, dataset, key, root)
+            exported.append(key)
+    if exported:
+        logger.info(f"Archived {rows} {dataset} rows in {len(exported)} days ({exported[0]} to {exported[-1]})")
+    return {'exported': exported, 'rows': rows, 'unchanged': len(counts) - len(stale)}
+
+def export_archive(engine=None, root=None, now=None, datasets=None, force=False):
+    """
+    Export the closed days of every archived table to root/<table>/date=YYYY-MM-DD/
+
+    Safe to re-run: unchanged days are skipped and rewritten days replace
+    their file atomically.
+
+    Returns:
+        dict: dataset -> export_dataset() stats
+    """
+    root = root or ARCHIVE_DIR
+    if not root:
+        raise ValueError("ARCHIVE_DIR is not set")
+    if engine is None:
+        from utils.db_pool import DatabasePool
+        engine = DatabasePool().engine
+    return {
+        dataset: export_dataset(engine, dataset, root, now, force)
+        for dataset in (datasets or DATASETS)
+    }
+
+class ArchiveReader:
+    """
+    Reads the Parquet archive without touching the database
+
+    Files are memory-mapped. Only the requested columns are decoded; day
+    partitions outside [start, end) are never opened and row groups whose
+    coin_id statistics exclude coin_ids are skipped.
+
+    Args:
+        root (str): Archive directory (default ARCHIVE_DIR)
+    """
+
+    def __init__(self, root=None):
+        self.root = root or ARCHIVE_DIR
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+
+    def partitions(self, dataset):
+        """Archived days of a dataset, oldest first"""
+        return sorted(archived_counts(self.root, dataset))
+
+    def scan(self, dataset, columns=None, coin_ids=None, start=None, end=None):
+        """
+        Matching rows as a pyarrow Table
+
+        Args:
+            columns (list): Columns to read (default all)
+            coin_ids (list): Only these coins ('id' for migrated_coins)
+            start, end (datetime): Only rows with start <= time < end
+        """
+        spec = DATASETS[dataset]
+        schema = spec['schema']
+        columns = list(columns or schema.names)
+        directory = os.path.join(self.root, dataset)
+        if not os.path.isdir(directory):
+            return schema.empty_table().select(columns)
+
+        time_field = ds.field(spec['time'])
+        conditions = []
+        if start is not None:
+            conditions += [ds.field('date') >= start.date().isoformat(), time_field >= start]
+        if end is not None:
+            conditions += [ds.field('date') <= end.date().isoformat(), time_field < end]
+        if coin_ids is not None:
+            key = 'id' if dataset == 'migrated_coins' else 'coin_id'
+            conditions.append(ds.field(key).isin(list(coin_ids)))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        source = ds.dataset(
+            directory, schema=schema.append(pa.field('date', pa.string())), format='parquet',
+            partitioning=_PARTITIONING, filesystem=self._filesystem
+        )
+        return source.to_table(columns=columns, filter=expression)
+
+    def read(self, dataset, columns=None, coin_ids=None, start=None, end=None):
+        """Matching rows as a pandas DataFrame (see scan)"""
+        return self.scan(dataset, columns, coin_ids, start, end).to_pandas()
+
+    def arrays(self, dataset, columns=None, coin_ids=None, start=None, end=None):
+        """Matching rows as {column: NumPy array} (see scan)"""
+        table = self.scan(dataset, columns, coin_ids, start, end)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+import aiohttp
+from dotenv import load_dotenv
+from utils.instrumentation import span
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 32))
+FETCH_RETRIES = int(os.getenv('FETCH_RETRIES', 3))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 10))
+
+# Upstream APIs: base URL, API key and requests/second allowed per host
+APIS = {
+    'pumpfun': {
+        'base_url': os.getenv('PUMPFUN_API_URL', 'https://frontend-api.pump.fun'),
+        'api_key': os.getenv('PUMPFUN_API_KEY'),
+        'rate': float(os.getenv('PUMPFUN_RATE_LIMIT', 10)),
+    },
+    'rugcheck': {
+        'base_url': os.getenv('RUGCHECK_API_URL', 'https://api.rugcheck.xyz/v1'),
+        'api_key': os.getenv('RUGCHECK_API_KEY'),
+        'rate': float(os.getenv('RUGCHECK_RATE_LIMIT', 5)),
+    },
+    'tweetscout': {
+        'base_url': os.getenv('TWEETSCOUT_API_URL', 'https://api.tweetscout.io/v2'),
+        'api_key': os.getenv('TWEETSCOUT_API_KEY'),
+        'rate': float(os.getenv('TWEETSCOUT_RATE_LIMIT', 5)),
+    },
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries"""
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for a single host
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum burst size (default: one second of tokens)
+        clock: Monotonic time source
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class AsyncFetcher:
+    """
+    Shared asyncio HTTP client for the ingestion tasks
+
+    One pooled aiohttp session is used for all requests. In-flight requests
+    are capped by a semaphore, each host has its own token bucket, transient
+    failures are retried with jittered exponential backoff and concurrent
+    requests for the same key share a single upstream call.
+
+    Usage:
+        async with AsyncFetcher(concurrency=32) as fetcher:
+            data = await fetcher.get_json(url, key=contract_address)
+    """
+
+    def __init__(self, concurrency=None, rate_limits=None, retries=None,
+                 timeout=None, backoff=0.5, max_backoff=10.0):
+        self.concurrency = concurrency or FETCH_CONCURRENCY
+        self.retries = FETCH_RETRIES if retries is None else retries
+        self.timeout = timeout or FETCH_TIMEOUT
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if rate_limits is None:
+            rate_limits = {
+                urlsplit(api['base_url']).netloc: api['rate'] for api in APIS.values()
+            }
+        self._buckets = {host: TokenBucket(rate) for host, rate in rate_limits.items() if rate}
+        self._semaphore = None
+        self._session = None
+        self._inflight = {}
+        self.stats = {'requests': 0, 'retries': 0, 'coalesced': 0, 'failures': 0}
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def get_json(self, url, params=None, headers=None, key=None):
+        """
+        GET a URL and decode its JSON body
+
+        Args:
+            url (str): Absolute URL
+            params (dict): Query string parameters
+            headers (dict): Extra request headers
+            key: Coalescing key; concurrent calls with the same key share one
+                request (default: the URL)
+
+        Raises:
+            FetchError: If the request fails after all retries
+        """
+        key = key if key is not None else url
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        pending = asyncio.ensure_future(self._fetch(url, params, headers))
+        self._inflight[key] = pending
+        try:
+            return await asyncio.shield(pending)
+        finally:
+            if pending.done():
+                self._inflight.pop(key, None)
+            else:
+                pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _fetch(self, url, params, headers):
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._backoff_delay(attempt, last_error))
+
+            if bucket:
+                await bucket.acquire()
+            async with self._semaphore:
+                self.stats['requests'] += 1
+                try:
+                    with span(f"http.{host}"):
+                        async with self._session.get(url, params=params, headers=headers) as response:
+                            if response.status in RETRY_STATUSES:
+                                last_error = _RetryableStatus(response.status, response.headers.get('Retry-After'))
+                                continue
+                            if response.status >= 400:
+                                self.stats['failures'] += 1
+                                raise FetchError(f"GET {url} returned HTTP {response.status}")
+                            return await response.json(content_type=None)
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                    last_error = e
+
+        self.stats['failures'] += 1
+        raise FetchError(f"GET {url} failed after {self.retries + 1} attempts: {last_error}")
+
+    def _backoff_delay(self, attempt, error):
+        """Full-jitter exponential backoff, honoring Retry-After when given"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+class _RetryableStatus(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.retry_after = retry_after
+
+def api_url(api, path):
+    """Build an absolute URL for one of the configured APIS"""
+    return APIS[api]['base_url'].rstrip('/') + path
+
+def api_headers(api):
+    """Default request headers for one of the configured APIS"""
+    api_key = APIS[api]['api_key']
+    return {'Authorization': f"Bearer {api_key}"} if api_key else {}
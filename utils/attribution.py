@@ -0,0 +1,280 @@
+import datetime
+import logging
+import re
+from collections import deque
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Strength of each kind of mention; the strongest kind in a tweet decides
+KINDS = {'address': 4, 'handle': 3, 'cashtag': 2, 'name': 1}
+
+# Single-word names shorter than this are too common to attribute on
+MIN_NAME_LENGTH = 4
+
+# New multi-word names go to a small delta automaton until there are this
+# many (or a tenth of the main automaton's), then both are rebuilt as one
+DELTA_LIMIT = 1000
+
+_TOKEN_RE = re.compile(r'[$@]?\w+')
+_ADDRESS_RE = re.compile(r'[1-9A-HJ-NP-Za-km-z]{32,44}')
+_HANDLE_RE = re.compile(r'(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)/', re.IGNORECASE)
+
+def normalize_handle(handle):
+    """'https://x.com/Foo', '@Foo' and 'Foo' -> '@foo'"""
+    handle = _HANDLE_RE.sub('', handle.strip()).split('/')[0].split('?')[0].lstrip('@')
+    return f"@{handle.lower()}" if handle else None
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over word tokens
+
+    The alphabet is lower-cased tokens rather than characters, so a tweet is
+    scanned in one pass over its words and every multi-word name occurring
+    in it is reported, overlapping ones included.
+    """
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        self.size = 0
+        for phrase, value in phrases:
+            self._insert(phrase, value)
+        self._link()
+
+    def _insert(self, phrase, value):
+        node = 0
+        for token in phrase:
+            child = self.goto[node].get(token)
+            if child is None:
+                child = len(self.goto)
+                self.goto[node][token] = child
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = child
+        self.out[node] += (value,)
+        self.size += 1
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and token not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(token, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.out[child] += self.out[self.fail[child]]
+
+    def scan(self, tokens):
+        """Values of every phrase ending at each token, as (token index, value)"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        found = []
+        for i, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                found.extend((i, value) for value in out[state])
+        return found
+
+class _Patterns:
+    """One generation of the index's lookup tables"""
+
+    def __init__(self):
+        self.max_id = 0
+        self.tokens = {}
+        self.addresses = {}
+        self.rank = {}
+        self.phrases = []
+        self.delta = []
+        self.main = PhraseAutomaton([])
+        self.delta_automaton = PhraseAutomaton([])
+
+    def add(self, coin):
+        coin_id = coin['id']
+        self.rank[coin_id] = (coin.get('migration_date') or datetime.datetime.min, coin_id)
+        self.max_id = max(self.max_id, coin_id)
+        if coin.get('contract_address'):
+            self.addresses[coin['contract_address'].strip()] = coin_id
+        patterns = []
+        if coin.get('coin_symbol'):
+            patterns.append(('cashtag', f"${coin['coin_symbol'].strip().lstrip('$').lower()}"))
+        if coin.get('twitter_handle'):
+            patterns.append(('handle', normalize_handle(coin['twitter_handle'])))
+        name = tuple(token.lower() for token in _TOKEN_RE.findall(coin.get('coin_name') or '')
+                     if token[0] not in '$@')
+        if len(name) > 1:
+            self.delta.append((name, (len(name), coin_id)))
+        elif name and len(name[0]) >= MIN_NAME_LENGTH and not name[0].isdigit():
+            patterns.append(('name', name[0]))
+        for kind, token in patterns:
+            if token and len(token) > 1:
+                self.tokens.setdefault(token, {}).setdefault(kind, []).append(coin_id)
+
+    def extend(self, coins):
+        for coin in coins:
+            self.add(coin)
+        if len(self.delta) > max(DELTA_LIMIT, self.main.size // 10):
+            self.phrases.extend(self.delta)
+            self.delta = []
+            self.main = PhraseAutomaton(self.phrases)
+        self.delta_automaton = PhraseAutomaton(self.delta)
+
+class AttributionIndex:
+    """
+    Finds the coin a tweet is about from MigratedCoin symbols, names,
+    Twitter handles and contract addresses
+
+    A tweet is tokenized once. Each token is looked up in a hash map of
+    one-token patterns ($cashtags, @handles, one-word names) and, when it
+    looks like base58, in the exact map of contract addresses; multi-word
+    names are found by a token-level Aho-Corasick automaton in the same
+    pass. Matching is case-insensitive except for addresses, and a name
+    inside a longer matched name ('Pepe' in 'Pepe Coin') does not count.
+
+    Ambiguity rule: the strongest kind of mention in the tweet decides
+    (address > handle > cashtag > name), the first such mention in reading
+    order being the one attributed. When it matches several coins (a shared
+    ticker or name), a candidate also matched by any other mention in the
+    tweet wins; otherwise the most recently migrated candidate wins (then the
+    highest id), on the grounds that copycat tickers are shilled while new.
+
+    Coins are added incrementally (add_coins, refresh); coins edited after
+    being indexed keep their old patterns until the next load(). load()
+    builds the new tables aside and swaps them in at once, so tweets
+    attributed meanwhile (without the lock) see either the old index or the
+    new one, never an empty one.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._patterns = _Patterns()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._patterns.rank)
+
+    @property
+    def max_id(self):
+        return self._patterns.max_id
+
+    def add_coins(self, coins):
+        """
+        Index coin dicts (id, coin_symbol, coin_name, twitter_handle,
+        contract_address, migration_date)
+        """
+        with self._lock:
+            self._patterns.extend(coins)
+
+    def _query(self, session, after_id=0):
+        from utils.models import MigratedCoin
+
+        columns = (MigratedCoin.id, MigratedCoin.coin_symbol, MigratedCoin.coin_name,
+                   MigratedCoin.twitter_handle, MigratedCoin.contract_address, MigratedCoin.migration_date)
+        query = session.query(*columns).filter(MigratedCoin.id > after_id).order_by(MigratedCoin.id)
+        return [dict(row._mapping) for row in query.yield_per(10000)]
+
+    def load(self, session=None):
+        """Rebuild the index from every MigratedCoin row"""
+        coins = self._with_session(session, self._query)
+        patterns = _Patterns()
+        patterns.extend(coins)
+        with self._lock:
+            self._patterns = patterns
+            self.loaded = True
+        logger.info(f"Attribution index built for {len(coins)} coins")
+        return len(coins)
+
+    def refresh(self, session=None):
+        """Index coins inserted since the last load/refresh (loads on first use)"""
+        if not self.loaded:
+            return self.load(session)
+        coins = self._with_session(session, lambda s: self._query(s, self.max_id))
+        if coins:
+            self.add_coins(coins)
+            logger.info(f"Attribution index: {len(coins)} coins added")
+        return len(coins)
+
+    @staticmethod
+    def _with_session(session, func):
+        if session is not None:
+            return func(session)
+        from utils.db_pool import DatabasePool
+
+        with DatabasePool().get_session() as new_session:
+            return func(new_session)
+
+    def mentions(self, text):
+        """
+        Every coin mention in text, in reading order
+
+        Returns:
+            list: (position, kind, coin ids) tuples
+        """
+        return self._mentions(self._patterns, text)
+
+    @staticmethod
+    def _mentions(patterns, text):
+        single = patterns.tokens
+        addresses = patterns.addresses
+        raw = _TOKEN_RE.findall(text)
+        words = [token.lower() for token in raw]
+        found = []
+        names = {}
+        for i, (token, word) in enumerate(zip(raw, words)):
+            if len(token) >= 32 and token in addresses and _ADDRESS_RE.fullmatch(token):
+                found.append((i, 'address', (addresses[token],)))
+                continue
+            for kind, ids in single.get(word, {}).items():
+                if kind == 'name':
+                    names.setdefault((i, i), []).extend(ids)
+                else:
+                    found.append((i, kind, tuple(ids)))
+        for automaton in (patterns.main, patterns.delta_automaton):
+            if automaton.size:
+                for end, (length, coin_id) in automaton.scan(words):
+                    names.setdefault((end - length + 1, end), []).append(coin_id)
+        # Names match leftmost-longest: 'Pepe' inside 'Pepe Coin' is not a mention
+        for (start, end), ids in names.items():
+            if not any(other != (start, end) and other[0] <= start and end <= other[1] for other in names):
+                found.append((start, 'name', tuple(ids)))
+        found.sort(key=lambda mention: mention[0])
+        return found
+
+    def attribute(self, text):
+        """Coin id a tweet is about under the ambiguity rule, or None"""
+        # One generation of the tables for the whole tweet, even if load() swaps them
+        patterns = self._patterns
+        found = self._mentions(patterns, text)
+        if not found:
+            return None
+        strongest = max(KINDS[kind] for _, kind, _ in found)
+        primary = next(ids for _, kind, ids in found if KINDS[kind] == strongest)
+        if len(primary) == 1:
+            return primary[0]
+        others = {coin_id for _, _, ids in found if ids is not primary for coin_id in ids}
+        corroborated = [coin_id for coin_id in primary if coin_id in others]
+        return max(corroborated or primary, key=patterns.rank.__getitem__)
+
+    def attribute_many(self, texts):
+        return [self.attribute(text) for text in texts]
+
+    def stats(self):
+        patterns = self._patterns
+        return {
+            'coins': len(patterns.rank),
+            'tokens': len(patterns.tokens),
+            'addresses': len(patterns.addresses),
+            'phrases': patterns.main.size + patterns.delta_automaton.size,
+            'delta_phrases': patterns.delta_automaton.size,
+        }
+
+# Process-wide index, loaded on first use and refreshed after each migrations fetch
+attribution_index = AttributionIndex()
@@ -0,0 +1,174 @@
+import datetime
+from utils.db_pool import DatabasePool
+from utils.models import Alert, MigratedCoin
+from utils.query_cache import COINS, SENTIMENT, query_cache
+from utils.rollups import TIME_RANGES, range_start, sentiment_summary
+
+# Bars read per chart point: enough for the downsampling to pick extremes
+# from, without reading 1m bars for a month
+BARS_PER_POINT = 8
+# Bar column plotted by each market history chart
+CHART_FIELDS = {'price': 'close', 'volume': 'volume'}
+
+@query_cache.cached('recent_migrations', ttl=60, tags=(COINS,))
+def recent_migrations(limit=5):
+    """Most recently migrated coins as plain dicts"""
+    with DatabasePool().get_session() as session:
+        rows = session.query(
+            MigratedCoin.coin_symbol,
+            MigratedCoin.market_cap,
+            MigratedCoin.volume,
+            MigratedCoin.migration_date
+        ).order_by(MigratedCoin.migration_date.desc()).limit(limit).all()
+    return [dict(row._mapping) for row in rows]
+
+@query_cache.cached('sentiment_by_coin', ttl=300, tags=(SENTIMENT, COINS))
+def sentiment_by_coin(time_range):
+    """Per-coin sentiment statistics for a dashboard time range"""
+    with DatabasePool().get_session() as session:
+        return sentiment_summary(session, since=range_start(time_range))
+
+@query_cache.cached('recent_alerts', ttl=60, tags=(COINS, SENTIMENT))
+def recent_alerts(limit=20):
+    """Most recent alerts fired by the alert engine as plain dicts"""
+    with DatabasePool().get_session() as session:
+        rows = session.query(
+            MigratedCoin.coin_symbol,
+            Alert.kind,
+            Alert.message,
+            Alert.created_at
+        ).join(MigratedCoin, MigratedCoin.id == Alert.coin_id).order_by(
+            Alert.created_at.desc()
+        ).limit(limit).all()
+    return [dict(row._mapping) for row in rows]
+
+@query_cache.cached('market_overview', ttl=300, tags=(COINS, SENTIMENT))
+def market_overview(top=10):
+    """
+    Top performers and latest volumes from the market analytics
+
+    Returns:
+        dict: 'top_performers' and 'volumes' as lists of dicts
+    """
+    # pandas/NumPy are only loaded once the overview is actually requested
+    from utils.analytics import RANK_BY, run_analytics
+
+    metrics, _ = run_analytics()
+    ranked = metrics.dropna(subset=[RANK_BY]).sort_values(RANK_BY, ascending=False)
+    columns = ['coin_symbol', 'close', 'return_1h', 'return_24h', 'return_7d', 'rank_change']
+    volumes = metrics.dropna(subset=['volume']).sort_values('volume', ascending=False)
+    return {
+        'top_performers': ranked.head(top)[columns].assign(coin_id=ranked.head(top).index).to_dict('records'),
+        'volumes': volumes[['coin_symbol', 'volume']].assign(coin_id=volumes.index).to_dict('records'),
+    }
+
+def chart_resolution(time_range, points, now=None):
+    """Bar resolution a history chart with points points per coin reads for a time range"""
+    from utils.market_history import resolution_for
+
+    span = TIME_RANGES[time_range]
+    if span is None:
+        return '1d'
+    now = now or datetime.datetime.utcnow()
+    return resolution_for(now - span, now, max_points=points * BARS_PER_POINT)
+
+def market_series(coin_ids, field, resolution):
+    """Loader of one bar field of some coins, for SeriesWindow"""
+    import numpy as np
+    from utils.market_history import market_history
+
+    def load(start):
+        history = market_history(coin_ids, start=start, resolution=resolution, fields=(field,))
+        present = ~np.isnan(history[field])
+        return {
+            'coin_id': history['coin_id'][present],
+            'timestamp': history['timestamp'][present],
+            'value': history[field][present],
+        }
+    return load
+
+def sentiment_series(coin_ids):
+    """Loader of the hourly mean sentiment of some coins, for SeriesWindow"""
+    import numpy as np
+    from utils.analytics import load_sentiment_history
+
+    def load(start):
+        history = load_sentiment_history(start, coin_ids)
+        order = np.lexsort((history['timestamp'], history['coin_id']))
+        return {
+            'coin_id': history['coin_id'][order],
+            'timestamp': history['timestamp'][order],
+            'value': (history['sentiment_sum'] / history['tweet_count'])[order],
+        }
+    return load
+
+def chart_window(view, time_range, coin_ids, points=None):
+    """
+    Downsampled history of one dashboard chart, refreshed incrementally
+
+    The number of coins plotted picks the points per coin (series_points)
+    and LTTB or min/max buckets; with the time range it picks the bar
+    resolution read (chart_resolution of the window's points). Not cached
+    here: the dashboard keeps one per session and chart, so each rerun only
+    reads the points newer than those it already shows.
+
+    Args:
+        view (str): 'price', 'volume' or 'sentiment'
+        time_range (str): Key of TIME_RANGES
+        coin_ids (list): Coins plotted
+        points (int): Points per coin when only a few are plotted
+            (default: CHART_POINTS)
+
+    Returns:
+        SeriesWindow
+    """
+    from utils.downsample import CHART_POINTS, SeriesWindow, series_points
+
+    points = series_points(len(coin_ids), points or CHART_POINTS)
+    if view == 'sentiment':
+        loader = sentiment_series(coin_ids)
+    else:
+        loader = market_series(coin_ids, CHART_FIELDS[view], chart_resolution(time_range, points))
+    return SeriesWindow(loader, TIME_RANGES[time_range], points)
+
+def history_figure(series, symbols, title, y_format=None):
+    """
+    Line chart of downsampled per-coin series
+
+    Times are sent as epoch milliseconds, which plotly encodes as a binary
+    array instead of one ISO string per point. Past LTTB_MAX_SERIES coins,
+    all series share one WebGL trace broken by gaps instead of a trace
+    (and legend entry) each.
+
+    Args:
+        series (dict): coin_id, timestamp and value arrays (SeriesWindow.refresh)
+        symbols (dict): coin_id -> symbol for the legend and hover text
+    """
+    import numpy as np
+    import plotly.graph_objects as go
+    from utils.downsample import LTTB_MAX_SERIES
+
+    coin_ids = series['coin_id']
+    times = series['timestamp'].astype('datetime64[ms]').astype(np.int64)
+    values = series['value']
+    edges = np.flatnonzero(np.concatenate(([len(coin_ids) > 0], coin_ids[1:] != coin_ids[:-1])))
+    ends = np.append(edges[1:], len(coin_ids))
+
+    fig = go.Figure()
+    if len(edges) <= LTTB_MAX_SERIES:
+        for begin, end in zip(edges, ends):
+            fig.add_trace(go.Scatter(
+                x=times[begin:end], y=values[begin:end], mode='lines',
+                name=symbols.get(int(coin_ids[begin]), str(coin_ids[begin]))
+            ))
+    else:
+        # A NaN after each series breaks the line between coins
+        fig.add_trace(go.Scattergl(
+            x=np.insert(times.astype(float), ends, np.nan),
+            y=np.insert(values.astype(float), ends, np.nan),
+            mode='lines', line={'width': 1}, opacity=0.5, showlegend=False, hoverinfo='skip'
+        ))
+    fig.update_layout(title=title, xaxis={'type': 'date'})
+    if y_format:
+        fig.update_yaxes(tickformat=y_format)
+    return fig
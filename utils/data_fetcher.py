@@ -1,27 +1,511 @@
+import asyncio
+import datetime
 import logging
+import os
+from functools import partial
+from sqlalchemy import bindparam, update
+from utils.alert_engine import alert_engine
+from utils.async_fetcher import AsyncFetcher, api_headers, api_url
+from utils.attribution import attribution_index
 from utils.db_pool import DatabasePool
-from utils.models import MigratedCoin
-import requests
+from utils.instrumentation import span
+from utils.market_history import expire_market_bars, record_market_snapshots
+from utils.models import MigratedCoin, upsert_migrated_coins, upsert_tweets
+from utils.task_runner import report_progress
+from utils.watermarks import watermarks
 
 logger = logging.getLogger(__name__)
 
-def fetch_migrated_coins():
+MIGRATIONS_PATH = '/coins/migrated'
+MIGRATIONS_PAGE_SIZE = 50
+MIGRATIONS_MAX_PAGES = 200
+COIN_PATH = '/coins/{mint}'
+TOKEN_DECIMALS = 6
+RUGCHECK_PATH = '/tokens/{mint}/report/summary'
+
+# Content compared to decide whether a fetched row changed. Market values in
+# the migrations feed are left out: the market task owns them.
+MIGRATION_FIELDS = ('coin_name', 'coin_symbol', 'developer_id', 'twitter_handle', 'migration_date')
+MARKET_FIELDS = ('new_price', 'new_market_cap', 'new_volume', 'new_holders')
+TWEET_FIELDS = ('coin_id', 'content', 'likes', 'retweets')
+# Coins written more recently than this are not fetched again
+MARKET_MIN_AGE = datetime.timedelta(seconds=int(os.getenv('MARKET_MIN_AGE_SECONDS', 300)))
+
+_coins = MigratedCoin.__table__
+_update_market = (
+    update(_coins)
+    .where(_coins.c.id == bindparam('coin_pk'))
+    .values(market_cap=bindparam('new_market_cap'), volume=bindparam('new_volume'))
+)
+
+def _parse_timestamp(value):
+    """Parse epoch seconds/milliseconds or ISO-8601 into a naive UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        if value > 1e11:
+            value /= 1000
+        return datetime.datetime.utcfromtimestamp(value)
+    return datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+def parse_coin(payload):
+    """
+    Map a PumpFun coin payload onto MigratedCoin columns
+
+    migration_date is None when the payload has no timestamp; such coins
+    are skipped by the ingestion (see dated).
+    """
+    return {
+        'coin_name': payload.get('name') or payload.get('symbol'),
+        'coin_symbol': payload.get('symbol'),
+        'contract_address': payload.get('mint'),
+        'developer_id': payload.get('creator'),
+        'twitter_handle': payload.get('twitter'),
+        'market_cap': payload.get('usd_market_cap'),
+        'volume': payload.get('volume'),
+        'migration_date': _parse_timestamp(payload.get('complete_timestamp')),
+    }
+
+def parse_tweet(payload):
+    """
+    Map a tweet payload onto Tweet columns (coin_id None when not given)
+
+    created_at is None when the payload has no timestamp. It is part of the
+    tweets' key (tweet_id, created_at), so such tweets are skipped rather
+    than stored under an invented time that differs on every fetch.
+    """
+    return {
+        'tweet_id': str(payload.get('tweet_id') or payload.get('id')),
+        'coin_id': payload.get('coin_id'),
+        'content': payload.get('content') or payload.get('text') or '',
+        'created_at': _parse_timestamp(payload.get('created_at')),
+        'likes': int(payload.get('likes') or 0),
+        'retweets': int(payload.get('retweets') or 0),
+    }
+
+def dated(source, rows, field):
+    """Rows whose field is set; the others are counted as skipped for source"""
+    kept = [row for row in rows if row.get(field) is not None]
+    watermarks.skip(source, len(rows) - len(kept), f"no {field}")
+    return kept
+
+def parse_market(payload):
+    """Extract price, market cap, volume and holders from a PumpFun coin payload"""
+    market_cap = payload.get('usd_market_cap')
+    price = payload.get('price')
+    supply = payload.get('total_supply')
+    if price is None and market_cap is not None and supply:
+        price = market_cap / (supply / 10 ** TOKEN_DECIMALS)
+    return {
+        'price': price,
+        'market_cap': market_cap,
+        'volume': payload.get('volume'),
+        'holders': payload.get('holder_count'),
+    }
+
+def contract_status(report):
+    """Summarize a RugCheck report as 'danger', 'warn' or 'good'"""
+    levels = {risk.get('level') for risk in report.get('risks') or []}
+    for level in ('danger', 'warn'):
+        if level in levels:
+            return level
+    return 'good'
+
+async def fetch_migrations(fetcher, page_size=MIGRATIONS_PAGE_SIZE, max_pages=MIGRATIONS_MAX_PAGES,
+                           offset=0, since=None, keep=None):
+    """
+    Page through the PumpFun migrations feed and enrich coins with RugCheck status
+
+    An oldest-first feed is read from offset to its end. When the first
+    page shows the feed is newest first, offsets are not stable (new
+    migrations are prepended), so the feed is read from its start instead
+    until a page reaches back before since.
+
+    Args:
+        offset (int): Feed position to start reading at (oldest-first feed)
+        since (datetime): Latest migration time already read
+        keep: Called with the parsed coins before enrichment, returns the
+            ones to enrich and return (default: all of them)
+
+    Returns:
+        tuple: (coins, number of coins fetched, feed position after the last
+            page, 0 for a newest-first feed, which is always read from its start)
+    """
+    coins = []
+    position = offset
+    newest_first = None
+    for page in range(max_pages):
+        payload = await fetcher.get_json(
+            api_url('pumpfun', MIGRATIONS_PATH),
+            params={'limit': page_size, 'offset': position},
+            headers=api_headers('pumpfun')
+        )
+        if not payload:
+            break
+        parsed = [parse_coin(item) for item in payload if item.get('mint')]
+        dates = [coin['migration_date'] for coin in parsed if coin['migration_date'] is not None]
+        if newest_first is None and len(dates) > 1 and dates[0] != dates[-1]:
+            newest_first = dates[0] > dates[-1]
+            if newest_first and position:
+                position = 0
+                continue
+        position += len(payload)
+        coins.extend(dated('migrations', parsed, 'migration_date'))
+        report_progress(len(coins), message='Fetching migrations')
+        if len(payload) < page_size:
+            break
+        if newest_first and since is not None and dates and min(dates) < since:
+            break
+    if newest_first:
+        position = 0
+
+    fetched = len(coins)
+    if keep is not None:
+        coins = keep(coins)
+
+    report_progress(message='Checking contracts')
+    reports = await asyncio.gather(*(
+        fetcher.get_json(
+            api_url('rugcheck', RUGCHECK_PATH.format(mint=coin['contract_address'])),
+            headers=api_headers('rugcheck'),
+            key=('rugcheck', coin['contract_address'])
+        )
+        for coin in coins
+    ), return_exceptions=True)
+    for coin, report in zip(coins, reports):
+        if not isinstance(report, Exception):
+            coin['contract_status'] = contract_status(report)
+    return coins, fetched, position
+
+async def fetch_market_updates(coins, fetcher):
+    """
+    Fetch current market data for many coins concurrently
+
+    Args:
+        coins (list): (id, contract_address) pairs
+        fetcher (AsyncFetcher): Open fetcher
+
+    Returns:
+        tuple: (list of update dicts keyed by coin id, number of failed coins)
+    """
+    fetched = 0
+
+    async def fetch(address):
+        nonlocal fetched
+        try:
+            return await fetcher.get_json(
+                api_url('pumpfun', COIN_PATH.format(mint=address)),
+                headers=api_headers('pumpfun'),
+                key=('pumpfun', address)
+            )
+        finally:
+            fetched += 1
+            report_progress(fetched, len(coins))
+
+    report_progress(0, len(coins), 'Fetching market data')
+    results = await asyncio.gather(*(fetch(address) for _, address in coins), return_exceptions=True)
+
+    updates = []
+    failures = 0
+    for (coin_id, _), result in zip(coins, results):
+        if isinstance(result, Exception):
+            failures += 1
+            continue
+        market = parse_market(result)
+        updates.append({
+            'coin_pk': coin_id,
+            'new_market_cap': market['market_cap'],
+            'new_volume': market['volume'],
+            'new_price': market['price'],
+            'new_holders': market['holders'],
+        })
+    return updates, failures
+
+async def _run_fetcher(func, *args, concurrency=None):
+    async with AsyncFetcher(concurrency=concurrency) as fetcher:
+        return await func(*args, fetcher)
+
+def _evaluate_migrations(coins):
+    """Run the migration alert rule over the coins just upserted"""
+    addresses = [coin['contract_address'] for coin in coins if coin.get('contract_address')]
+    if not addresses:
+        return
+    with DatabasePool().get_session() as session:
+        migrated = []
+        for i in range(0, len(addresses), 500):
+            migrated.extend(
+                {'coin_id': coin_id, 'migration_date': migration_date}
+                for coin_id, migration_date in session.query(
+                    MigratedCoin.id, MigratedCoin.migration_date
+                ).filter(MigratedCoin.contract_address.in_(addresses[i:i + 500]))
+            )
+        alert_engine.on_migrations(session, migrated)
+        session.commit()
+    alert_engine.notify()
+
+def store_migrations(coins):
+    """
+    Upsert enriched coins, run the migration alert rule over them and add
+    them to the attribution index (when it is loaded)
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    if not coins:
+        return {'inserted': 0, 'updated': 0}
+    with span('migrations.upsert'):
+        counts = upsert_migrated_coins(coins)
+    _evaluate_migrations(coins)
+    if attribution_index.loaded:
+        # New coins are appended; edited names or symbols need a rebuild
+        with span('migrations.attribution'):
+            if counts['updated']:
+                attribution_index.load()
+            else:
+                attribution_index.refresh()
+    return counts
+
+def ingest_migrations(coins):
+    """
+    Write pushed migrations, skipping the ones already stored unchanged
+
+    The push counterpart of fetch_migrated_coins: coins (parse_coin dicts,
+    optionally with contract_status) are compared on MIGRATION_FIELDS and
+    only new or changed ones are written; coins without a migration_date
+    are skipped. The 'migrations' feed cursor is left to the polling task.
+
+    Returns:
+        dict: Rows fetched and changed
+    """
+    db = DatabasePool()
+    fetched = len(coins)
+    coins = dated('migrations', coins, 'migration_date')
+    with span('migrations.diff'), db.get_session() as session:
+        changed, hashes = watermarks.diff(session, 'migrations', coins, 'contract_address', MIGRATION_FIELDS)
+    store_migrations(changed)
+    with db.get_session() as session:
+        watermarks.remember(session, 'migrations', {
+            coin['contract_address']: hashes[coin['contract_address']] for coin in changed
+        })
+        session.commit()
+    return watermarks.record('migrations', fetched, len(changed))
+
+def fetch_migrated_coins(concurrency=None):
+    """
+    Fetch new and changed migrations
+
+    The 'migrations' cursor keeps the feed position and the latest
+    migration time read. An oldest-first feed is read from that position,
+    starting one page early so edits near the previous end are seen; a
+    newest-first feed is read until it reaches back past that time (see
+    fetch_migrations). Coins
+    whose MIGRATION_FIELDS hash matches the last written version are
+    dropped before the RugCheck lookups and the upsert, so a run that finds
+    nothing new writes nothing.
+
+    Returns:
+        dict: Rows fetched and changed
+    """
     logger.info("Fetching migrated coins data...")
     db = DatabasePool()
-    
+    hashes = {}
+    latest = []
+
+    def keep(coins):
+        latest.extend(coin['migration_date'] for coin in coins)
+        with span('migrations.diff'), db.get_session() as session:
+            changed, fetched_hashes = watermarks.diff(
+                session, 'migrations', coins, 'contract_address', MIGRATION_FIELDS
+            )
+        hashes.update(
+            (coin['contract_address'], fetched_hashes[coin['contract_address']]) for coin in changed
+        )
+        return changed
+
     try:
-        # Implementation of API call here
-        # For now just logging
-        logger.info("Fetched migrated coins data successfully")
+        with db.get_session() as session:
+            cursor = watermarks.get(session, 'migrations') or {}
+        offset = max(cursor.get('offset', 0) - MIGRATIONS_PAGE_SIZE, 0)
+        since = cursor.get('migration_date')
+        since = datetime.datetime.fromisoformat(since) if since else None
+        with span('migrations.fetch'):
+            coins, fetched, position = asyncio.run(_run_fetcher(
+                partial(fetch_migrations, offset=offset, since=since, keep=keep), concurrency=concurrency
+            ))
+        counts = store_migrations(coins)
+
+        latest_date = max(latest).isoformat() if latest else None
+        updated_cursor = {
+            'offset': position,
+            'migration_date': max(filter(None, (latest_date, cursor.get('migration_date'))), default=None),
+        }
+        with db.get_session() as session:
+            watermarks.remember(session, 'migrations', hashes)
+            if updated_cursor != cursor:
+                watermarks.set(session, 'migrations', updated_cursor)
+            session.commit()
+
+        stats = watermarks.record('migrations', fetched, len(coins))
+        logger.info(
+            f"Fetched migrated coins data successfully: {fetched} fetched from offset {offset}, "
+            f"{counts['inserted']} new, {counts['updated']} updated"
+        )
+        return stats
     except Exception as e:
         logger.error(f"Error fetching migrated coins: {e}")
+        raise
+
+def ingest_tweets(rows):
+    """
+    Write fetched tweets, skipping the ones already stored unchanged
+
+    Tweets are compared on TWEET_FIELDS (engagement counts change, content
+    does not). The 'tweets' cursor keeps the newest tweet id ingested, for
+    fetchers to request only later tweets (since_id). Tweets without a
+    coin_id are attributed from their content by the attribution index;
+    those that mention no known coin are dropped, as are tweets without a
+    created_at (part of their key).
+
+    Args:
+        rows (list): Tweet dicts with tweet_id, content, created_at, likes,
+            retweets and optionally coin_id
 
-def update_market_data():
+    Returns:
+        dict: Rows fetched and changed
+    """
+    db = DatabasePool()
+    fetched = rows
+    rows = dated('tweets', rows, 'created_at')
+    if any(row.get('coin_id') is None for row in rows):
+        with span('tweets.attribute'):
+            if not attribution_index.loaded:
+                attribution_index.load()
+            rows = [
+                row if row.get('coin_id') is not None
+                else dict(row, coin_id=attribution_index.attribute(row['content']))
+                for row in rows
+            ]
+        rows = [row for row in rows if row['coin_id'] is not None]
+    with span('tweets.diff'), db.get_session() as session:
+        changed, hashes = watermarks.diff(session, 'tweets', rows, 'tweet_id', TWEET_FIELDS)
+    if changed:
+        with span('tweets.upsert'):
+            upsert_tweets(changed)
+
+    # Tweet ids are numeric strings: compare by length, then lexically
+    def id_order(tweet_id):
+        return len(tweet_id), tweet_id
+
+    with db.get_session() as session:
+        watermarks.remember(session, 'tweets', {
+            str(row['tweet_id']): hashes[str(row['tweet_id'])] for row in changed
+        })
+        since_id = (watermarks.get(session, 'tweets') or {}).get('since_id')
+        newest = max((str(row['tweet_id']) for row in fetched), key=id_order, default=None)
+        if newest and (since_id is None or id_order(newest) > id_order(since_id)):
+            watermarks.set(session, 'tweets', {'since_id': newest})
+        session.commit()
+    return watermarks.record('tweets', len(fetched), len(changed))
+
+def select_market_coins(start_id=None, end_id=None, now=None):
+    """
+    Coins with start_id <= id < end_id due for a market refresh
+
+    Read in a session of its own, closed before returning, so no
+    connection or transaction is held while the coins are fetched. Coins
+    written less than MARKET_MIN_AGE ago are left out.
+
+    Returns:
+        tuple: (list of (id, contract_address), stored market watermarks)
+    """
+    now = now or datetime.datetime.utcnow()
+    with DatabasePool().new_session() as session:
+        query = session.query(MigratedCoin.id, MigratedCoin.contract_address).filter(
+            MigratedCoin.contract_address.isnot(None)
+        )
+        if start_id is not None:
+            query = query.filter(MigratedCoin.id >= start_id)
+        if end_id is not None:
+            query = query.filter(MigratedCoin.id < end_id)
+        coins = query.all()
+        stored = watermarks.load(session, 'market', [coin_id for coin_id, _ in coins])
+    coins = [
+        (coin_id, address) for coin_id, address in coins
+        if str(coin_id) not in stored or stored[str(coin_id)][1] <= now - MARKET_MIN_AGE
+    ]
+    return coins, stored
+
+def update_market_range(session, start_id=None, end_id=None, concurrency=None):
+    """
+    Fetch market data for the coins with start_id <= id < end_id and
+    write it within the caller's transaction
+
+    The coins are selected in a short session of their own (see
+    select_market_coins) and fetched with no transaction open; only the
+    writes go through session, whose transaction should not have begun yet.
+    Of the coins fetched, only those whose values changed are written: the
+    latest values to MigratedCoin and a snapshot to the market snapshot
+    store (with its downsampled bars), which readers forward-fill. The
+    alert rules are evaluated on the same changed rows. The caller commits.
+
+    Returns:
+        tuple: (number of coins updated, number of coins that failed)
+    """
+    now = datetime.datetime.utcnow()
+    with span('market.select'):
+        coins, stored = select_market_coins(start_id, end_id, now)
+
+    with span('market.fetch'):
+        fetched, failures = asyncio.run(
+            _run_fetcher(fetch_market_updates, coins, concurrency=concurrency)
+        )
+    with span('market.diff'):
+        updates, hashes = watermarks.diff(session, 'market', fetched, 'coin_pk', MARKET_FIELDS, stored)
+        watermarks.remember(session, 'market', {
+            str(update['coin_pk']): hashes[str(update['coin_pk'])] for update in updates
+        }, seen_at=now)
+    watermarks.record('market', len(fetched), len(updates))
+    if updates:
+        report_progress(message='Writing market data')
+        with span('market.write'):
+            session.execute(_update_market, updates)
+        snapshots = [
+            {
+                'coin_id': update['coin_pk'],
+                'timestamp': now,
+                'price': update['new_price'],
+                'market_cap': update['new_market_cap'],
+                'volume': update['new_volume'],
+                'holders': update['new_holders'],
+            }
+            for update in updates
+        ]
+        with span('market.snapshots'):
+            record_market_snapshots(session, snapshots)
+        alert_engine.on_market_data(session, snapshots)
+        with span('market.expire_bars'):
+            expire_market_bars(session, now)
+    return len(updates), failures
+
+def update_market_data(concurrency=None):
+    """
+    Refresh market data for all coins in one transaction
+
+    See update_market_range.
+    """
     logger.info("Updating market data...")
     db = DatabasePool()
-    
+
     try:
-        # Implementation of market data update here
-        logger.info("Market data updated successfully")
+        # A session of its own: its transaction begins at the writes, after the fetch
+        with db.new_session() as session:
+            updated, failures = update_market_range(session, concurrency=concurrency)
+            with span('market.commit'):
+                session.commit()
+        alert_engine.notify()
+        if failures:
+            logger.warning(f"Market data unavailable for {failures} coins")
+        logger.info(f"Market data updated successfully: {updated} coins refreshed")
     except Exception as e:
-        logger.error(f"Error updating market data: {e}") 
\ No newline at end of file
+        logger.error(f"Error updating market data: {e}")
+        raise
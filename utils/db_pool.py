@@ -1,9 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select, table, column, tuple_
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 from utils.log_util import setup_logging
+from utils.instrumentation import metrics
+from utils.pool_metrics import PoolMetrics, instrumented_pool_class
+import csv
+import io
 import os
+import threading
+import uuid
 
 # Load environment variables
 load_dotenv()
@@ -11,11 +18,36 @@ load_dotenv()
 # Create declarative base
 Base = declarative_base()
 
+def dialect_insert(dialect):
+    """
+    The insert() construct (with on_conflict_*) of a dialect name
+
+    The dialect package is imported on first use rather than by every
+    module that upserts.
+    """
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def pool_settings():
+    """Connection pool settings from the environment"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
 class DatabasePool:
     _instance = None
     _engine = None
     _Session = None
     _logger = None
+    _settings = None
+    pool_metrics = None
+    _init_lock = threading.Lock()
     Base = Base  # Add Base as a class attribute
 
     def __new__(cls):
@@ -25,22 +57,38 @@ class DatabasePool:
         return cls._instance
 
     def __init__(self):
-        if not self._engine:
-            self._initialize_engine()
+        # The engine is created on first use (engine, get_session), so
+        # constructing the pool or importing this module stays cheap
+        pass
 
     def _initialize_engine(self):
         """Initialize database engine with URL from environment variables"""
+        with self._init_lock:
+            if not self._engine:
+                self._create_engine()
+
+    def _create_engine(self):
         database_url = os.getenv('DB_URL')
         if not database_url:
             raise ValueError("DB_URL environment variable is not set")
         
-        self._engine = create_engine(
-            database_url,
-            pool_size=5,
-            max_overflow=10
-        )
+        url = make_url(database_url)
+        self.pool_metrics = PoolMetrics()
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            # In-memory SQLite keeps one connection per thread; no queue to size
+            self._settings = {}
+            self._engine = create_engine(database_url)
+        else:
+            self._settings = pool_settings()
+            self._engine = create_engine(
+                database_url,
+                poolclass=instrumented_pool_class(self.pool_metrics),
+                **self._settings
+            )
+        self.pool_metrics.attach(self._engine)
+        metrics.attach(self._engine)
         self._Session = scoped_session(sessionmaker(bind=self._engine))
-        self._logger.info("Database engine initialized")
+        self._logger.info(f"Database engine initialized with pool settings {self._settings}")
 
     def get_session(self):
         """Get a new database session"""
@@ -48,11 +96,209 @@ class DatabasePool:
             self._initialize_engine()
         return self._Session()
 
+    def new_session(self):
+        """
+        Get a session of its own, not the thread's shared one
+
+        get_session returns the same session to every caller on a thread;
+        code that calls into functions using get_session, and needs its
+        transaction left alone by their commits, takes one of these.
+        """
+        if not self._Session:
+            self._initialize_engine()
+        return self._Session.session_factory()
+
     def create_all_tables(self):
-        """Create all tables in the database"""
-        Base.metadata.create_all(self._engine)
+        """
+        Create all tables in the database
+
+        On PostgreSQL the time-series tables (tweets, logs, market_snapshots)
+        are created as range-partitioned tables with their first partitions;
+        see utils.partitions.
+        """
+        # Importing the models registers their tables on Base.metadata
+        from utils import models, partitions
+
+        engine = self.engine
+        plain = [t for t in Base.metadata.sorted_tables if t.name not in partitions.PARTITIONED_TABLES]
+        Base.metadata.create_all(engine, tables=plain)
+        partitions.create_partitioned_tables(engine, Base.metadata)
+        Base.metadata.create_all(engine)
+        partitions.ensure_indexes(engine, Base.metadata)
+        partitions.ensure_partitions(engine)
         self._logger.info("Database tables created")
 
+    def pool_status(self):
+        """
+        Pool configuration, live gauges and collected metrics
+
+        Returns:
+            dict: settings plus in_use/idle/overflow counts, checkout and
+                connection counters, timeouts and the checkout wait and
+                connection lifetime histograms
+        """
+        engine = self.engine
+        status = {'settings': dict(self._settings)}
+        status.update(self.pool_metrics.snapshot(engine.pool))
+        return status
+
+    def iter_chunks(self, columns, key, where=(), chunk_size=10000, page_size=100000, columnar=False):
+        """
+        Stream selected columns in fixed-size chunks without loading the table
+
+        Rows are read in keyset-paginated pages ordered by key, so each page
+        is a short, index-driven query. Within a page the result is consumed
+        incrementally (a server-side cursor on PostgreSQL), so memory stays
+        bounded by chunk_size regardless of table size.
+
+        Args:
+            columns (list): Columns or expressions to select
+            key (tuple): Unique ordering columns, e.g. (Tweet.id,) or
+                (Tweet.created_at, Tweet.id)
+            where (list): Extra filter clauses
+            chunk_size (int): Rows per yielded chunk
+            page_size (int): Rows per keyset query
+            columnar (bool): Yield dicts of column name -> NumPy array instead
+                of lists of row tuples
+
+        Yields:
+            list or dict: One chunk of rows
+        """
+        columns = list(columns)
+        key = list(key)
+        extra_keys = [col for col in key if not any(col is selected for selected in columns)]
+        key_positions = [
+            next(i for i, selected in enumerate(columns + extra_keys) if selected is col)
+            for col in key
+        ]
+        names = [col.key if hasattr(col, 'key') else str(col) for col in columns]
+        width = len(columns)
+        last = None
+
+        while True:
+            query = select(*columns, *extra_keys).where(*where).order_by(*key).limit(page_size)
+            if last is not None:
+                query = query.where(tuple_(*key) > tuple_(*last) if len(key) > 1 else key[0] > last[0])
+
+            fetched = 0
+            with self.engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(query)
+                for partition in result.partitions(chunk_size):
+                    fetched += len(partition)
+                    last = tuple(partition[-1][i] for i in key_positions)
+                    rows = [tuple(row[:width]) for row in partition]
+                    yield _columnar(names, rows) if columnar else rows
+
+            if fetched < page_size:
+                return
+
+    def bulk_upsert(self, target, rows, conflict_keys, use_copy=False, batch_size=2000):
+        """
+        Insert or update a batch of plain dicts with set-based statements
+
+        Rows are matched on conflict_keys with INSERT ... ON CONFLICT DO UPDATE;
+        every other column present in a row is overwritten on conflict, and
+        columns missing from a row are left untouched. Within a call the last
+        row for a key wins.
+
+        Args:
+            target: SQLAlchemy Table to write to
+            rows (list): Dicts of column values
+            conflict_keys (list): Column names of a unique index on target
+            use_copy (bool): On PostgreSQL, COPY rows into a temporary staging
+                table and upsert from there (faster for large batches)
+            batch_size (int): Rows per statement
+
+        Returns:
+            dict: {'inserted': int, 'updated': int}
+        """
+        counts = {'inserted': 0, 'updated': 0}
+        rows = list({tuple(row[key] for key in conflict_keys): row for row in rows}.values())
+        if not rows:
+            return counts
+
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        dialect = self.engine.dialect.name
+        with self.engine.begin() as conn:
+            for columns, group in groups.items():
+                for start in range(0, len(group), batch_size):
+                    batch = group[start:start + batch_size]
+                    if dialect == 'postgresql' and use_copy:
+                        inserted = self._copy_upsert(conn, target, batch, columns, conflict_keys)
+                    elif dialect in ('postgresql', 'sqlite'):
+                        inserted = self._executemany_upsert(conn, target, batch, columns, conflict_keys)
+                    else:
+                        raise ValueError(f"Bulk upsert is not supported on {dialect}")
+                    counts['inserted'] += inserted
+                    counts['updated'] += len(batch) - inserted
+        return counts
+
+    @staticmethod
+    def _upsert_statement(insert, target, columns, conflict_keys):
+        stmt = insert(target)
+        updates = {name: stmt.excluded[name] for name in columns if name not in conflict_keys}
+        if updates:
+            return stmt.on_conflict_do_update(index_elements=conflict_keys, set_=updates)
+        return stmt.on_conflict_do_nothing(index_elements=conflict_keys)
+
+    def _copy_upsert(self, conn, target, batch, columns, conflict_keys):
+        """COPY the batch into a temporary staging table, then upsert from it
+
+        Inserted rows are counted by joining the staging table against the
+        target before the upsert (RETURNING xmax is not available on
+        partitioned tables).
+        """
+        staging = f"staging_{target.name}_{uuid.uuid4().hex[:8]}"
+        column_list = ', '.join(f'"{name}"' for name in columns)
+        conn.exec_driver_sql(
+            f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+            f'SELECT {column_list} FROM "{target.name}" WITH NO DATA'
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        for row in batch:
+            writer.writerow([row[name] for name in columns])
+        buffer.seek(0)
+        copy_sql = f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+        with conn.connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+
+        join = ' AND '.join(f's."{key}" = t."{key}"' for key in conflict_keys)
+        existing = conn.exec_driver_sql(
+            f'SELECT count(*) FROM {staging} s JOIN "{target.name}" t ON {join}'
+        ).scalar()
+
+        source = select(*(column(name) for name in columns)).select_from(table(staging))
+        stmt = self._upsert_statement(dialect_insert('postgresql'), target, columns, conflict_keys)
+        conn.execute(stmt.from_select(columns, source))
+        return len(batch) - existing
+
+    def _executemany_upsert(self, conn, target, batch, columns, conflict_keys):
+        """Count existing keys up front, then executemany the upsert"""
+        keys = [tuple(row[name] for name in conflict_keys) for row in batch]
+        if len(conflict_keys) == 1:
+            key_column = target.c[conflict_keys[0]]
+            existing = conn.execute(
+                select(key_column).where(key_column.in_([key[0] for key in keys]))
+            ).all()
+        else:
+            key_columns = tuple_(*(target.c[name] for name in conflict_keys))
+            existing = conn.execute(
+                select(*key_columns.clauses).where(key_columns.in_(keys))
+            ).all()
+
+        stmt = self._upsert_statement(dialect_insert(conn.dialect.name), target, columns, conflict_keys)
+        conn.execute(stmt, batch)
+        return len(batch) - len(existing)
+
     @property
     def engine(self):
         """Get the SQLAlchemy engine"""
@@ -60,12 +306,45 @@ class DatabasePool:
             self._initialize_engine()
         return self._engine
 
-# Global instance for convenience
-db_pool = DatabasePool()
+def execute_values(session, stmt, rows):
+    """
+    Execute an INSERT ... ON CONFLICT for many rows within the caller's
+    transaction
+
+    Returns:
+        int: Number of rows inserted or updated
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return session.execute(stmt, rows).rowcount
+    # SQLAlchemy only batches ON CONFLICT executemany into multi-row VALUES
+    # when the statement has RETURNING; without it psycopg2 runs one
+    # round trip per row
+    key = next(iter(stmt.table.primary_key.columns))
+    return len(session.execute(stmt.returning(key), rows).all())
+
+def _columnar(names, rows):
+    """Transpose row tuples into a dict of NumPy arrays"""
+    import numpy as np
+
+    arrays = {}
+    columns = zip(*rows) if rows else [()] * len(names)
+    for name, values in zip(names, columns):
+        array = np.asarray(values)
+        if array.dtype == object and all(value is None or isinstance(value, (int, float)) for value in values):
+            # Nullable numeric column: NULL becomes NaN
+            array = np.array([np.nan if value is None else value for value in values], dtype=float)
+        arrays[name] = array
+    return arrays
+
+def __getattr__(name):
+    # The module-level db_pool is resolved on first access instead of at import
+    if name == 'db_pool':
+        return DatabasePool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db():
     """Get a new database session"""
-    db = db_pool.get_session()
+    db = DatabasePool().get_session()
     try:
         yield db
     finally:
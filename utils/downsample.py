@@ -0,0 +1,182 @@
+import datetime
+import os
+import numpy as np
+
+# Points per series sent to a chart, about one per horizontal pixel
+CHART_POINTS = int(os.getenv('CHART_POINTS', 800))
+# Points per chart across all its series: many series get fewer points each
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', 100000))
+# Fewest points per series, however many series a chart has
+MIN_SERIES_POINTS = 20
+# Charts with more series than this use min/max buckets instead of LTTB
+LTTB_MAX_SERIES = int(os.getenv('CHART_LTTB_MAX_SERIES', 20))
+
+def series_points(series_count, points=CHART_POINTS):
+    """Points per series that keep a chart of series_count series within CHART_MAX_POINTS"""
+    return min(points, max(CHART_MAX_POINTS // max(series_count, 1), MIN_SERIES_POINTS))
+
+def choose_method(series_count):
+    """'lttb' for a few series (best line shape), 'minmax' for many (vectorized)"""
+    return 'lttb' if series_count <= LTTB_MAX_SERIES else 'minmax'
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps of one series
+
+    The first and last points are kept; every bucket in between keeps the
+    point forming the largest triangle with the point kept before it and the
+    mean of the next bucket, which preserves the visual shape of a line.
+
+    Args:
+        x, y (ndarray): Series sorted by x, without NaN
+        threshold (int): Points to keep
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Mean of each bucket, the last point standing in for the bucket after the last
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+def minmax(keys, x, y, start, stop, buckets):
+    """
+    Indices of the minimum and maximum point of every (series, time bucket),
+    plus the first and last point of each series, in input order
+
+    Vectorized over all series at once.
+
+    Args:
+        keys (ndarray): Series of each point; points sorted by key, then x
+        x (ndarray): Numeric time of each point
+        y (ndarray): Values, without NaN
+        start, stop: Time range split into equal buckets
+        buckets (int): Buckets per series
+    """
+    n = len(x)
+    if not n:
+        return np.arange(0)
+    width = max(stop - start, 1)
+    bucket = np.clip((x - start) * buckets // width, 0, buckets - 1)
+    series_change = np.concatenate(([True], keys[1:] != keys[:-1]))
+    # Sorted by series then time, so every (series, bucket) group is one contiguous run
+    group = (np.cumsum(series_change) - 1) * buckets + bucket
+    group_starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+    group_of = np.repeat(np.arange(len(group_starts)), np.diff(np.append(group_starts, n)))
+    kept = []
+    for extreme in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == extreme.reduceat(y, group_starts)[group_of])
+        # First point reaching the extreme in each group
+        kept.append(hits[np.concatenate(([True], group_of[hits[1:]] != group_of[hits[:-1]]))])
+    series_edges = np.flatnonzero(series_change)
+    return np.unique(np.concatenate(kept + [series_edges, np.append(series_edges[1:], n) - 1]))
+
+def downsample(series, start, stop, points=CHART_POINTS, field='value', method=None):
+    """
+    Reduce per-coin series to about points points per coin
+
+    Args:
+        series (dict): coin_id, timestamp (datetime64) and field arrays,
+            sorted by coin_id then timestamp (market_history's layout)
+        start, stop (datetime): Time range shown, for the min/max buckets
+        method (str): 'lttb' or 'minmax' (default: choose_method)
+
+    Returns:
+        dict: The same arrays, subset to the points kept
+    """
+    coin_ids = series['coin_id']
+    if not len(coin_ids):
+        return series
+    edges = np.flatnonzero(np.concatenate(([True], coin_ids[1:] != coin_ids[:-1])))
+    ends = np.append(edges[1:], len(coin_ids))
+    if (ends - edges).max() <= points:
+        return series
+    seconds = series['timestamp'].astype('datetime64[s]').astype(np.int64)
+    values = series[field]
+    method = method or choose_method(len(edges))
+    if method == 'lttb':
+        kept = np.concatenate([
+            begin + lttb(seconds[begin:end], values[begin:end], points) for begin, end in zip(edges, ends)
+        ])
+    elif method == 'minmax':
+        start = _seconds(start) if start is not None else int(seconds.min())
+        stop = _seconds(stop) if stop is not None else int(seconds.max()) + 1
+        kept = minmax(coin_ids, seconds, values, start, stop, max(points // 2, 1))
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return {name: array[kept] for name, array in series.items()}
+
+def _seconds(value):
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+class SeriesWindow:
+    """
+    Downsampled series of one chart, kept up to date by appending
+
+    The first refresh loads the whole window and downsamples it. Later
+    refreshes only load points at or after the newest one rendered (whose
+    bucket may still have been open), replace it, append the rest, drop
+    points that slid out of the window and downsample again only once a
+    series grows past points.
+
+    Args:
+        loader: loader(start) -> series dict (see downsample) of the points
+            at or after start (None: all)
+        span (timedelta): Window length (None: everything)
+        points (int): Points per series
+        field (str): Value array to downsample on
+        method (str): Downsampling method (default: by series count)
+    """
+
+    def __init__(self, loader, span, points=CHART_POINTS, field='value', method=None):
+        self.loader = loader
+        self.span = span
+        self.points = points
+        self.field = field
+        self.method = method
+        self.series = None
+        self.newest = None
+        self.stats = {'full_loads': 0, 'appends': 0, 'points_loaded': 0, 'points_rendered': 0}
+
+    def refresh(self, now=None, full=False):
+        """Load what is new and return the series to render"""
+        now = now or datetime.datetime.utcnow()
+        start = now - self.span if self.span is not None else None
+        if full or self.series is None or self.newest is None:
+            loaded = self.loader(start)
+            merged = loaded
+            self.stats['full_loads'] += 1
+        else:
+            loaded = self.loader(self.newest)
+            kept = self.series['timestamp'] < np.datetime64(self.newest)
+            if start is not None:
+                kept &= self.series['timestamp'] >= np.datetime64(start)
+            merged = {name: np.concatenate((array[kept], loaded[name])) for name, array in self.series.items()}
+            order = np.lexsort((merged['timestamp'], merged['coin_id']))
+            merged = {name: array[order] for name, array in merged.items()}
+            self.stats['appends'] += 1
+        self.stats['points_loaded'] += len(loaded['coin_id'])
+        self.series = downsample(merged, start, now, self.points, self.field, self.method)
+        if len(self.series['timestamp']):
+            self.newest = self.series['timestamp'].max().astype('datetime64[us]').item()
+        self.stats['points_rendered'] = len(self.series['coin_id'])
+        return self.series
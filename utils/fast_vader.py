@@ -0,0 +1,264 @@
+import hashlib
+import math
+import os
+import string
+
+# Token info cache bound; the cache is dropped and rebuilt when it fills up
+TOKEN_CACHE_SIZE = int(os.getenv('SENTIMENT_TOKEN_CACHE_SIZE', 200000))
+
+# Extra lexicon entries: 'crypto' (CRYPTO_SLANG), 'none', or paths of
+# VADER-format files (word<TAB>valence), comma-separated
+LEXICON_OVERLAY = os.getenv('SENTIMENT_LEXICON_OVERLAY', 'crypto')
+
+# Valences on VADER's -4..4 scale for slang the stock lexicon does not know
+# (or scores the other way in this context)
+CRYPTO_SLANG = {
+    'rug': -2.5,
+    'rugged': -2.8,
+    'rugpull': -3.0,
+    'rugpulled': -3.0,
+    'moon': 2.0,
+    'mooning': 2.3,
+    'moonshot': 2.2,
+    'wagmi': 2.5,
+    'ngmi': -2.3,
+    'lfg': 2.0,
+    'hodl': 1.2,
+    'gem': 1.8,
+    'bullish': 2.0,
+    'bearish': -1.8,
+    'rekt': -2.5,
+    'jeet': -1.5,
+    'jeets': -1.5,
+    'honeypot': -2.8,
+    'ath': 1.5,
+    'fud': -1.5,
+}
+
+_MARKER = '\x01'
+
+def load_overlay(spec=LEXICON_OVERLAY):
+    """Lexicon overlay for a SENTIMENT_LEXICON_OVERLAY value"""
+    overlay = {}
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part or part == 'none':
+            continue
+        if part == 'crypto':
+            overlay.update(CRYPTO_SLANG)
+            continue
+        with open(part, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    word, valence = line.rstrip('\n').split('\t')[0:2]
+                    overlay[word.lower()] = float(valence)
+    return overlay
+
+class FastVader:
+    """
+    Batch VADER scorer returning the same compound scores as
+    SentimentIntensityAnalyzer.polarity_scores
+
+    VADER's rules are kept as they are, quirks included (the 'but' rule
+    rescales by value, the 3-word negation rule's operator precedence); the
+    work is moved out of the per-text path instead:
+
+    - each distinct token is stripped, lower-cased and looked up in the
+      lexicon, booster and negation tables once, and the result is shared by
+      every later text of every batch
+    - emoji are replaced with one str.translate, only in texts that have any
+    - idiom and 'but' handling only runs when a text contains their words
+
+    Args:
+        overlay (dict): word -> valence entries added to (or replacing)
+            the stock lexicon; None or {} scores exactly like stock VADER
+    """
+
+    def __init__(self, overlay=None):
+        from vaderSentiment import vaderSentiment as vader
+
+        self._vader = vader
+        stock = vader.SentimentIntensityAnalyzer()
+        self.overlay = dict(overlay or {})
+        self.lexicon = dict(stock.lexicon)
+        self.lexicon.update((word.lower(), valence) for word, valence in self.overlay.items())
+        self.boosters = dict(vader.BOOSTER_DICT)
+        self.negations = frozenset(vader.NEGATE)
+        self.special_cases = dict(vader.SPECIAL_CASES)
+        # Words that can take part in a special case or booster n-gram
+        self._idiom_words = frozenset(
+            word for phrase in list(self.special_cases) + [key for key in self.boosters if ' ' in key]
+            for word in phrase.split()
+        )
+        # polarity_scores only replaces single characters. Each becomes a
+        # marker plus its description; the marker turns into the separating
+        # space polarity_scores inserts, unless the emoji starts the text or
+        # follows a space.
+        self._emojis = {char: text for char, text in stock.emojis.items() if len(char) == 1}
+        self._emoji_chars = frozenset(self._emojis)
+        self._emoji_table = str.maketrans({char: _MARKER + text for char, text in self._emojis.items()})
+        self._tokens = {}
+        self.fingerprint = ''
+        if self.overlay:
+            payload = repr(sorted(self.overlay.items())).encode('utf-8')
+            self.fingerprint = hashlib.blake2b(payload, digest_size=4).hexdigest()
+
+    def _replace_emoji(self, text):
+        if _MARKER in text:
+            return ''.join(
+                ('' if i == 0 or text[i - 1] == ' ' else ' ') + self._emojis[char] if char in self._emojis else char
+                for i, char in enumerate(text)
+            )
+        text = text.translate(self._emoji_table).replace(' ' + _MARKER, ' ')
+        if text.startswith(_MARKER):
+            text = text[1:]
+        return text.replace(_MARKER, ' ')
+
+    def _token(self, raw):
+        """(lower, is_upper, valence or None, booster or None, negates) for a raw token"""
+        stripped = raw.strip(string.punctuation)
+        if len(stripped) <= 2:
+            stripped = raw
+        lower = stripped.lower()
+        info = (
+            lower,
+            stripped.isupper(),
+            self.lexicon.get(lower),
+            self.boosters.get(lower),
+            lower in self.negations or "n't" in lower,
+        )
+        if len(self._tokens) >= TOKEN_CACHE_SIZE:
+            self._tokens.clear()
+        self._tokens[raw] = info
+        return info
+
+    def score(self, text):
+        """Compound score of one text"""
+        return self.score_many([text])[0]
+
+    def score_many(self, texts):
+        """Compound scores of texts, in order"""
+        token_info = self._tokens.get
+        make_token = self._token
+        emoji_chars = self._emoji_chars
+        replace_emoji = self._replace_emoji
+        idiom_words = self._idiom_words
+        c_incr = self._vader.C_INCR
+        n_scalar = self._vader.N_SCALAR
+        scores = []
+
+        for text in texts:
+            if not text.isascii() and not emoji_chars.isdisjoint(text):
+                text = replace_emoji(text)
+            text = text.strip()
+            tokens = [token_info(raw) or make_token(raw) for raw in text.split()]
+            n = len(tokens)
+            if not n:
+                scores.append(0.0)
+                continue
+            lowers = [token[0] for token in tokens]
+            caps = sum(1 for token in tokens if token[1])
+            cap_diff = 0 < n - caps < n
+
+            sentiments = []
+            for i in range(n):
+                lower, upper, valence, booster, _ = tokens[i]
+                if booster is not None or valence is None or (
+                        lower == 'kind' and i < n - 1 and lowers[i + 1] == 'of'):
+                    sentiments.append(0)
+                    continue
+
+                v = valence
+                if lower == 'no' and i != n - 1 and tokens[i + 1][2] is not None:
+                    v = 0.0
+                if (i > 0 and lowers[i - 1] == 'no') or (i > 1 and lowers[i - 2] == 'no') \
+                        or (i > 2 and lowers[i - 3] == 'no' and lowers[i - 1] in ('or', 'nor')):
+                    v = valence * n_scalar
+                if upper and cap_diff:
+                    v = v + c_incr if v > 0 else v - c_incr
+
+                for start_i in (0, 1, 2):
+                    if i <= start_i:
+                        break
+                    previous = tokens[i - start_i - 1]
+                    if previous[2] is not None:
+                        continue
+                    s = 0.0
+                    if previous[3] is not None:
+                        s = previous[3]
+                        if v < 0:
+                            s *= -1
+                        if previous[1] and cap_diff:
+                            s = s + c_incr if v > 0 else s - c_incr
+                        if start_i == 1:
+                            s = s * 0.95
+                        elif start_i == 2:
+                            s = s * 0.9
+                    v = v + s
+                    if start_i == 0:
+                        if previous[4]:
+                            v = v * n_scalar
+                    elif start_i == 1:
+                        if lowers[i - 2] == 'never' and lowers[i - 1] in ('so', 'this'):
+                            v = v * 1.25
+                        elif lowers[i - 2] == 'without' and lowers[i - 1] == 'doubt':
+                            pass
+                        elif previous[4]:
+                            v = v * n_scalar
+                    else:
+                        if (lowers[i - 3] == 'never' and lowers[i - 2] in ('so', 'this')) \
+                                or lowers[i - 1] in ('so', 'this'):
+                            v = v * 1.25
+                        elif lowers[i - 3] == 'without' and (lowers[i - 2] == 'doubt' or lowers[i - 1] == 'doubt'):
+                            pass
+                        elif previous[4]:
+                            v = v * n_scalar
+                        if not idiom_words.isdisjoint(lowers[i - 3:i + 3]):
+                            v = self._special_idioms(v, lowers, i)
+
+                if i > 1 and lowers[i - 1] == 'least' and tokens[i - 1][2] is None:
+                    if lowers[i - 2] != 'at' and lowers[i - 2] != 'very':
+                        v = v * n_scalar
+                elif i > 0 and lowers[i - 1] == 'least' and tokens[i - 1][2] is None:
+                    v = v * n_scalar
+                sentiments.append(v)
+
+            if 'but' in lowers:
+                sentiments = self._vader.SentimentIntensityAnalyzer._but_check(lowers, sentiments)
+            total = float(sum(sentiments))
+            if total:
+                emphasis = min(text.count('!'), 4) * 0.292
+                questions = text.count('?')
+                if questions > 1:
+                    emphasis += questions * 0.18 if questions <= 3 else 0.96
+                total = total + emphasis if total > 0 else total - emphasis
+            compound = total / math.sqrt(total * total + 15)
+            scores.append(round(max(-1.0, min(1.0, compound)), 4))
+        return scores
+
+    def _special_idioms(self, valence, lowers, i):
+        """VADER's special case and booster n-gram check around lowers[i] (i > 2)"""
+        special = self.special_cases
+        sequences = (
+            f"{lowers[i - 1]} {lowers[i]}",
+            f"{lowers[i - 2]} {lowers[i - 1]} {lowers[i]}",
+            f"{lowers[i - 2]} {lowers[i - 1]}",
+            f"{lowers[i - 3]} {lowers[i - 2]} {lowers[i - 1]}",
+            f"{lowers[i - 3]} {lowers[i - 2]}",
+        )
+        for sequence in sequences:
+            if sequence in special:
+                valence = special[sequence]
+                break
+        if len(lowers) - 1 > i:
+            sequence = f"{lowers[i]} {lowers[i + 1]}"
+            if sequence in special:
+                valence = special[sequence]
+        if len(lowers) - 1 > i + 1:
+            sequence = f"{lowers[i]} {lowers[i + 1]} {lowers[i + 2]}"
+            if sequence in special:
+                valence = special[sequence]
+        for n_gram in (sequences[3], sequences[4], sequences[2]):
+            if n_gram in self.boosters:
+                valence = valence + self.boosters[n_gram]
+        return valence
@@ -0,0 +1,321 @@
+import json
+import os
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from utils.pool_metrics import Histogram
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_FILE = os.getenv('METRICS_FILE')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_EXPORT_INTERVAL = float(os.getenv('METRICS_EXPORT_INTERVAL', 15))
+
+# Histogram bucket upper bounds for span durations
+SPAN_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+class _Span:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe((time.perf_counter() - self._start) * 1000)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Metrics:
+    """
+    Per-phase timing histograms and counters
+
+    Code marks a phase with `with metrics.span('market.fetch'):`; the
+    duration lands in that phase's millisecond histogram. Spans are flat
+    (a phase nested in another is timed independently) and safe to use
+    from threads and coroutines, where they measure wall time including
+    awaits. When disabled, span() returns a shared no-op context manager.
+
+    Args:
+        enabled (bool): Record spans and counters
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._exporter = None
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(SPAN_BUCKETS_MS))
+        return histogram
+
+    def span(self, name):
+        """Context manager timing one execution of a phase"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self.histogram(name))
+
+    def observe(self, name, ms):
+        """Record a duration measured by the caller"""
+        if self.enabled:
+            self.histogram(name).observe(ms)
+
+    def increment(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] += value
+
+    def snapshot(self):
+        """Histogram snapshot per span plus counters"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            'spans': {name: histograms[name].snapshot() for name in sorted(histograms)},
+            'counters': counters,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def report(self):
+        """Plain-text summary of the spans, slowest total first"""
+        spans = self.snapshot()['spans']
+        lines = [f"{'span':<32} {'count':>7} {'total ms':>10} {'avg ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, stats in sorted(spans.items(), key=lambda item: item[1]['avg'] * item[1]['count'], reverse=True):
+            lines.append(
+                f"{name:<32} {stats['count']:>7} {stats['avg'] * stats['count']:>10.1f} "
+                f"{stats['avg']:>9.2f} {stats['p95']:>9.1f} {stats['max']:>9.1f}"
+            )
+        return '\n'.join(lines)
+
+    def prometheus(self):
+        """Spans and counters in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        lines = ['# TYPE memelabs_span_ms histogram']
+        for name in sorted(histograms):
+            histogram = histograms[name]
+            with histogram._lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.total
+            cumulative = 0
+            for bound, bucket in zip(list(histogram.bounds) + ['+Inf'], counts):
+                cumulative += bucket
+                lines.append(f'memelabs_span_ms_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'memelabs_span_ms_sum{{span="{name}"}} {total}')
+            lines.append(f'memelabs_span_ms_count{{span="{name}"}} {count}')
+        lines.append('# TYPE memelabs_events_total counter')
+        for name in sorted(counters):
+            lines.append(f'memelabs_events_total{{event="{name}"}} {counters[name]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write snapshot() as JSON, replacing path atomically"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, staging = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+        os.replace(staging, path)
+
+    def start_export(self, path=METRICS_FILE, interval=METRICS_EXPORT_INTERVAL):
+        """Write the snapshot to path every interval seconds from a daemon thread"""
+        if not path or self._exporter is not None:
+            return
+
+        def export():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write(path)
+                except OSError as e:
+                    sys.stderr.write(f"Failed to write metrics to {path}: {e}\n")
+
+        self._exporter = threading.Thread(target=export, name='metrics-export', daemon=True)
+        self._exporter.start()
+
+    def serve(self, port=METRICS_PORT, host='127.0.0.1'):
+        """
+        Serve /metrics (Prometheus text) and /metrics.json from a daemon thread
+
+        Returns:
+            int: The port listened on (useful with port=0)
+        """
+        if self._server is not None:
+            return self._server.server_address[1]
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot(), default=str), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        return self._server.server_address[1]
+
+    def attach(self, engine):
+        """Time every SQL statement executed on engine as the 'db.execute' span"""
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+
+        histogram = self.histogram('db.execute')
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('query_start')
+            if starts:
+                histogram.observe((time.perf_counter() - starts.pop()) * 1000)
+
+        event.listen(engine, 'before_cursor_execute', before)
+        event.listen(engine, 'after_cursor_execute', after)
+
+# Process-wide metrics used by the tasks, the scheduler and the fetcher
+metrics = Metrics()
+
+# `with span('phase'):` -- bound directly to save a call when disabled
+span = metrics.span
+
+def timed(name):
+    """
+    Decorator timing every call of a function as the span name
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Library paths stripped from frame labels, longest (site-packages) first
+_LIBRARY_PATHS = sorted(
+    {path for name, path in sysconfig.get_paths().items() if name in ('purelib', 'platlib', 'stdlib', 'platstdlib')},
+    key=len, reverse=True
+)
+
+def _frame_label(code):
+    filename = code.co_filename
+    for path in _LIBRARY_PATHS:
+        if filename.startswith(path + os.sep):
+            filename = filename[len(path) + 1:]
+            break
+    else:
+        if os.path.isabs(filename) and filename.startswith(os.getcwd() + os.sep):
+            filename = os.path.relpath(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler producing collapsed stacks
+
+    A daemon thread snapshots the stack of every other thread each interval
+    and counts identical stacks. write() emits one 'root;caller;callee
+    count' line per stack (the folded format read by flamegraph.pl,
+    speedscope and inferno), rooted at the thread name. Being wall-clock,
+    threads blocked on I/O or locks are sampled too, which is what shows
+    where a slow run waits. Worker processes (e.g. the sentiment pool) are
+    not sampled.
+
+    Args:
+        interval (float): Seconds between samples
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Folded stack lines, most sampled first"""
+        return [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
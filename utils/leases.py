@@ -0,0 +1,406 @@
+import datetime
+import importlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy import and_, func, or_, select, update
+from utils.db_pool import DatabasePool, dialect_insert
+from utils.instrumentation import span
+from utils.models import JobShard
+from utils.task_runner import progress_to
+
+logger = logging.getLogger(__name__)
+
+# A lease not extended for this long can be claimed by another worker.
+# Expiry is judged by the workers' clocks, so hosts must be NTP-synced.
+LEASE_TTL = datetime.timedelta(seconds=float(os.getenv('LEASE_TTL_SECONDS', 60)))
+HEARTBEAT_INTERVAL = LEASE_TTL / 3
+# Attempts per shard before it is marked failed for the round
+MAX_ATTEMPTS = int(os.getenv('LEASE_MAX_ATTEMPTS', 3))
+# Rounds older than this are deleted
+ROUND_RETENTION = datetime.timedelta(days=2)
+
+MARKET_SHARDS = int(os.getenv('MARKET_SHARDS', 8))
+SENTIMENT_SHARDS = int(os.getenv('SENTIMENT_SHARDS', 4))
+
+_shards = JobShard.__table__
+
+class LeaseLost(Exception):
+    """The shard's lease expired and was claimed by another worker"""
+
+class DistributedJob:
+    """
+    A scheduled job whose rounds are split into shards claimed through leases
+
+    Args:
+        handler (str): 'module:function'. Called as
+            handler(session, range_start, range_end, fence), it does its
+            writes in session without committing; the worker marks the
+            shard done in the same transaction and commits, so a shard's
+            effects are applied exactly once. session is the worker's own
+            (DatabasePool.new_session), not the thread's get_session(), so
+            functions the handler calls that commit their own session
+            leave it alone; they must call fence on the session they
+            commit before each commit (see sentiment_shard). With
+            plain=True the handler is a task function called without
+            arguments.
+        shards (int): Shards per round
+        plan (str): 'module:function' called as plan(session, shards),
+            returning a (range_start, range_end) id range per shard; the
+            first and last ranges must be open-ended (None) so every row
+            is covered
+        after (str): 'module:function' called after each shard commits
+        plain (bool): See handler
+    """
+
+    def __init__(self, handler, shards=1, plan=None, after=None, plain=False):
+        self.handler = handler
+        self.shards = shards
+        self.plan = plan
+        self.after = after
+        self.plain = plain
+
+def _resolve(target):
+    if target is None or callable(target):
+        return target
+    module, attr = target.split(':')
+    return getattr(importlib.import_module(module), attr)
+
+def id_ranges(low, high, shards):
+    """Split low..high into equal-width ranges; the outer ends are open (None)"""
+    if low is None or high is None or shards <= 1:
+        return [(None, None)]
+    step = max(-(-(high - low + 1) // shards), 1)
+    bounds = [low + step * i for i in range(1, shards)]
+    starts = [None] + bounds
+    ends = bounds + [None]
+    return list(zip(starts, ends))
+
+def plan_coin_ranges(session, shards):
+    from utils.models import MigratedCoin
+
+    low, high = session.query(func.min(MigratedCoin.id), func.max(MigratedCoin.id)).one()
+    return id_ranges(low, high, shards)
+
+def plan_tweet_ranges(session, shards):
+    from utils.models import Tweet
+
+    low, high = session.query(func.min(Tweet.id), func.max(Tweet.id)).filter(
+        Tweet.sentiment.is_(None)
+    ).one()
+    return id_ranges(low, high, shards)
+
+def market_shard(session, range_start, range_end, fence):
+    from utils.data_fetcher import update_market_range
+
+    updated, failures = update_market_range(session, range_start, range_end)
+    if failures:
+        logger.warning(f"Market data unavailable for {failures} coins")
+    return updated
+
+def sentiment_shard(session, range_start, range_end, fence):
+    from utils.sentiment_analyzer import analyze_sentiment
+
+    return analyze_sentiment(start_id=range_start, end_id=range_end, before_commit=fence)
+
+def notify_alerts():
+    from utils.alert_engine import alert_engine
+
+    alert_engine.notify()
+
+# Task name (see utils.task_runner.TASKS) -> how it runs in distributed mode
+DISTRIBUTED_JOBS = {
+    'market': DistributedJob('utils.leases:market_shard', MARKET_SHARDS,
+                             plan='utils.leases:plan_coin_ranges', after='utils.leases:notify_alerts'),
+    'sentiment': DistributedJob('utils.leases:sentiment_shard', SENTIMENT_SHARDS,
+                                plan='utils.leases:plan_tweet_ranges'),
+    'fetch': DistributedJob('utils.data_fetcher:fetch_migrated_coins', plain=True),
+    'partitions': DistributedJob('utils.partitions:run_partition_maintenance', plain=True),
+}
+
+def round_start(interval, now=None):
+    """Start of the wall-clock slot of length interval (seconds) containing now"""
+    now = now or datetime.datetime.utcnow()
+    epoch = datetime.datetime(1970, 1, 1)
+    seconds = int((now - epoch).total_seconds()) // int(interval) * int(interval)
+    return epoch + datetime.timedelta(seconds=seconds)
+
+class _ShardProgress:
+    """report_progress() target for the shard being processed"""
+
+    def __init__(self):
+        self.done = None
+        self.total = None
+
+    def _set_progress(self, done, total, message):
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+
+class LeaseWorker:
+    """
+    Claims and processes shards of distributed job rounds
+
+    Every worker that runs a round first makes sure the round's shards
+    exist (inserting them is idempotent), then claims pending shards one at
+    a time until none are left. On PostgreSQL the claim selects a shard
+    with FOR UPDATE SKIP LOCKED, so concurrent workers never wait on each
+    other; on SQLite a conditional UPDATE does the same under its database
+    lock. While a shard is processed, a heartbeat thread extends the lease
+    and records progress. A worker that dies stops heartbeating; once its
+    lease expires, a worker still in the round reclaims the shard.
+
+    Args:
+        worker_id (str): Owner recorded on leases (default: host:pid:random)
+        jobs (dict): Job name -> DistributedJob
+        lease_ttl (timedelta): Lease duration per claim or heartbeat
+        poll (float): Seconds between claim attempts while other workers
+            hold the remaining shards
+    """
+
+    def __init__(self, worker_id=None, jobs=DISTRIBUTED_JOBS, lease_ttl=LEASE_TTL, poll=None):
+        self.worker_id = worker_id or os.getenv('WORKER_ID') or \
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs = jobs
+        self.lease_ttl = lease_ttl
+        self.poll = poll if poll is not None else min(lease_ttl.total_seconds() / 2, 5.0)
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Make run_round return after the shard in progress"""
+        self._stop.set()
+
+    def run_round(self, job_name, interval, now=None):
+        """
+        Take part in the current round of a job until all its shards are done
+
+        Args:
+            job_name (str): Key of jobs
+            interval (float): Job interval in seconds; rounds are the
+                wall-clock slots of this length
+            now (datetime): Overrides the time used to pick the round
+
+        Returns:
+            dict: shards processed by this worker and the round's state counts
+        """
+        job = self.jobs[job_name]
+        started = round_start(interval, now)
+        deadline = time.monotonic() + interval
+        self.ensure_round(job_name, started)
+
+        processed = 0
+        while not self._stop.is_set():
+            shard = self.claim(job_name, started)
+            if shard is not None:
+                processed += self._process(job, shard)
+                continue
+            states = self.round_states(job_name, started)
+            if not states.get('pending') and not states.get('leased'):
+                break
+            if time.monotonic() >= deadline:
+                logger.warning(f"{job_name} round {started} unfinished at the end of its interval: {states}")
+                break
+            # Other workers hold the rest; wait in case one dies and its lease expires
+            self._stop.wait(self.poll)
+
+        summary = {'job': job_name, 'round_start': started, 'processed': processed,
+                   'states': self.round_states(job_name, started)}
+        logger.info(f"{job_name} round {started}: {processed} shards processed by {self.worker_id}, "
+                    f"round states {summary['states']}")
+        return summary
+
+    def ensure_round(self, job_name, started):
+        """Create the round's shards unless another worker already has"""
+        job = self.jobs[job_name]
+        with DatabasePool().get_session() as session:
+            exists = session.query(JobShard.shard).filter(
+                JobShard.job == job_name, JobShard.round_start == started
+            ).first()
+            if exists:
+                return False
+            plan = _resolve(job.plan)
+            ranges = plan(session, job.shards) if plan else [(None, None)]
+            stmt = dialect_insert(session.get_bind().dialect.name)(_shards).on_conflict_do_nothing()
+            session.execute(stmt, [
+                {'job': job_name, 'round_start': started, 'shard': shard, 'range_start': low,
+                 'range_end': high, 'state': 'pending', 'attempts': 0}
+                for shard, (low, high) in enumerate(ranges)
+            ])
+            session.query(JobShard).filter(
+                JobShard.job == job_name,
+                JobShard.round_start < started - ROUND_RETENTION
+            ).delete(synchronize_session=False)
+            session.commit()
+        return True
+
+    def claim(self, job_name, started):
+        """
+        Lease the next pending (or expired) shard of a round
+
+        Returns:
+            dict: The claimed shard's columns, or None if nothing is claimable
+        """
+        now = datetime.datetime.utcnow()
+        round_filter = and_(_shards.c.job == job_name, _shards.c.round_start == started)
+        claimable = or_(
+            _shards.c.state == 'pending',
+            and_(_shards.c.state == 'leased', _shards.c.lease_expires_at < now)
+        )
+        lease = {
+            'state': 'leased', 'owner': self.worker_id, 'lease_expires_at': now + self.lease_ttl,
+            'heartbeat_at': now, 'started_at': now, 'attempts': _shards.c.attempts + 1,
+            'progress_done': None, 'progress_total': None,
+        }
+
+        with DatabasePool().get_session() as session:
+            if session.get_bind().dialect.name == 'postgresql':
+                shard = session.execute(
+                    select(_shards.c.shard).where(round_filter, claimable)
+                    .order_by(_shards.c.shard).limit(1).with_for_update(skip_locked=True)
+                ).scalar()
+                if shard is None:
+                    return None
+                session.execute(update(_shards).where(round_filter, _shards.c.shard == shard).values(**lease))
+            else:
+                # One statement, so the check and the claim are atomic under SQLite's lock
+                candidate = select(_shards.c.shard).where(round_filter, claimable) \
+                    .order_by(_shards.c.shard).limit(1).scalar_subquery()
+                claimed = session.execute(
+                    update(_shards).where(round_filter, claimable, _shards.c.shard == candidate).values(**lease)
+                ).rowcount
+                if not claimed:
+                    return None
+            row = session.execute(select(_shards).where(
+                round_filter, _shards.c.owner == self.worker_id, _shards.c.state == 'leased'
+            ).order_by(_shards.c.started_at.desc()).limit(1)).one()
+            session.commit()
+
+        shard = dict(row._mapping)
+        if shard['attempts'] > 1:
+            logger.warning(f"{job_name} shard {shard['shard']} reclaimed by {self.worker_id} "
+                           f"(attempt {shard['attempts']})")
+        return shard
+
+    def round_states(self, job_name, started):
+        """Shard counts by state for a round"""
+        with DatabasePool().get_session() as session:
+            return dict(session.query(JobShard.state, func.count()).filter(
+                JobShard.job == job_name, JobShard.round_start == started
+            ).group_by(JobShard.state).all())
+
+    def _owned(self, shard):
+        return and_(
+            _shards.c.job == shard['job'],
+            _shards.c.round_start == shard['round_start'],
+            _shards.c.shard == shard['shard'],
+            _shards.c.owner == self.worker_id,
+            _shards.c.state == 'leased',
+        )
+
+    def _fence(self, shard):
+        def fence(session):
+            """Extend the lease inside session's transaction; raise LeaseLost if it is gone"""
+            now = datetime.datetime.utcnow()
+            extended = session.execute(update(_shards).where(self._owned(shard)).values(
+                lease_expires_at=now + self.lease_ttl, heartbeat_at=now
+            )).rowcount
+            if extended != 1:
+                raise LeaseLost(f"{shard['job']} shard {shard['shard']} was reclaimed")
+        return fence
+
+    def _heartbeat(self, shard, progress, stop):
+        while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+            now = datetime.datetime.utcnow()
+            try:
+                with DatabasePool().get_session() as session:
+                    extended = session.execute(update(_shards).where(self._owned(shard)).values(
+                        lease_expires_at=now + self.lease_ttl, heartbeat_at=now,
+                        progress_done=progress.done, progress_total=progress.total
+                    )).rowcount
+                    session.commit()
+                if not extended:
+                    logger.warning(f"{shard['job']} shard {shard['shard']} lease lost")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for {shard['job']} shard {shard['shard']} failed: {e}")
+
+    def _process(self, job, shard):
+        """
+        Run a claimed shard; returns 1 if this worker completed it
+
+        The shard runs in a session of its own, so a handler that commits
+        (and closes) get_session() cannot commit or reset the transaction
+        the fence and the done update run in.
+        """
+        progress = _ShardProgress()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(shard, progress, stop), daemon=True)
+        heartbeat.start()
+        fence = self._fence(shard)
+        handler = _resolve(job.handler)
+        try:
+            with DatabasePool().new_session() as session, progress_to(progress), span(f"shard.{shard['job']}"):
+                if job.plain:
+                    handler()
+                else:
+                    handler(session, shard['range_start'], shard['range_end'], fence)
+                fence(session)
+                session.execute(update(_shards).where(self._owned(shard)).values(
+                    state='done', finished_at=datetime.datetime.utcnow(), error=None,
+                    progress_done=progress.done, progress_total=progress.total
+                ))
+                session.commit()
+        except LeaseLost as e:
+            logger.warning(f"{e}; discarded the work of {self.worker_id}")
+            return 0
+        except Exception as e:
+            logger.error(f"{shard['job']} shard {shard['shard']} failed: {e}", exc_info=True)
+            self._release(shard, e)
+            return 0
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        after = _resolve(job.after)
+        if after:
+            try:
+                after()
+            except Exception as e:
+                logger.error(f"{shard['job']} post-commit hook failed: {e}")
+        return 1
+
+    def _release(self, shard, error):
+        """Give a failed shard back (or mark it failed after MAX_ATTEMPTS)"""
+        state = 'failed' if shard['attempts'] >= MAX_ATTEMPTS else 'pending'
+        with DatabasePool().get_session() as session:
+            session.execute(update(_shards).where(self._owned(shard)).values(
+                state=state, owner=None, lease_expires_at=None, error=str(error)[:2000],
+                finished_at=datetime.datetime.utcnow() if state == 'failed' else None
+            ))
+            session.commit()
+
+def shard_status(job=None):
+    """
+    Shards of the latest round of each job (or one job)
+
+    Returns:
+        dict: job -> {'round_start', 'shards': list of shard dicts}
+    """
+    with DatabasePool().get_session() as session:
+        latest = session.query(JobShard.job, func.max(JobShard.round_start)).group_by(JobShard.job)
+        if job:
+            latest = latest.filter(JobShard.job == job)
+        status = {}
+        for name, started in latest.all():
+            rows = session.execute(select(_shards).where(
+                _shards.c.job == name, _shards.c.round_start == started
+            ).order_by(_shards.c.shard)).all()
+            status[name] = {'round_start': started, 'shards': [dict(row._mapping) for row in rows]}
+    return status
+
+# Used by the scheduler in distributed mode
+lease_worker = LeaseWorker()
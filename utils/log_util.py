@@ -1,33 +1,152 @@
 import logging
+import os
 import sys
+import threading
+from collections import deque
 from functools import wraps
 from datetime import datetime
 import traceback
 
+# Used to render tracebacks for records no other handler has formatted
+_formatter = logging.Formatter()
+
+LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', 10000))
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 500))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 2.0))
+LOG_OVERFLOW_POLICY = os.getenv('LOG_OVERFLOW_POLICY', 'drop-oldest')
+
 class DatabaseLogHandler(logging.Handler):
-    def __init__(self, session_maker):
+    """
+    Non-blocking handler that writes log records to the logs table
+
+    emit() only converts the record to a row and appends it to a bounded
+    buffer. A background thread writes the buffer with multi-row inserts
+    whenever batch_size rows are waiting or flush_interval seconds pass.
+
+    When the buffer is full the overflow policy decides what is lost:
+    'drop-oldest' discards the oldest queued row, 'sample' admits only one
+    in every sample_rate new records (each admitted one replacing the
+    oldest row).
+
+    Args:
+        session_maker: SQLAlchemy session factory
+        capacity (int): Maximum number of queued rows
+        batch_size (int): Rows per insert and size-based flush trigger
+        flush_interval (float): Seconds between time-based flushes
+        overflow (str): 'drop-oldest' or 'sample'
+        sample_rate (int): Keep 1 in N records under the 'sample' policy
+    """
+
+    def __init__(self, session_maker, capacity=LOG_BUFFER_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, overflow=LOG_OVERFLOW_POLICY, sample_rate=10):
         super().__init__()
+        if overflow not in ('drop-oldest', 'sample'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
         self.session_maker = session_maker
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._overflowed = 0
+        self._buffer = deque()
+        self._wakeup = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-log-flusher', daemon=True)
+        self._thread.start()
 
     def emit(self, record):
-        # Import here to avoid circular imports
+        # Records logged while writing (e.g. by SQLAlchemy) would loop forever
+        if threading.current_thread() is self._thread:
+            return
+        try:
+            trace = record.exc_text
+            if record.exc_info and not trace:
+                trace = _formatter.formatException(record.exc_info)
+            row = {
+                'timestamp': datetime.fromtimestamp(record.created),
+                'level': record.levelname,
+                'name': record.name,
+                'message': record.getMessage(),
+                'trace': trace
+            }
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self._wakeup:
+            if len(self._buffer) >= self.capacity:
+                self._overflowed += 1
+                if self.overflow == 'sample' and self._overflowed % self.sample_rate:
+                    self.dropped += 1
+                    return
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Write every queued row now, on the calling thread"""
+        while self._write_batch():
+            pass
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        super().close()
+
+    def stats(self):
+        """Counters for monitoring the handler"""
+        with self._wakeup:
+            return {
+                'queued': len(self._buffer),
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'capacity': self.capacity
+            }
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _write_batch(self):
+        """Write up to batch_size queued rows, returning how many were taken"""
+        # Import here to avoid circular imports (and keep CLI startup light)
+        from utils.instrumentation import metrics
         from utils.models import Log
 
-        try:
-            # Create new session for this log entry
-            with self.session_maker() as session:
-                log_entry = Log(
-                    timestamp=datetime.fromtimestamp(record.created),
-                    level=record.levelname,
-                    name=record.name,
-                    message=record.getMessage(),
-                    trace=record.exc_text if record.exc_text else None
-                )
-                session.add(log_entry)
-                session.commit()
-        except Exception as e:
-            # Fallback to sys.stderr if database logging fails
-            sys.stderr.write(f"Failed to log to database: {str(e)}\n")
+        with self._write_lock:
+            with self._wakeup:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return 0
+            try:
+                with metrics.span('log.flush'), self.session_maker() as session:
+                    session.execute(Log.__table__.insert(), batch)
+                    session.commit()
+                self.flushed += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                # Fallback to sys.stderr if database logging fails
+                sys.stderr.write(f"Failed to log {len(batch)} records to database: {str(e)}\n")
+            return len(batch)
 
 def setup_logging(name=__name__, level=logging.INFO, db_session_maker=None):
     """
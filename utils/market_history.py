@@ -0,0 +1,241 @@
+import datetime
+import logging
+from sqlalchemy import BigInteger, case, cast, extract, func, select
+from utils.db_pool import DatabasePool, dialect_insert, execute_values
+from utils.models import MarketBar, MarketSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Bar resolutions, finest first
+RESOLUTIONS = {
+    '1m': datetime.timedelta(minutes=1),
+    '15m': datetime.timedelta(minutes=15),
+    '1h': datetime.timedelta(hours=1),
+    '1d': datetime.timedelta(days=1),
+}
+
+# How long bars of each resolution are kept (None: forever)
+BAR_RETENTION = {
+    '1m': datetime.timedelta(days=2),
+    '15m': datetime.timedelta(days=90),
+    '1h': datetime.timedelta(days=730),
+    '1d': None,
+}
+
+SNAPSHOT_FIELDS = ('price', 'market_cap', 'volume', 'holders')
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'market_cap', 'volume', 'holders', 'samples')
+
+def floor_time(timestamp, resolution):
+    """Start of the bar of the given resolution containing timestamp"""
+    step = int(RESOLUTIONS[resolution].total_seconds())
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = int((timestamp - midnight).total_seconds()) // step * step
+    return midnight + datetime.timedelta(seconds=offset)
+
+def resolution_for(start, end, max_points=1000):
+    """Finest resolution that covers start..end in at most max_points bars"""
+    span = end - start
+    for resolution, step in RESOLUTIONS.items():
+        if span / step <= max_points:
+            return resolution
+    return resolution
+
+def aggregate_bars(snapshots, resolution):
+    """
+    Fold snapshots into per-coin bars of one resolution
+
+    Args:
+        snapshots (list): Dicts with coin_id, timestamp, price, market_cap,
+            volume and holders
+        resolution (str): Key of RESOLUTIONS
+
+    Returns:
+        list: Dicts of MarketBar column values
+    """
+    bars = {}
+    for snap in snapshots:
+        key = (snap['coin_id'], floor_time(snap['timestamp'], resolution))
+        price = snap.get('price')
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {
+                'resolution': resolution,
+                'coin_id': key[0],
+                'bucket_start': key[1],
+                'first_at': snap['timestamp'],
+                'last_at': snap['timestamp'],
+                'open': price,
+                'high': price,
+                'low': price,
+                'close': price,
+                'market_cap': snap.get('market_cap'),
+                'volume': snap.get('volume'),
+                'holders': snap.get('holders'),
+                'samples': 1,
+            }
+            continue
+        bar['samples'] += 1
+        if price is not None:
+            bar['high'] = price if bar['high'] is None else max(bar['high'], price)
+            bar['low'] = price if bar['low'] is None else min(bar['low'], price)
+        if snap['timestamp'] < bar['first_at']:
+            bar['first_at'] = snap['timestamp']
+            bar['open'] = price
+        if snap['timestamp'] >= bar['last_at']:
+            bar['last_at'] = snap['timestamp']
+            bar['close'] = price
+            for field in ('market_cap', 'volume', 'holders'):
+                bar[field] = snap.get(field)
+    return list(bars.values())
+
+def _merge_statement(dialect):
+    """INSERT ... ON CONFLICT that merges a partial bar into the stored one"""
+    table = MarketBar.__table__
+    stmt = dialect_insert(dialect)(table)
+    if dialect == 'postgresql':
+        least, greatest = func.least, func.greatest
+    else:
+        least, greatest = func.min, func.max
+
+    excluded = stmt.excluded
+    c = table.c
+    newer = excluded.last_at >= c.last_at
+    older = excluded.first_at < c.first_at
+    return stmt.on_conflict_do_update(
+        index_elements=['resolution', 'coin_id', 'bucket_start'],
+        set_={
+            'first_at': least(c.first_at, excluded.first_at),
+            'last_at': greatest(c.last_at, excluded.last_at),
+            'open': case((older, excluded.open), else_=c.open),
+            'high': greatest(func.coalesce(c.high, excluded.high), func.coalesce(excluded.high, c.high)),
+            'low': least(func.coalesce(c.low, excluded.low), func.coalesce(excluded.low, c.low)),
+            'close': case((newer, excluded.close), else_=c.close),
+            'market_cap': case((newer, excluded.market_cap), else_=c.market_cap),
+            'volume': case((newer, excluded.volume), else_=c.volume),
+            'holders': case((newer, excluded.holders), else_=c.holders),
+            'samples': c.samples + excluded.samples,
+        }
+    )
+
+def record_market_snapshots(session, snapshots):
+    """
+    Append snapshots and merge them into every bar resolution within the
+    caller's transaction
+
+    Snapshots already stored for the same (coin_id, timestamp) are ignored,
+    and only the snapshots actually inserted are merged into the bars, so
+    replaying or refetching a batch leaves samples and volumes unchanged.
+
+    Returns:
+        int: Number of snapshots written
+    """
+    if not snapshots:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    insert = dialect_insert(dialect)
+    rows = {}
+    for snap in snapshots:
+        rows.setdefault((snap['coin_id'], snap['timestamp']), {
+            'coin_id': snap['coin_id'], 'timestamp': snap['timestamp'],
+            **{field: snap.get(field) for field in SNAPSHOT_FIELDS}
+        })
+    table = MarketSnapshot.__table__
+    stmt = insert(table).on_conflict_do_nothing().returning(table.c.coin_id, table.c.timestamp)
+    inserted = {tuple(key) for key in session.execute(stmt, list(rows.values())).all()}
+    rows = [row for key, row in rows.items() if key in inserted]
+    if not rows:
+        return 0
+
+    stmt = _merge_statement(dialect)
+    for resolution in RESOLUTIONS:
+        execute_values(session, stmt, aggregate_bars(rows, resolution))
+    return len(rows)
+
+def expire_market_bars(session, now=None):
+    """Delete bars older than their resolution's BAR_RETENTION"""
+    now = now or datetime.datetime.utcnow()
+    deleted = 0
+    for resolution, keep in BAR_RETENTION.items():
+        if keep is None:
+            continue
+        deleted += session.query(MarketBar).filter(
+            MarketBar.resolution == resolution,
+            MarketBar.bucket_start < now - keep
+        ).delete(synchronize_session=False)
+    return deleted
+
+def epoch_seconds(column, dialect):
+    """SQL expression for a timestamp column as integer Unix seconds"""
+    if dialect == 'postgresql':
+        return cast(extract('epoch', column), BigInteger)
+    return cast(func.strftime('%s', column), BigInteger)
+
+def market_history(coin_ids=None, start=None, end=None, resolution='1h',
+                   fields=BAR_FIELDS, as_frame=False, chunk_size=50000):
+    """
+    Market history for a time range as columnar arrays
+
+    The range is read with a single streamed query; timestamps come back as
+    Unix seconds and rows are sorted in NumPy, so no datetime objects are
+    built per row.
+
+    Args:
+        coin_ids (list): Coins to include (default: all)
+        start (datetime): First bucket/snapshot time (inclusive)
+        end (datetime): End of the range (exclusive)
+        resolution (str): A key of RESOLUTIONS, or 'raw' for snapshots
+            (fields then default to SNAPSHOT_FIELDS)
+        fields (tuple): Value columns to return
+        as_frame (bool): Return a pandas DataFrame instead of a dict
+        chunk_size (int): Rows fetched per round trip
+
+    Returns:
+        dict or DataFrame: coin_id, timestamp (datetime64) and one float
+            array per field, ordered by coin_id then time
+    """
+    import numpy as np
+
+    if resolution == 'raw':
+        model, time_column = MarketSnapshot, MarketSnapshot.timestamp
+        fields = SNAPSHOT_FIELDS if fields is BAR_FIELDS else fields
+        where = []
+    else:
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        model, time_column = MarketBar, MarketBar.bucket_start
+        where = [MarketBar.resolution == resolution]
+
+    if coin_ids is not None:
+        where.append(model.coin_id.in_(list(coin_ids)))
+    if start is not None:
+        where.append(time_column >= start)
+    if end is not None:
+        where.append(time_column < end)
+
+    engine = DatabasePool().engine
+    query = select(
+        model.coin_id,
+        epoch_seconds(time_column, engine.dialect.name),
+        *(getattr(model, field) for field in fields)
+    ).where(*where)
+
+    # NULL values become NaN in the float columns
+    dtypes = [np.int64, np.int64] + [float] * len(fields)
+    parts = [[] for _ in dtypes]
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(query)
+        for rows in result.partitions(chunk_size):
+            for part, dtype, values in zip(parts, dtypes, zip(*rows)):
+                part.append(np.array(values, dtype=dtype))
+
+    arrays = [np.concatenate(part) if part else np.array([], dtype=dtype) for part, dtype in zip(parts, dtypes)]
+    order = np.lexsort((arrays[1], arrays[0]))
+    history = {'coin_id': arrays[0][order], 'timestamp': arrays[1][order].astype('datetime64[s]')}
+    for field, array in zip(fields, arrays[2:]):
+        history[field] = array[order]
+
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame(history)
+    return history
@@ -15,6 +15,10 @@ class Log(Base):
     message = Column(Text, nullable=False)
     trace = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index('idx_logs_timestamp', 'timestamp'),
+    )
+
     def __repr__(self):
         return f"<Log {self.timestamp} {self.level} {self.name}: {self.message}>"
 
@@ -34,6 +38,7 @@ class MigratedCoin(Base):
 
     __table_args__ = (
         Index('idx_coin_symbol', 'coin_symbol'),
+        Index('idx_contract_address', 'contract_address', unique=True),
     )
 
     def __init__(self, *args, **kwargs):
@@ -51,13 +56,20 @@ class Tweet(Base):
     __tablename__ = 'tweets'
     id = Column(Integer, primary_key=True)
     coin_id = Column(Integer, ForeignKey('migrated_coins.id'), nullable=False)
-    tweet_id = Column(String, unique=True, nullable=False)
+    tweet_id = Column(String, nullable=False)
     content = Column(String, nullable=False)
     sentiment = Column(Float)
     created_at = Column(DateTime, nullable=False)
     likes = Column(Integer)
     retweets = Column(Integer)
 
+    __table_args__ = (
+        Index('idx_tweets_created_at', 'created_at'),
+        Index('idx_tweets_coin_created', 'coin_id', 'created_at'),
+        # Upsert target; on PostgreSQL unique keys must include the partition column
+        Index('uq_tweets_tweet_id_created', 'tweet_id', 'created_at', unique=True),
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         logger.info(f"Created new Tweet entry: {self.tweet_id}")
@@ -67,4 +79,227 @@ class Tweet(Base):
             if hasattr(self, key):
                 old_value = getattr(self, key)
                 setattr(self, key, value)
-                logger.info(f"Updated Tweet {self.tweet_id} {key}: {old_value} -> {value}") 
\ No newline at end of file
+                logger.info(f"Updated Tweet {self.tweet_id} {key}: {old_value} -> {value}")
+
+def upsert_migrated_coins(rows, use_copy=False):
+    """
+    Bulk insert or update coin dicts keyed on contract_address
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    counts = DatabasePool().bulk_upsert(
+        MigratedCoin.__table__, rows, ['contract_address'], use_copy=use_copy
+    )
+    logger.info(f"Upserted migrated coins: {counts}")
+    return counts
+
+def upsert_tweets(rows, use_copy=False):
+    """
+    Bulk insert or update tweet dicts keyed on (tweet_id, created_at)
+
+    Returns:
+        dict: {'inserted': int, 'updated': int}
+    """
+    counts = DatabasePool().bulk_upsert(
+        Tweet.__table__, rows, ['tweet_id', 'created_at'], use_copy=use_copy
+    )
+    logger.info(f"Upserted tweets: {counts}")
+    return counts
+
+def stream_tweets(*columns, since=None, order_by='id', chunk_size=10000, columnar=False):
+    """
+    Stream tweets in chunks of column tuples (or columnar arrays)
+
+    Args:
+        columns: Tweet columns to project (default: id, coin_id, content,
+            sentiment, created_at)
+        since (datetime): Only tweets created at or after this time
+        order_by (str): Keyset order, 'id' or 'created_at'
+        chunk_size (int): Rows per chunk
+        columnar (bool): Yield dicts of NumPy arrays
+    """
+    columns = columns or (Tweet.id, Tweet.coin_id, Tweet.content, Tweet.sentiment, Tweet.created_at)
+    key = (Tweet.id,) if order_by == 'id' else (Tweet.created_at, Tweet.id)
+    where = [Tweet.created_at >= since] if since is not None else []
+    return DatabasePool().iter_chunks(columns, key, where, chunk_size=chunk_size, columnar=columnar)
+
+def stream_coins(*columns, chunk_size=10000, columnar=False):
+    """Stream migrated coins in chunks of column tuples (or columnar arrays)"""
+    columns = columns or (
+        MigratedCoin.id, MigratedCoin.coin_symbol, MigratedCoin.contract_address,
+        MigratedCoin.market_cap, MigratedCoin.volume
+    )
+    return DatabasePool().iter_chunks(columns, (MigratedCoin.id,), chunk_size=chunk_size, columnar=columnar)
+
+class SentimentRollup(Base):
+    __tablename__ = 'sentiment_rollups'
+    coin_id = Column(Integer, ForeignKey('migrated_coins.id'), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    tweet_count = Column(Integer, nullable=False, default=0)
+    sentiment_sum = Column(Float, nullable=False, default=0.0)
+    sentiment_sum_sq = Column(Float, nullable=False, default=0.0)
+    sentiment_min = Column(Float)
+    sentiment_max = Column(Float)
+    likes = Column(Integer, nullable=False, default=0)
+    retweets = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_sentiment_rollups_bucket', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f"<SentimentRollup {self.coin_id} {self.bucket_start}: {self.tweet_count} tweets>"
+
+class SentimentCacheEntry(Base):
+    __tablename__ = 'sentiment_cache'
+    text_hash = Column(String(32), primary_key=True)
+    sentiment = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SentimentCacheEntry {self.text_hash}: {self.sentiment}>"
+
+class MarketSnapshot(Base):
+    """Append-only market data point; one row per coin per market update"""
+    __tablename__ = 'market_snapshots'
+    coin_id = Column(Integer, ForeignKey('migrated_coins.id'), primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    price = Column(Float)
+    market_cap = Column(Float)
+    volume = Column(Float)
+    holders = Column(Integer)
+
+    __table_args__ = (
+        Index('idx_market_snapshots_timestamp', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f"<MarketSnapshot {self.coin_id} {self.timestamp}: {self.price}>"
+
+class MarketBar(Base):
+    """
+    Downsampled market data (1m, 15m, 1h, 1d)
+
+    first_at/last_at are the timestamps of the earliest and latest snapshot
+    merged into the bar, so open and close stay correct when snapshots
+    arrive out of order.
+    """
+    __tablename__ = 'market_bars'
+    resolution = Column(String(4), primary_key=True)
+    coin_id = Column(Integer, ForeignKey('migrated_coins.id'), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    market_cap = Column(Float)
+    volume = Column(Float)
+    holders = Column(Integer)
+    samples = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_market_bars_bucket', 'resolution', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f"<MarketBar {self.resolution} {self.coin_id} {self.bucket_start}: {self.close}>"
+
+class CoinAlertState(Base):
+    """Rolling per-coin state the alert rules are evaluated against"""
+    __tablename__ = 'coin_alert_state'
+    coin_id = Column(Integer, ForeignKey('migrated_coins.id'), primary_key=True)
+    volume_mean = Column(Float)
+    volume_var = Column(Float)
+    volume_samples = Column(Integer, nullable=False, default=0)
+    last_price = Column(Float)
+    market_updated_at = Column(DateTime)
+    sentiment_mean = Column(Float)
+    sentiment_var = Column(Float)
+    sentiment_samples = Column(Integer, nullable=False, default=0)
+    last_migration_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<CoinAlertState {self.coin_id}>"
+
+class Alert(Base):
+    __tablename__ = 'alerts'
+    id = Column(Integer, primary_key=True)
+    coin_id = Column(Integer, ForeignKey('migrated_coins.id'), nullable=False)
+    kind = Column(String(32), nullable=False)
+    value = Column(Float)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    notified_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('idx_alerts_coin_kind_created', 'coin_id', 'kind', 'created_at'),
+        Index('idx_alerts_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<Alert {self.kind} {self.coin_id} {self.created_at}: {self.message}>"
+
+class JobShard(Base):
+    """
+    One shard of a scheduled round of a distributed job, and its lease
+
+    A worker owns the shard while lease_expires_at is in the future and
+    extends it with heartbeats; an expired lease can be claimed by any
+    worker. See utils.leases.
+    """
+    __tablename__ = 'job_shards'
+    job = Column(String(64), primary_key=True)
+    round_start = Column(DateTime, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    range_start = Column(Integer)
+    range_end = Column(Integer)
+    state = Column(String(16), nullable=False, default='pending')
+    owner = Column(String(128))
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0)
+    progress_done = Column(Integer)
+    progress_total = Column(Integer)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index('idx_job_shards_state', 'job', 'round_start', 'state'),
+    )
+
+    def __repr__(self):
+        return f"<JobShard {self.job} {self.round_start} #{self.shard}: {self.state}>"
+
+class Watermark(Base):
+    """Named ingestion cursor stored as JSON; see utils.watermarks"""
+    __tablename__ = 'watermarks'
+    name = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Watermark {self.name}: {self.value}>"
+
+class RowHash(Base):
+    """
+    Content hash of the last written version of an ingested row
+
+    seen_at is when that version was written, which makes it the per-row
+    refresh watermark as well; fetching a row unchanged writes nothing.
+    """
+    __tablename__ = 'row_hashes'
+    source = Column(String(32), primary_key=True)
+    key = Column(String(128), primary_key=True)
+    hash = Column(String(32), nullable=False)
+    seen_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('idx_row_hashes_seen', 'source', 'seen_at'),
+    )
+
+    def __repr__(self):
+        return f"<RowHash {self.source} {self.key}: {self.hash}>"
@@ -0,0 +1,166 @@
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+TELEGRAM_MAX_MESSAGE = 4096
+# Attempts per Telegram message after the first, with exponential backoff
+TELEGRAM_RETRIES = int(os.getenv('TELEGRAM_RETRIES', 3))
+TELEGRAM_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class PartialDelivery(Exception):
+    """
+    Raised by send() when only some alerts of a batch were delivered
+
+    Attributes:
+        delivered (list): The alerts that were delivered
+    """
+
+    def __init__(self, message, delivered):
+        super().__init__(message)
+        self.delivered = delivered
+
+class Notifier:
+    """
+    Delivers batches of alerts
+
+    Subclasses implement send(); raising leaves the batch undelivered so it
+    is retried on the next notification pass. A notifier that delivered
+    part of the batch before failing raises PartialDelivery, so only the
+    rest is retried.
+    """
+
+    def send(self, alerts):
+        """
+        Deliver one batch of alerts
+
+        Args:
+            alerts (list): Dicts with coin_symbol, kind, message and created_at
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def format(alerts):
+        return [f"[{alert['kind']}] {alert['message']}" for alert in alerts]
+
+class TelegramNotifier(Notifier):
+    """
+    Sends each batch to a Telegram chat in as few messages as fit
+
+    A message that fails with a connection error, a timeout, 429 or a 5xx
+    is retried with exponential backoff (honoring Telegram's retry_after).
+    If it still fails after earlier messages of the batch went out, send()
+    raises PartialDelivery with the alerts of those messages.
+    """
+
+    def __init__(self, token=None, chat_id=None, api_url=TELEGRAM_API_URL, timeout=10,
+                 retries=TELEGRAM_RETRIES, backoff=1.0, max_backoff=30.0, sleep=time.sleep):
+        self.token = token or os.getenv('TELEGRAM_BOT_TOKEN')
+        self.chat_id = chat_id or os.getenv('TELEGRAM_USER_CHAT_ID')
+        self.api_url = api_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        if not self.token or not self.chat_id:
+            raise ValueError("TELEGRAM_BOT_TOKEN and TELEGRAM_USER_CHAT_ID must be set")
+
+    def send(self, alerts):
+        delivered = []
+        for text, included in self._messages(alerts):
+            try:
+                self._post(text)
+            except Exception as e:
+                if delivered:
+                    raise PartialDelivery(f"{len(delivered)} of {len(alerts)} alerts delivered: {e}",
+                                          delivered) from e
+                raise
+            delivered.extend(included)
+
+    def _post(self, text):
+        import requests
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                response = requests.post(
+                    f"{self.api_url}/bot{self.token}/sendMessage",
+                    json={'chat_id': self.chat_id, 'text': text, 'disable_web_page_preview': True},
+                    timeout=self.timeout
+                )
+                if response.status_code not in TELEGRAM_RETRY_STATUSES:
+                    response.raise_for_status()
+                    return
+                retry_after = _retry_after(response)
+                error = requests.HTTPError(f"{response.status_code} from Telegram", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            delay = retry_after if retry_after is not None else self.backoff * 2 ** attempt
+            logger.warning(f"Telegram send failed ({error}); retrying in {delay:.1f}s")
+            self._sleep(min(delay, self.max_backoff))
+
+    def _messages(self, alerts):
+        """Pack alerts into messages under Telegram's length limit, as (text, alerts)"""
+        message, included = '', []
+        for alert, line in zip(alerts, self.format(alerts)):
+            line = line[:TELEGRAM_MAX_MESSAGE]
+            if message and len(message) + 1 + len(line) > TELEGRAM_MAX_MESSAGE:
+                yield message, included
+                message, included = '', []
+            message = f"{message}\n{line}" if message else line
+            included.append(alert)
+        if message:
+            yield message, included
+
+def _retry_after(response):
+    """Seconds Telegram asks to wait (Retry-After or parameters.retry_after), or None"""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        try:
+            value = response.json().get('parameters', {}).get('retry_after')
+        except ValueError:
+            return None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class StubNotifier(Notifier):
+    """Keeps batches in memory instead of sending them (local runs and benchmarks)"""
+
+    def __init__(self):
+        self.batches = []
+
+    def send(self, alerts):
+        self.batches.append(list(alerts))
+        for line in self.format(alerts):
+            logger.info(f"Alert: {line}")
+
+    @property
+    def sent(self):
+        return [alert for batch in self.batches for alert in batch]
+
+def get_notifier(name=None):
+    """
+    Notifier selected by ALERT_NOTIFIER ('telegram', 'stub' or 'none')
+
+    Defaults to Telegram when its credentials are configured, otherwise none.
+    """
+    name = name or os.getenv('ALERT_NOTIFIER')
+    if name is None:
+        name = 'telegram' if os.getenv('TELEGRAM_BOT_TOKEN') and os.getenv('TELEGRAM_USER_CHAT_ID') else 'none'
+    if name == 'telegram':
+        return TelegramNotifier()
+    if name == 'stub':
+        return StubNotifier()
+    if name == 'none':
+        return None
+    raise ValueError(f"Unknown notifier: {name}")
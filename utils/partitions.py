@@ -0,0 +1,251 @@
+import datetime
+import logging
+import os
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.schema import CreateTable
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_AHEAD = int(os.getenv('PARTITIONS_AHEAD', 3))
+
+# Time-partitioned tables: partition column, partition period, retention
+PARTITIONED_TABLES = {
+    'tweets': {
+        'column': 'created_at',
+        'period': 'month',
+        'retention_days': int(os.getenv('TWEET_RETENTION_DAYS', 365)),
+    },
+    'logs': {
+        'column': 'timestamp',
+        'period': 'day',
+        'retention_days': int(os.getenv('LOG_RETENTION_DAYS', 30)),
+    },
+    'market_snapshots': {
+        'column': 'timestamp',
+        'period': 'day',
+        'retention_days': int(os.getenv('MARKET_SNAPSHOT_RETENTION_DAYS', 30)),
+    },
+}
+
+def period_start(timestamp, period):
+    """Start of the month or day containing timestamp"""
+    start = datetime.datetime(timestamp.year, timestamp.month, timestamp.day)
+    return start.replace(day=1) if period == 'month' else start
+
+def next_period(start, period):
+    """Start of the period after the one beginning at start"""
+    if period == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + datetime.timedelta(days=1)
+
+def partition_name(table, start, period):
+    """e.g. tweets_p2026_10 or logs_p2026_10_18"""
+    return f"{table}_p{start:%Y_%m}" if period == 'month' else f"{table}_p{start:%Y_%m_%d}"
+
+def _partition_start(name, table, period):
+    """Inverse of partition_name; None for the default partition"""
+    fmt = '%Y_%m' if period == 'month' else '%Y_%m_%d'
+    try:
+        return datetime.datetime.strptime(name[len(table) + 2:], fmt)
+    except ValueError:
+        return None
+
+def is_partitioned(conn, table):
+    """True if table is a PostgreSQL partitioned parent"""
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :name"
+    ), {'name': table}).first() is not None
+
+def _partitions(conn, table):
+    return [row[0] for row in conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"
+    ), {'name': table})]
+
+def check_unique_keys(metadata):
+    """
+    Raise ValueError if a PARTITIONED_TABLES model has a unique key without
+    its partition column
+
+    PostgreSQL cannot enforce such a key on a partitioned table, so the
+    models declare only composite unique keys (e.g. tweets'
+    (tweet_id, created_at)) and both backends enforce the same ones.
+    """
+    for name, spec in PARTITIONED_TABLES.items():
+        table = metadata.tables.get(name)
+        if table is None:
+            continue
+        keys = [[column.name] for column in table.columns if column.unique]
+        keys += [constraint.columns.keys() for constraint in table.constraints
+                 if isinstance(constraint, UniqueConstraint)]
+        keys += [index.columns.keys() for index in table.indexes if index.unique]
+        for key in keys:
+            if spec['column'] not in key:
+                raise ValueError(f"Unique key ({', '.join(key)}) on partitioned table {name} "
+                                 f"must include {spec['column']}")
+
+def create_partitioned_tables(engine, metadata):
+    """
+    On PostgreSQL, create the PARTITIONED_TABLES as range-partitioned parents
+
+    The DDL is generated from the model columns. PostgreSQL requires the
+    partition column in every primary/unique key, so it is appended to the
+    primary key when missing (e.g. (id, created_at)); other unique keys
+    must already include it (check_unique_keys, on every backend) and are
+    created as the model's unique indexes. Each table gets a DEFAULT
+    partition so inserts never fail for lack of a partition. Existing
+    tables are left untouched.
+    """
+    check_unique_keys(metadata)
+    if engine.dialect.name != 'postgresql':
+        return
+    existing = set(inspect(engine).get_table_names())
+
+    with engine.begin() as conn:
+        for name, spec in PARTITIONED_TABLES.items():
+            table = metadata.tables.get(name)
+            if table is None or name in existing:
+                continue
+            compiler = CreateTable(table).compile(dialect=engine.dialect)
+            parts = [compiler.get_column_specification(column) for column in table.columns]
+            key = [column.name for column in table.primary_key.columns]
+            if spec['column'] not in key:
+                key.append(spec['column'])
+            parts.append(f"PRIMARY KEY ({', '.join(key)})")
+            parts.extend(compiler.process(fk) for fk in table.foreign_key_constraints)
+            conn.execute(text(
+                f"CREATE TABLE {name} ({', '.join(parts)}) PARTITION BY RANGE ({spec['column']})"
+            ))
+            conn.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+            logger.info(f"Created partitioned table {name}")
+
+def ensure_indexes(engine, metadata):
+    """Create any missing indexes on the PARTITIONED_TABLES (also for existing tables)"""
+    for name in PARTITIONED_TABLES:
+        table = metadata.tables.get(name)
+        if table is None:
+            continue
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def ensure_partitions(engine, now=None, ahead=PARTITIONS_AHEAD):
+    """
+    Create partitions from the retention horizon up to `ahead` periods ahead
+
+    Returns:
+        list: Names of partitions created
+    """
+    now = now or datetime.datetime.utcnow()
+    created = []
+    for name, spec in PARTITIONED_TABLES.items():
+        with engine.connect() as conn:
+            if not is_partitioned(conn, name):
+                continue
+            existing = set(_partitions(conn, name))
+
+        period = spec['period']
+        start = period_start(now - datetime.timedelta(days=spec['retention_days']), period)
+        last = period_start(now, period)
+        for _ in range(ahead):
+            last = next_period(last, period)
+
+        while start <= last:
+            end = next_period(start, period)
+            partition = partition_name(name, start, period)
+            if partition not in existing:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(text(
+                            f"CREATE TABLE {partition} PARTITION OF {name} "
+                            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                        ))
+                    created.append(partition)
+                except Exception as e:
+                    # Typically rows for this range already sit in the default partition
+                    logger.warning(f"Could not create partition {partition}: {e}")
+            start = end
+
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+def apply_retention(engine, now=None):
+    """
+    Remove rows older than each table's retention period
+
+    Partitioned tables drop whole expired partitions and only run a DELETE
+    against the default partition. Plain tables fall back to an indexed
+    range DELETE.
+
+    Returns:
+        dict: table -> {'dropped_partitions': [...], 'deleted_rows': int}
+    """
+    now = now or datetime.datetime.utcnow()
+    report = {}
+    for name, spec in PARTITIONED_TABLES.items():
+        cutoff = now - datetime.timedelta(days=spec['retention_days'])
+        column = spec['column']
+        dropped = []
+        with engine.begin() as conn:
+            if name not in inspect(conn).get_table_names():
+                continue
+            if is_partitioned(conn, name):
+                for partition in _partitions(conn, name):
+                    start = _partition_start(partition, name, spec['period'])
+                    if start is not None and next_period(start, spec['period']) <= cutoff:
+                        conn.execute(text(f"DROP TABLE {partition}"))
+                        dropped.append(partition)
+                target = f"{name}_default"
+            else:
+                target = name
+            deleted = conn.execute(
+                text(f"DELETE FROM {target} WHERE {column} < :cutoff"), {'cutoff': cutoff}
+            ).rowcount
+        report[name] = {'dropped_partitions': dropped, 'deleted_rows': deleted}
+        logger.info(f"Retention for {name} (before {cutoff:%Y-%m-%d}): "
+                    f"dropped {len(dropped)} partitions, deleted {deleted} rows")
+    return report
+
+def expire_row_hashes(engine, now=None):
+    """
+    Forget the ingestion hashes of tweets past the tweet retention
+
+    Returns:
+        int: Hashes deleted
+    """
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(days=PARTITIONED_TABLES['tweets']['retention_days'])
+    with engine.begin() as conn:
+        if 'row_hashes' not in inspect(conn).get_table_names():
+            return 0
+        deleted = conn.execute(
+            text("DELETE FROM row_hashes WHERE source = 'tweets' AND seen_at < :cutoff"), {'cutoff': cutoff}
+        ).rowcount
+    logger.info(f"Expired {deleted} tweet hashes (before {cutoff:%Y-%m-%d})")
+    return deleted
+
+def run_partition_maintenance(engine=None):
+    """
+    Create upcoming partitions and enforce retention
+
+    With ARCHIVE_DIR set, closed days are archived to Parquet first, so
+    retention only removes rows that are already archived.
+    """
+    if engine is None:
+        from utils.db_pool import DatabasePool
+        engine = DatabasePool().engine
+    created = ensure_partitions(engine)
+    report = {'created': created}
+    if os.getenv('ARCHIVE_DIR'):
+        # pyarrow is only loaded when archiving is enabled
+        from utils.archive import export_archive
+        report['archived'] = export_archive(engine)
+    retention = apply_retention(engine)
+    retention['row_hashes'] = {'deleted_rows': expire_row_hashes(engine)}
+    report['retention'] = retention
+    return report
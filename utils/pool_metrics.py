@@ -0,0 +1,132 @@
+import bisect
+import time
+from threading import Lock
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Histogram bucket upper bounds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+LIFETIME_BUCKETS_S = (1, 10, 60, 300, 900, 1800, 3600, 7200, 86400)
+
+class Histogram:
+    """Fixed-bucket histogram with approximate percentiles"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = fraction * self.count
+            seen = 0
+            for bound, count in zip(self.bounds, self.counts):
+                seen += count
+                if seen >= target:
+                    return min(bound, self.max)
+            return self.max
+
+    def snapshot(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        with self._lock:
+            buckets = dict(zip(labels, self.counts))
+            count, total, maximum = self.count, self.total, self.max
+        return {
+            'count': count,
+            'avg': total / count if count else 0.0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': maximum,
+            'buckets': buckets,
+        }
+
+class PoolMetrics:
+    """
+    Connection pool counters collected through SQLAlchemy pool events
+
+    Checkout wait time (including connects made to serve the checkout) and
+    timeouts come from InstrumentedQueuePool; connection lifetimes and
+    checkout/checkin/connect/close/invalidate counts from pool events.
+    """
+
+    def __init__(self):
+        self.checkout_wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.connection_lifetime_s = Histogram(LIFETIME_BUCKETS_S)
+        self.counters = {
+            'checkouts': 0,
+            'checkins': 0,
+            'connects': 0,
+            'closes': 0,
+            'invalidations': 0,
+            'timeouts': 0,
+        }
+        self._lock = Lock()
+
+    def increment(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def attach(self, engine):
+        """Register pool event listeners on an engine"""
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', lambda *args: self.increment('checkouts'))
+        event.listen(engine, 'checkin', lambda *args: self.increment('checkins'))
+        event.listen(engine, 'invalidate', lambda *args: self.increment('invalidations'))
+        event.listen(engine, 'close', self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        connection_record.info['connected_at'] = time.monotonic()
+        self.increment('connects')
+
+    def _on_close(self, dbapi_connection, connection_record):
+        connected_at = connection_record.info.pop('connected_at', None)
+        if connected_at is not None:
+            self.connection_lifetime_s.observe(time.monotonic() - connected_at)
+        self.increment('closes')
+
+    def snapshot(self, pool=None):
+        """Counters, histograms and, when given a QueuePool, live gauges"""
+        with self._lock:
+            report = dict(self.counters)
+        report['checkout_wait_ms'] = self.checkout_wait_ms.snapshot()
+        report['connection_lifetime_s'] = self.connection_lifetime_s.snapshot()
+        if isinstance(pool, QueuePool):
+            report.update({
+                'size': pool.size(),
+                'in_use': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        return report
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout and counts pool timeouts"""
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.increment('timeouts')
+            raise
+        finally:
+            self.metrics.checkout_wait_ms.observe((time.perf_counter() - start) * 1000)
+
+def instrumented_pool_class(metrics):
+    """InstrumentedQueuePool bound to metrics (kept across pool.recreate())"""
+    return type('InstrumentedQueuePool', (InstrumentedQueuePool,), {'metrics': metrics})
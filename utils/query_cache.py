@@ -0,0 +1,163 @@
+import logging
+import time
+from functools import wraps
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Cache tags invalidated by the scheduler when tasks write new data
+COINS = 'coins'
+SENTIMENT = 'sentiment'
+
+class QueryCache:
+    """
+    Process-wide TTL cache for dashboard queries
+
+    Module globals survive Streamlit reruns and are shared by every session
+    in the same process, so one cached result serves all analysts. Entries
+    expire after their query's TTL and can be dropped early by tag when the
+    scheduler writes new data. Concurrent misses for the same key wait for
+    a single query instead of all hitting the database.
+
+    Each tag has a generation counter bumped by invalidate(); a result whose
+    tags were invalidated while it was loading is returned to its caller
+    but not stored, since it may predate the new data.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = {}
+        # key -> [lock, callers holding or waiting for it]; removed when unused
+        self._key_locks = {}
+        self._generations = {}
+        self._cleared = 0
+        self._lock = Lock()
+        self._stats = {}
+
+    def cached(self, name, ttl, tags=()):
+        """
+        Decorator caching a function's result per argument tuple
+
+        Args:
+            name (str): Query name used in stats
+            ttl (float): Seconds a result stays valid
+            tags (tuple): Invalidation tags, e.g. ('coins',)
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.get_or_load(
+                    name, (name, args, tuple(sorted(kwargs.items()))), ttl, tags,
+                    lambda: func(*args, **kwargs)
+                )
+            return wrapper
+        return decorator
+
+    def get_or_load(self, name, key, ttl, tags, loader):
+        """Return the cached value for key, calling loader on a miss"""
+        stats = self._query_stats(name)
+        start = time.perf_counter()
+
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self._record(stats, 'hits', start)
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = [Lock(), 0]
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                value = self._lookup(key)
+                if value is not _MISSING:
+                    self._record(stats, 'hits', start)
+                    return value
+                with self._lock:
+                    generation = self._generation(tags)
+                value = loader()
+                with self._lock:
+                    if self._generation(tags) == generation:
+                        self._entries[key] = (self._clock() + ttl, frozenset(tags), value)
+                self._record(stats, 'misses', start)
+                return value
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the tags (all entries if none given)"""
+        with self._lock:
+            if not tags:
+                self._cleared += 1
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                for tag in tags:
+                    self._generations[tag] = self._generations.get(tag, 0) + 1
+                stale = [key for key, entry in self._entries.items() if entry[1] & set(tags)]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+        if dropped:
+            logger.debug(f"Invalidated {dropped} cached queries for tags {tags}")
+
+    def stats(self):
+        """
+        Per-query counters
+
+        Returns:
+            dict: name -> hits, misses, hit_ratio, avg_hit_ms and avg_query_ms
+        """
+        with self._lock:
+            report = {}
+            for name, stats in self._stats.items():
+                lookups = stats['hits'] + stats['misses']
+                report[name] = {
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'hit_ratio': stats['hits'] / lookups if lookups else 0.0,
+                    'avg_hit_ms': 1000 * stats['hit_seconds'] / stats['hits'] if stats['hits'] else 0.0,
+                    'avg_query_ms': 1000 * stats['miss_seconds'] / stats['misses'] if stats['misses'] else 0.0,
+                }
+            return report
+
+    def hit_ratio(self):
+        """Hit ratio across all queries"""
+        with self._lock:
+            hits = sum(stats['hits'] for stats in self._stats.values())
+            lookups = hits + sum(stats['misses'] for stats in self._stats.values())
+        return hits / lookups if lookups else 0.0
+
+    def _generation(self, tags):
+        return self._cleared, tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                return _MISSING
+            return entry[2]
+
+    def _query_stats(self, name):
+        with self._lock:
+            return self._stats.setdefault(
+                name, {'hits': 0, 'misses': 0, 'hit_seconds': 0.0, 'miss_seconds': 0.0}
+            )
+
+    def _record(self, stats, outcome, start):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats[outcome] += 1
+            stats['hit_seconds' if outcome == 'hits' else 'miss_seconds'] += elapsed
+
+_MISSING = object()
+
+# Shared by all Streamlit sessions and the scheduler in this process
+query_cache = QueryCache()
@@ -0,0 +1,167 @@
+import datetime
+import logging
+from sqlalchemy import func, select
+from utils.db_pool import dialect_insert
+from utils.models import MigratedCoin, SentimentRollup, Tweet
+
+logger = logging.getLogger(__name__)
+
+BUCKET = datetime.timedelta(hours=1)
+
+# Dashboard time range -> how far back to read buckets (None: everything)
+TIME_RANGES = {
+    'Last 24 Hours': datetime.timedelta(hours=24),
+    'Last Week': datetime.timedelta(days=7),
+    'Last Month': datetime.timedelta(days=30),
+    'All Time': None,
+}
+
+def bucket_start(timestamp):
+    """Start of the hourly bucket containing timestamp"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def range_start(time_range, now=None):
+    """First bucket to read for a dashboard time range, or None for all"""
+    span = TIME_RANGES[time_range]
+    if span is None:
+        return None
+    return bucket_start((now or datetime.datetime.utcnow()) - span)
+
+def aggregate(rows):
+    """
+    Fold scored tweets into per-coin, per-bucket partial aggregates
+
+    Args:
+        rows (list): (coin_id, created_at, sentiment, likes, retweets) tuples
+
+    Returns:
+        list: Dicts of SentimentRollup column values
+    """
+    buckets = {}
+    for coin_id, created_at, sentiment, likes, retweets in rows:
+        key = (coin_id, bucket_start(created_at))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {
+                'coin_id': coin_id,
+                'bucket_start': key[1],
+                'tweet_count': 0,
+                'sentiment_sum': 0.0,
+                'sentiment_sum_sq': 0.0,
+                'sentiment_min': sentiment,
+                'sentiment_max': sentiment,
+                'likes': 0,
+                'retweets': 0,
+            }
+        bucket['tweet_count'] += 1
+        bucket['sentiment_sum'] += sentiment
+        bucket['sentiment_sum_sq'] += sentiment * sentiment
+        bucket['sentiment_min'] = min(bucket['sentiment_min'], sentiment)
+        bucket['sentiment_max'] = max(bucket['sentiment_max'], sentiment)
+        bucket['likes'] += likes or 0
+        bucket['retweets'] += retweets or 0
+    return list(buckets.values())
+
+def apply_sentiment_rollups(session, rows):
+    """
+    Merge newly scored tweets into sentiment_rollups within the caller's transaction
+
+    Returns:
+        int: Number of buckets touched
+    """
+    partials = aggregate(rows)
+    if not partials:
+        return 0
+
+    table = SentimentRollup.__table__
+    dialect = session.get_bind().dialect.name
+    stmt = dialect_insert(dialect)(table)
+    if dialect == 'postgresql':
+        least, greatest = func.least, func.greatest
+    else:
+        least, greatest = func.min, func.max
+
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['coin_id', 'bucket_start'],
+        set_={
+            'tweet_count': table.c.tweet_count + excluded.tweet_count,
+            'sentiment_sum': table.c.sentiment_sum + excluded.sentiment_sum,
+            'sentiment_sum_sq': table.c.sentiment_sum_sq + excluded.sentiment_sum_sq,
+            'sentiment_min': least(table.c.sentiment_min, excluded.sentiment_min),
+            'sentiment_max': greatest(table.c.sentiment_max, excluded.sentiment_max),
+            'likes': table.c.likes + excluded.likes,
+            'retweets': table.c.retweets + excluded.retweets,
+        }
+    )
+    session.execute(stmt, partials)
+    return len(partials)
+
+def rebuild_sentiment_rollups(session, chunk_size=50000):
+    """Recompute sentiment_rollups from all scored tweets (backfill/repair)"""
+    session.execute(SentimentRollup.__table__.delete())
+    last_id = 0
+    total = 0
+    while True:
+        rows = session.query(
+            Tweet.id, Tweet.coin_id, Tweet.created_at, Tweet.sentiment, Tweet.likes, Tweet.retweets
+        ).filter(
+            Tweet.sentiment.isnot(None),
+            Tweet.id > last_id
+        ).order_by(Tweet.id).limit(chunk_size).all()
+        if not rows:
+            break
+        apply_sentiment_rollups(session, [row[1:] for row in rows])
+        last_id = rows[-1].id
+        total += len(rows)
+    session.commit()
+    logger.info(f"Rebuilt sentiment rollups from {total} tweets")
+    return total
+
+def sentiment_summary(session, since=None):
+    """
+    Per-coin sentiment statistics read from the rollup buckets
+
+    Args:
+        session: Database session
+        since (datetime): Only include buckets starting at or after this time
+
+    Returns:
+        list: Rows with coin_id, coin_symbol, tweet_count, sentiment (mean),
+            sentiment_std, sentiment_min, sentiment_max, likes and retweets
+    """
+    count = func.sum(SentimentRollup.tweet_count)
+    total = func.sum(SentimentRollup.sentiment_sum)
+    total_sq = func.sum(SentimentRollup.sentiment_sum_sq)
+    query = select(
+        SentimentRollup.coin_id,
+        MigratedCoin.coin_symbol,
+        count.label('tweet_count'),
+        total.label('sentiment_sum'),
+        total_sq.label('sentiment_sum_sq'),
+        func.min(SentimentRollup.sentiment_min).label('sentiment_min'),
+        func.max(SentimentRollup.sentiment_max).label('sentiment_max'),
+        func.sum(SentimentRollup.likes).label('likes'),
+        func.sum(SentimentRollup.retweets).label('retweets'),
+    ).join(MigratedCoin, MigratedCoin.id == SentimentRollup.coin_id).group_by(
+        SentimentRollup.coin_id, MigratedCoin.coin_symbol
+    )
+    if since is not None:
+        query = query.where(SentimentRollup.bucket_start >= since)
+
+    summary = []
+    for row in session.execute(query):
+        mean = row.sentiment_sum / row.tweet_count
+        variance = max(row.sentiment_sum_sq / row.tweet_count - mean * mean, 0.0)
+        summary.append({
+            'coin_id': row.coin_id,
+            'coin_symbol': row.coin_symbol,
+            'tweet_count': row.tweet_count,
+            'sentiment': mean,
+            'sentiment_std': variance ** 0.5,
+            'sentiment_min': row.sentiment_min,
+            'sentiment_max': row.sentiment_max,
+            'likes': row.likes,
+            'retweets': row.retweets,
+        })
+    return summary
@@ -1,22 +1,124 @@
-import schedule
 import time
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
 import logging
-from datetime import datetime
-from utils.data_fetcher import fetch_migrated_coins, update_market_data
-from utils.sentiment_analyzer import analyze_sentiment
+from datetime import datetime, timedelta
+from utils.instrumentation import span
+from utils.task_runner import task_runner
 
 logger = logging.getLogger(__name__)
 
+class Job:
+    """
+    A recurring task and the state of its most recent run
+
+    Args:
+        name (str): Display name
+        func: Callable run on each tick
+        interval (float): Seconds between runs
+        schedule (str): Human readable schedule
+        overlap (str): What to do when the previous run is still active:
+            'skip' drops the new run, 'queue' runs it once the previous one
+            finishes (at most one queued run)
+        timeout (float): Seconds after which a run is reported as timed out
+    """
+
+    def __init__(self, name, func, interval, schedule, overlap='skip', timeout=None):
+        if overlap not in ('skip', 'queue'):
+            raise ValueError(f"Unknown overlap policy: {overlap}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.schedule = schedule
+        self.overlap = overlap
+        self.timeout = timeout
+        self.state = 'idle'
+        self.last_dispatch = None
+        self.running = False
+        self.queued = False
+        self.timed_out = False
+        self.next_run = None
+        self.started = None
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+        self.skips = 0
+
 class TaskScheduler:
-    def __init__(self):
+    """
+    Runs the recurring jobs on a bounded worker pool
+
+    A dispatcher thread checks which jobs are due once per tick and hands
+    them to the pool, so a slow job never delays the others. Each job runs
+    at most once at a time; see Job for the overlap policies. Python threads
+    cannot be killed, so a run that exceeds its timeout is reported as
+    'timed_out' but keeps its slot until it returns.
+
+    Args:
+        max_workers (int): Size of the worker pool
+        clock: Monotonic time source (injectable for tests)
+        now: Wall clock used for reported times
+        executor: Executor to run jobs on (default: a ThreadPoolExecutor)
+        tick (float): Seconds between dispatcher checks
+        distributed (bool): Run the task jobs as lease-coordinated rounds
+            shared with the other distributed schedulers (see utils.leases)
+        default_jobs (bool): Register the market, sentiment, fetch and
+            partitions jobs (tests register their own)
+    """
+
+    def __init__(self, max_workers=3, clock=time.monotonic, now=datetime.now, executor=None, tick=1.0,
+                 distributed=False, default_jobs=True):
+        self._clock = clock
+        self._distributed = distributed
+        self._now = now
+        self._max_workers = max_workers
+        self._executor = executor
+        self._tick = tick
+        self._lock = Lock()
+        self._stop = Event()
         self._running = False
         self._thread = None
-        self.last_run = {
-            'market_data': None,
-            'sentiment': None,
-            'migrations': None
-        }
+        self.jobs = {}
+
+        if default_jobs:
+            self.add_task_job('market', 15 * 60, 'Every 15 min')
+            self.add_task_job('sentiment', 60 * 60, 'Every hour')
+            self.add_task_job('fetch', 6 * 60 * 60, 'Every 6 hours')
+            self.add_task_job('partitions', 24 * 60 * 60, 'Daily')
+
+    def add_job(self, job):
+        """Register a job; its first run is one interval from now"""
+        job.timeout = job.timeout or job.interval
+        job.next_run = self._clock() + job.interval
+        self.jobs[job.name] = job
+        return job
+
+    def add_task_job(self, task, interval, schedule, runner=task_runner):
+        """
+        Register a job for a TaskRunner task
+
+        The job runs through the shared runner, so a tick that lands while
+        the same task was started from the dashboard waits for that run
+        instead of starting a second one.
+
+        In distributed mode the job instead joins the task's round for the
+        current wall-clock slot, where the schedulers on every host split
+        its shards between them; the first run is immediate so a worker
+        that starts mid-slot helps with (or skips) the round in progress.
+        """
+        if self._distributed:
+            from utils.leases import lease_worker
+
+            job = self.add_job(Job(
+                runner.label(task), lambda: lease_worker.run_round(task, interval), interval, schedule
+            ))
+            job.next_run = self._clock()
+            return job
+        return self.add_job(Job(
+            runner.label(task), lambda: runner.run(task, trigger='scheduler'), interval, schedule
+        ))
 
     def is_running(self):
         return self._running
@@ -24,53 +126,129 @@ class TaskScheduler:
     def start(self):
         if not self._running:
             self._running = True
+            self._stop.clear()
             self._thread = Thread(target=self._run_scheduler, daemon=True)
             self._thread.start()
             logger.info("Scheduler started")
 
     def stop(self):
+        """Stop dispatching; runs already in progress finish in the background"""
         self._running = False
+        self._stop.set()
         if self._thread:
             self._thread.join()
             logger.info("Scheduler stopped")
 
     def _run_scheduler(self):
-        # Schedule jobs
-        schedule.every(15).minutes.do(self._run_market_update)
-        schedule.every(1).hours.do(self._run_sentiment_analysis)
-        schedule.every(6).hours.do(self._run_fetch_migrations)
-        
         while self._running:
-            schedule.run_pending()
-            time.sleep(1)
+            self.run_pending()
+            self._stop.wait(self._tick)
+
+    def run_pending(self):
+        """Dispatch every due job and flag runs that exceeded their timeout"""
+        now = self._clock()
+        for job in list(self.jobs.values()):
+            with self._lock:
+                if job.running and not job.timed_out and now - job.started > job.timeout:
+                    job.timed_out = True
+                    job.state = 'timed_out'
+                    logger.error(f"{job.name} has been running for {now - job.started:.0f}s "
+                                 f"(timeout {job.timeout:.0f}s)")
+            if job.next_run <= now:
+                # Catch up to the next future slot rather than replaying missed ticks
+                missed = int((now - job.next_run) // job.interval) + 1
+                job.next_run += missed * job.interval
+                self.dispatch(job)
 
-    def _run_market_update(self):
-        update_market_data()
-        self.last_run['market_data'] = datetime.now()
+    def dispatch(self, job):
+        """Submit a job now, honoring its overlap policy"""
+        with self._lock:
+            if job.running:
+                if job.overlap == 'queue' and not job.queued:
+                    job.queued = True
+                    job.last_dispatch = 'queued'
+                    logger.info(f"{job.name} still running, queued next run")
+                else:
+                    job.skips += 1
+                    job.last_dispatch = 'skipped'
+                    logger.warning(f"{job.name} still running, skipped run")
+                return False
+            job.running = True
+            job.timed_out = False
+            job.started = self._clock()
+            job.state = 'running'
+            job.last_dispatch = 'started'
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix='scheduler'
+                )
+        self._executor.submit(self._execute, job)
+        return True
 
-    def _run_sentiment_analysis(self):
-        analyze_sentiment()
-        self.last_run['sentiment'] = datetime.now()
+    def _execute(self, job):
+        error = None
+        try:
+            with span(f"scheduler.{job.name.lower().replace(' ', '_')}"):
+                job.func()
+        except Exception as e:
+            error = e
+            logger.error(f"{job.name} failed: {e}", exc_info=True)
 
-    def _run_fetch_migrations(self):
-        fetch_migrated_coins()
-        self.last_run['migrations'] = datetime.now()
+        finished = self._clock()
+        with self._lock:
+            job.last_duration = finished - job.started
+            job.last_run = self._now()
+            job.last_error = str(error) if error else None
+            job.runs += 1
+            if error:
+                job.failures += 1
+                job.state = 'failed'
+            elif job.timed_out:
+                job.state = 'timed_out'
+            else:
+                job.state = 'succeeded'
+            job.running = False
+            rerun = job.queued
+            job.queued = False
+        logger.info(f"{job.name} {job.state} in {job.last_duration:.1f}s")
+
+        if rerun:
+            self.dispatch(job)
 
     def get_task_status(self):
-        return {
-            'Update Market Data': {
-                'schedule': 'Every 15 min',
-                'last_run': self.last_run['market_data'],
-                'status': 'Active' if self._running else 'Inactive'
-            },
-            'Sentiment Analysis': {
-                'schedule': 'Every hour',
-                'last_run': self.last_run['sentiment'],
-                'status': 'Active' if self._running else 'Inactive'
-            },
-            'Fetch Migrations': {
-                'schedule': 'Every 6 hours',
-                'last_run': self.last_run['migrations'],
-                'status': 'Active' if self._running else 'Inactive'
-            }
-        } 
\ No newline at end of file
+        now = self._clock()
+        status = {}
+        with self._lock:
+            for name, job in self.jobs.items():
+                status[name] = {
+                    'schedule': job.schedule,
+                    'last_run': job.last_run,
+                    'last_duration': job.last_duration,
+                    'next_run': self._now() + timedelta(seconds=job.next_run - now) if self._running else None,
+                    'status': job.state,
+                    'last_dispatch': job.last_dispatch,
+                    'runs': job.runs,
+                    'failures': job.failures,
+                    'skips': job.skips,
+                    'last_error': job.last_error
+                }
+        return status
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+def get_scheduler(start=True, distributed=False):
+    """
+    The process-wide scheduler, created (and started) on the first call
+
+    Streamlit runs Home.py once per session and rerun; going through this
+    keeps one scheduler per process however many sessions are open.
+    distributed only applies to the call that creates it.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TaskScheduler(distributed=distributed)
+            if start:
+                _scheduler.start()
+        return _scheduler
@@ -1,18 +1,174 @@
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import bindparam, update
+from utils.alert_engine import alert_engine
 from utils.db_pool import DatabasePool
+from utils.instrumentation import span
 from utils.models import Tweet
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils.rollups import apply_sentiment_rollups
+from utils.sentiment_cache import sentiment_cache, text_hash
+from utils.task_runner import report_progress
 
 logger = logging.getLogger(__name__)
-analyzer = SentimentIntensityAnalyzer()
+_analyzer = None
 
-def analyze_sentiment():
+CHUNK_SIZE = int(os.getenv('SENTIMENT_CHUNK_SIZE', 5000))
+WORKERS = int(os.getenv('SENTIMENT_WORKERS', os.cpu_count() or 1))
+
+# Executed once per chunk with one parameter set per tweet (executemany)
+_tweets = Tweet.__table__
+_update_sentiment = (
+    update(_tweets)
+    .where(_tweets.c.id == bindparam('tweet_pk'))
+    .values(sentiment=bindparam('score'))
+)
+
+def get_analyzer():
+    """
+    The VADER-compatible scorer with the SENTIMENT_LEXICON_OVERLAY entries,
+    built on first use (loading its lexicon is slow)
+    """
+    global _analyzer
+    if _analyzer is None:
+        from utils.fast_vader import FastVader, load_overlay
+
+        _analyzer = FastVader(load_overlay())
+    return _analyzer
+
+def score_texts(texts):
+    """Return the VADER compound score for each text"""
+    return get_analyzer().score_many(texts)
+
+def score_batch(texts, executor=None, workers=1):
+    """
+    Score a batch of texts, splitting it across the executor's worker processes
+
+    Args:
+        texts (list): Tweet contents to score
+        executor: ProcessPoolExecutor to fan out to (scores in-process if None)
+        workers (int): Number of slices to split the batch into
+
+    Returns:
+        list: Compound scores in the same order as texts
+    """
+    if executor is None or workers <= 1 or len(texts) < workers * 2:
+        return score_texts(texts)
+
+    # Build the analyzer before the pool forks so workers inherit it
+    get_analyzer()
+    step = -(-len(texts) // workers)
+    slices = [texts[i:i + step] for i in range(0, len(texts), step)]
+    scores = []
+    for part in executor.map(score_texts, slices):
+        scores.extend(part)
+    return scores
+
+def score_with_cache(texts, session=None, executor=None, workers=1, cache=sentiment_cache):
+    """
+    Score texts, running VADER only once per distinct normalized text
+
+    Returns:
+        tuple: (scores in the same order as texts, number of texts actually scored)
+    """
+    # Scores from another lexicon overlay must not be reused
+    salt = get_analyzer().fingerprint
+    hashes = [text_hash(text, salt) for text in texts]
+    scores_by_hash = cache.get_many(hashes, session)
+
+    pending = {}
+    for key, text in zip(hashes, texts):
+        if key not in scores_by_hash and key not in pending:
+            pending[key] = text
+
+    if pending:
+        fresh = dict(zip(pending, score_batch(list(pending.values()), executor, workers)))
+        cache.put_many(fresh, session)
+        scores_by_hash.update(fresh)
+
+    return [scores_by_hash[key] for key in hashes], len(pending)
+
+def _fetch_unscored(session, after_id, chunk_size, end_id=None):
+    """Fetch the next keyset page of unscored tweets"""
+    query = session.query(
+        Tweet.id, Tweet.content, Tweet.coin_id, Tweet.created_at, Tweet.likes, Tweet.retweets
+    ).filter(
+        Tweet.sentiment.is_(None),
+        Tweet.id > after_id
+    )
+    if end_id is not None:
+        query = query.filter(Tweet.id < end_id)
+    return query.order_by(Tweet.id).limit(chunk_size).all()
+
+def analyze_sentiment(chunk_size=None, workers=None, start_id=None, end_id=None, before_commit=None):
+    """
+    Score all tweets that have no sentiment yet
+
+    Tweets are read in keyset-paginated chunks, deduplicated through the
+    sentiment cache, scored across a process pool and written back with one
+    bulk UPDATE per chunk. The per-coin sentiment rollups and alert state are
+    updated in the same transaction.
+
+    Args:
+        start_id, end_id (int): Only score tweets with start_id <= id < end_id
+        before_commit: Called with the session before each chunk commits
+            (distributed runs use it to check their lease)
+
+    Returns:
+        int: Number of tweets scored
+    """
     logger.info("Running sentiment analysis...")
     db = DatabasePool()
-    
+    chunk_size = chunk_size or CHUNK_SIZE
+    workers = workers or WORKERS
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    scored = 0
+    computed = 0
+
     try:
         with db.get_session() as session:
-            # Implementation of sentiment analysis here
-            logger.info("Sentiment analysis completed successfully")
+            last_id = start_id - 1 if start_id is not None else 0
+            while True:
+                with span('sentiment.fetch'):
+                    rows = _fetch_unscored(session, last_id, chunk_size, end_id)
+                if not rows:
+                    break
+
+                with span('sentiment.score'):
+                    scores, misses = score_with_cache(
+                        [row.content for row in rows], session, executor, workers
+                    )
+                with span('sentiment.write'):
+                    session.execute(_update_sentiment, [
+                        {'tweet_pk': row.id, 'score': score}
+                        for row, score in zip(rows, scores)
+                    ])
+                scored_rows = [
+                    (row.coin_id, row.created_at, score, row.likes, row.retweets)
+                    for row, score in zip(rows, scores)
+                ]
+                with span('sentiment.rollups'):
+                    apply_sentiment_rollups(session, scored_rows)
+                alert_engine.on_sentiment(session, scored_rows)
+                if before_commit:
+                    before_commit(session)
+                with span('sentiment.commit'):
+                    session.commit()
+
+                last_id = rows[-1].id
+                scored += len(rows)
+                computed += misses
+                report_progress(scored, message='Scoring tweets')
+            logger.info(
+                f"Sentiment analysis completed successfully: {scored} tweets scored, "
+                f"{computed} VADER calls, cache {sentiment_cache.stats()}"
+            )
     except Exception as e:
-        logger.error(f"Error in sentiment analysis: {e}") 
\ No newline at end of file
+        logger.error(f"Error in sentiment analysis: {e}")
+        raise
+    finally:
+        if executor:
+            executor.shutdown()
+
+    alert_engine.notify()
+    return scored
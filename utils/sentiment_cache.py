@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import re
+from collections import Counter, OrderedDict
+from threading import Lock
+from utils.db_pool import dialect_insert
+from utils.models import SentimentCacheEntry
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', 100000))
+CACHE_PERSISTENT = os.getenv('SENTIMENT_CACHE_PERSISTENT', 'false').lower() in ('1', 'true', 'yes')
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+_LOOKUP_BATCH = 500
+
+_URL_RE = re.compile(r'(?:https?://|www\.)\S+')
+_ADDRESS_RE = re.compile(r'[1-9A-HJ-NP-Za-km-z]{32,44}')
+
+def _normalize_token(token):
+    if _URL_RE.fullmatch(token):
+        # VADER counts '!' and '?' over the whole text, URLs included
+        return '<url' + ''.join(char for char in token if char in '!?') + '>'
+    if _ADDRESS_RE.fullmatch(token) and not token.isupper():
+        return '<address>'
+    return token
+
+def normalize_text(text):
+    """
+    Canonicalize tweet text so copies of the same message share a cache key
+
+    Only changes that cannot change the VADER score: runs of whitespace are
+    squeezed (the scorer splits on whitespace) and whole URL and base58
+    contract address tokens are replaced with placeholders. Case and
+    cashtags are kept, since ALL-CAPS emphasis and lexicon words such as
+    $MOON are scored.
+    """
+    return ' '.join(_normalize_token(token) for token in text.split())
+
+def text_hash(text, salt=''):
+    """
+    Content address of a tweet: hex digest of its normalized text, prefixed
+    with salt (the scorer's lexicon fingerprint) when given
+    """
+    text = normalize_text(text)
+    if salt:
+        text = f"{salt}\x00{text}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+class SentimentCache:
+    """
+    Two-tier sentiment cache keyed on text_hash()
+
+    The first tier is a bounded in-process LRU. The optional second tier is
+    the sentiment_cache table, consulted on LRU misses and shared between
+    processes and runs.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, persistent=CACHE_PERSISTENT):
+        self.max_size = max_size
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, hashes, session=None):
+        """
+        Look up scores for a batch of hashes
+
+        Repeats of a missing hash within the batch count as hits, since the
+        caller scores each distinct text only once.
+
+        Returns:
+            dict: hash -> score for every hash found in either tier
+        """
+        counts = Counter(hashes)
+        found = {}
+        missing = []
+        with self._lock:
+            for key in counts:
+                score = self._entries.get(key)
+                if score is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = score
+            self.hits += sum(counts[key] for key in found)
+
+        if missing and self.persistent and session is not None:
+            stored = self._load(session, missing)
+            self._remember(stored)
+            found.update(stored)
+            missing = [key for key in missing if key not in stored]
+            with self._lock:
+                self.persistent_hits += sum(counts[key] for key in stored)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += sum(counts[key] - 1 for key in missing)
+        return found
+
+    def put_many(self, scores, session=None):
+        """Store freshly computed hash -> score pairs in every enabled tier"""
+        self._remember(scores)
+        if scores and self.persistent and session is not None:
+            self._store(session, scores)
+
+    def stats(self):
+        """Counters for monitoring the dedup ratio"""
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.persistent_hits) / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Empty the in-process tier and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.persistent_hits = self.misses = self.evictions = 0
+
+    def _remember(self, scores):
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, session, hashes):
+        stored = {}
+        for i in range(0, len(hashes), _LOOKUP_BATCH):
+            batch = hashes[i:i + _LOOKUP_BATCH]
+            rows = session.query(
+                SentimentCacheEntry.text_hash,
+                SentimentCacheEntry.sentiment
+            ).filter(SentimentCacheEntry.text_hash.in_(batch)).all()
+            stored.update((row.text_hash, row.sentiment) for row in rows)
+        return stored
+
+    def _store(self, session, scores):
+        table = SentimentCacheEntry.__table__
+        dialect = session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            stmt = dialect_insert(dialect)(table).on_conflict_do_nothing(index_elements=['text_hash'])
+        else:
+            stmt = table.insert()
+        session.execute(stmt, [
+            {'text_hash': key, 'sentiment': score} for key, score in scores.items()
+        ])
+
+# Process-wide cache shared by every analyze_sentiment run
+sentiment_cache = SentimentCache()
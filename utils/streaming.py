@@ -0,0 +1,354 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import time
+import aiohttp
+from utils.async_fetcher import AsyncFetcher, api_headers, api_url
+from utils.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+STREAM_URL = os.getenv('STREAM_URL', '')
+# Events buffered between two stages; a full queue stops the stage before it
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 1000))
+# A batch is written when it has this many events or is this old
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+STREAM_FLUSH_INTERVAL = float(os.getenv('STREAM_FLUSH_INTERVAL', 1.0))
+# First reconnect delay, doubled per failed attempt up to STREAM_MAX_RECONNECT_DELAY
+STREAM_RECONNECT_DELAY = float(os.getenv('STREAM_RECONNECT_DELAY', 1.0))
+STREAM_MAX_RECONNECT_DELAY = float(os.getenv('STREAM_MAX_RECONNECT_DELAY', 30.0))
+
+CHECKPOINT = 'stream'
+# Latencies kept for the percentiles in report()
+_LATENCY_SAMPLES = 100000
+
+def _dated(row, field):
+    """row, or None (skipped when written) if it has no timestamp to key it on"""
+    return row if row[field] is not None else None
+
+def read_checkpoint():
+    """Id of the last persisted event, or None"""
+    from utils.db_pool import DatabasePool
+    from utils.watermarks import watermarks
+
+    with DatabasePool().get_session() as session:
+        return (watermarks.get(session, CHECKPOINT) or {}).get('event_id')
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class StreamIngestor:
+    """
+    Receive -> enrich -> persist pipeline over bounded asyncio queues
+
+    Feed events are JSON objects with an increasing integer id, a type, the
+    payload and optionally the time the feed emitted them (epoch seconds):
+
+        {"id": 42, "type": "migration", "ts": 1718000000.5, "data": {<PumpFun coin>}}
+        {"id": 43, "type": "tweet", "data": {"tweet_id": ..., "content": ..., ...}}
+
+    ws:// and wss:// URLs are read as WebSocket text frames, http:// and
+    https:// ones as server-sent events (the event JSON in the data field).
+    After a reconnect the feed is asked to resume after the last event
+    received: the since query parameter for WebSockets, the Last-Event-ID
+    header for SSE.
+
+    - receive reads the feed and parses events
+    - enrich maps payloads with parse_coin and parse_tweet, looks up the
+      RugCheck status of migrations concurrently and attributes tweets
+      without a coin_id; events whose payload does not parse are counted
+      as malformed and dropped, and events without a timestamp are skipped
+    - persist batches events and writes them in a worker thread through
+      ingest_migrations and ingest_tweets, then stores the checkpoint
+
+    While the database is slow the persist stage stops taking events, the
+    queues fill up and receive stops reading the socket, which pushes back
+    on the feed through TCP flow control instead of buffering without
+    bound. The checkpoint is written after the data, so a crash replays the
+    last batch (the upserts make that harmless) rather than losing it.
+
+    Args:
+        url (str): Feed URL (default STREAM_URL)
+        queue_size, batch_size, flush_interval: See the STREAM_* settings
+        enrich (bool): Look up RugCheck status for migrations
+        since: Resume after this event id (default: the stored checkpoint)
+    """
+
+    def __init__(self, url=None, queue_size=None, batch_size=None, flush_interval=None,
+                 enrich=True, since=None):
+        self.url = url or STREAM_URL
+        if not self.url:
+            raise ValueError("STREAM_URL is not set")
+        self.queue_size = queue_size or STREAM_QUEUE_SIZE
+        self.batch_size = batch_size or STREAM_BATCH_SIZE
+        self.flush_interval = STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.enrich = enrich
+        self.since = since
+        self._received = None
+        self._enriched = None
+        self._last_received = None
+        self.latencies = collections.deque(maxlen=_LATENCY_SAMPLES)
+        self.stats = {
+            'received': 0, 'persisted': 0, 'skipped': 0, 'batches': 0, 'connects': 0,
+            'reconnects': 0, 'malformed': 0, 'backpressure_s': 0.0, 'max_queued': 0,
+        }
+        self._started = None
+        self._elapsed = None
+
+    async def run(self, duration=None, max_events=None):
+        """
+        Ingest until duration seconds have passed, max_events were received
+        or the task is cancelled, then persist everything received
+
+        Returns:
+            dict: report()
+        """
+        if self.since is None:
+            self.since = await asyncio.to_thread(read_checkpoint)
+        self._received = asyncio.Queue(self.queue_size)
+        self._enriched = asyncio.Queue(self.queue_size)
+        self._started = time.monotonic()
+        async with AsyncFetcher() as fetcher:
+            receiver = asyncio.create_task(self._receive(max_events))
+            enricher = asyncio.create_task(self._enrich(fetcher))
+            persister = asyncio.create_task(self._persist())
+            try:
+                await asyncio.wait([receiver, enricher, persister], timeout=duration,
+                                   return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                receiver.cancel()
+                # The end marker goes to the first live stage; each stage
+                # passes on what it holds, then the marker
+                if persister.done():
+                    enricher.cancel()
+                elif enricher.done():
+                    await self._enriched.put(None)
+                else:
+                    await self._received.put(None)
+                results = await asyncio.gather(receiver, enricher, persister, return_exceptions=True)
+                self._elapsed = time.monotonic() - self._started
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return self.report()
+
+    async def _receive(self, max_events=None):
+        delay = STREAM_RECONNECT_DELAY
+        read = self._read_websocket if self.url.startswith(('ws://', 'wss://')) else self._read_sse
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=10)) as session:
+            while max_events is None or self.stats['received'] < max_events:
+                try:
+                    self.stats['connects'] += 1
+                    async for event in read(session):
+                        delay = STREAM_RECONNECT_DELAY
+                        if event is None:
+                            continue
+                        await self._put(self._received, event)
+                        if max_events is not None and self.stats['received'] >= max_events:
+                            return
+                    logger.warning(f"Stream feed closed; reconnecting in {delay:.1f}s")
+                except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                    logger.warning(f"Stream feed failed: {e}; reconnecting in {delay:.1f}s")
+                self.stats['reconnects'] += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STREAM_MAX_RECONNECT_DELAY)
+
+    def _resume_after(self):
+        """Last event id received (not yet persisted ones included), else the checkpoint"""
+        return self._last_received if self._last_received is not None else self.since
+
+    async def _read_websocket(self, session):
+        since = self._resume_after()
+        params = {'since': since} if since is not None else None
+        async with session.ws_connect(self.url, params=params, heartbeat=30) as ws:
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    yield self._parse(message.data)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    raise ConnectionError(ws.exception())
+
+    async def _read_sse(self, session):
+        since = self._resume_after()
+        headers = {'Accept': 'text/event-stream'}
+        if since is not None:
+            headers['Last-Event-ID'] = str(since)
+        async with session.get(self.url, headers=headers) as response:
+            response.raise_for_status()
+            data = []
+            async for line in response.content:
+                line = line.decode('utf-8').rstrip('\r\n')
+                if not line:
+                    if data:
+                        yield self._parse('\n'.join(data))
+                        data = []
+                elif line.startswith('data:'):
+                    data.append(line[5:].lstrip(' '))
+
+    def _parse(self, text):
+        """Decoded event, or None (logged and counted) when it is malformed"""
+        try:
+            event = json.loads(text)
+            event['id'] = int(event['id'])
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Skipping malformed stream event ({e}): {text[:200]}")
+            self.stats['malformed'] += 1
+            return None
+        event['received_at'] = time.time()
+        self._last_received = event['id']
+        self.stats['received'] += 1
+        return event
+
+    async def _put(self, queue, item):
+        """Put, counting the time spent waiting on a full queue as backpressure"""
+        if queue.full():
+            start = time.monotonic()
+            await queue.put(item)
+            self.stats['backpressure_s'] += time.monotonic() - start
+        else:
+            queue.put_nowait(item)
+        self.stats['max_queued'] = max(self.stats['max_queued'], queue.qsize())
+
+    async def _enrich(self, fetcher):
+        from utils.attribution import attribution_index
+        from utils.data_fetcher import parse_coin, parse_tweet
+
+        while True:
+            events = [await self._received.get()]
+            while events[-1] is not None and not self._received.empty() and len(events) < self.batch_size:
+                events.append(self._received.get_nowait())
+            done = events[-1] is None
+            events = [event for event in events if event is not None]
+
+            migrations = self._parse_rows(
+                [event for event in events if event.get('type') == 'migration'],
+                lambda data: _dated(parse_coin(data), 'migration_date') if data.get('mint') else None
+            )
+            if self.enrich:
+                await self._check_contracts(fetcher, [event['row'] for event in migrations if event['row']])
+
+            tweets = self._parse_rows(
+                [event for event in events if event.get('type') == 'tweet'],
+                lambda data: _dated(parse_tweet(data), 'created_at')
+            )
+            if any(event['row'] and event['row']['coin_id'] is None for event in tweets):
+                if not attribution_index.loaded:
+                    await asyncio.to_thread(attribution_index.load)
+                for event in tweets:
+                    row = event['row']
+                    if row and row['coin_id'] is None:
+                        row['coin_id'] = attribution_index.attribute(row['content'])
+                        if row['coin_id'] is None:
+                            event['row'] = None
+
+            for event in events:
+                if not event.get('malformed'):
+                    await self._put(self._enriched, event)
+            if done:
+                await self._enriched.put(None)
+                return
+
+    def _parse_rows(self, events, parse):
+        """
+        Set each event's row to parse(event['data']) and return the events
+
+        An event whose payload cannot be parsed is logged, counted as
+        malformed and marked to be dropped, so it cannot stop the pipeline.
+        """
+        parsed = []
+        for event in events:
+            try:
+                event['row'] = parse(event['data'])
+            except (AttributeError, KeyError, TypeError, ValueError, OverflowError, OSError) as e:
+                logger.warning(f"Skipping malformed {event['type']} event {event['id']} ({e!r})")
+                self.stats['malformed'] += 1
+                event['malformed'] = True
+                continue
+            parsed.append(event)
+        return parsed
+
+    async def _check_contracts(self, fetcher, coins):
+        from utils.data_fetcher import RUGCHECK_PATH, contract_status
+
+        reports = await asyncio.gather(*(
+            fetcher.get_json(
+                api_url('rugcheck', RUGCHECK_PATH.format(mint=coin['contract_address'])),
+                headers=api_headers('rugcheck'),
+                key=('rugcheck', coin['contract_address'])
+            )
+            for coin in coins
+        ), return_exceptions=True)
+        for coin, report in zip(coins, reports):
+            if not isinstance(report, Exception):
+                coin['contract_status'] = contract_status(report)
+
+    async def _persist(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = await asyncio.wait_for(self._enriched.get(), timeout)
+            except asyncio.TimeoutError:
+                event = False
+            if event:
+                batch.append(event)
+                deadline = deadline or time.monotonic() + self.flush_interval
+            if batch and (event is None or event is False or len(batch) >= self.batch_size
+                          or time.monotonic() >= deadline):
+                # Written in a thread: the event loop keeps receiving meanwhile
+                await asyncio.to_thread(self._write, batch)
+                batch = []
+                deadline = None
+            if event is None:
+                return
+
+    def _write(self, batch):
+        from utils.data_fetcher import ingest_migrations, ingest_tweets
+        from utils.db_pool import DatabasePool
+        from utils.watermarks import watermarks
+
+        migrations = [event['row'] for event in batch if event.get('type') == 'migration' and event.get('row')]
+        tweets = [event['row'] for event in batch if event.get('type') == 'tweet' and event.get('row')]
+        with span('stream.write'):
+            if migrations:
+                ingest_migrations(migrations)
+            if tweets:
+                ingest_tweets(tweets)
+            with DatabasePool().get_session() as session:
+                watermarks.set(session, CHECKPOINT, {'event_id': batch[-1]['id']})
+                session.commit()
+
+        committed = time.time()
+        self.latencies.extend(committed - (event.get('ts') or event['received_at']) for event in batch)
+        self.stats['persisted'] += len(migrations) + len(tweets)
+        self.stats['skipped'] += len(batch) - len(migrations) - len(tweets)
+        self.stats['batches'] += 1
+        self.since = batch[-1]['id']
+
+    def report(self):
+        """Counts, events/s and end-to-end latency percentiles (seconds)"""
+        elapsed = self._elapsed or (time.monotonic() - self._started if self._started else 0)
+        latencies = list(self.latencies)
+        return dict(
+            self.stats,
+            checkpoint=self.since,
+            elapsed_s=round(elapsed, 3),
+            events_per_s=round(self.stats['received'] / elapsed, 1) if elapsed else None,
+            latency_p50_s=_percentile(latencies, 0.5),
+            latency_p95_s=_percentile(latencies, 0.95),
+            latency_p99_s=_percentile(latencies, 0.99),
+            latency_max_s=max(latencies) if latencies else None,
+        )
+
+def run_stream(url=None, duration=None, max_events=None, **options):
+    """Run a StreamIngestor until done or interrupted and return its report"""
+    ingestor = StreamIngestor(url, **options)
+    try:
+        return asyncio.run(ingestor.run(duration, max_events))
+    except KeyboardInterrupt:
+        return ingestor.report()
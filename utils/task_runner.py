@@ -0,0 +1,250 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Event, Lock, local
+from utils.query_cache import COINS, SENTIMENT, query_cache
+
+logger = logging.getLogger(__name__)
+
+# name -> (label, 'module:function', cache tags to invalidate after a successful run).
+# Task modules are imported on the first run, so main.py can read this table
+# without loading SQLAlchemy.
+TASKS = {
+    'fetch': ('Fetch Migrations', 'utils.data_fetcher:fetch_migrated_coins', (COINS,)),
+    'market': ('Update Market Data', 'utils.data_fetcher:update_market_data', (COINS,)),
+    'sentiment': ('Sentiment Analysis', 'utils.sentiment_analyzer:analyze_sentiment', (SENTIMENT,)),
+    'partitions': ('Partition Maintenance', 'utils.partitions:run_partition_maintenance', ()),
+}
+
+_current = local()
+
+def report_progress(done=None, total=None, message=None):
+    """
+    Record progress of the task run executing on this thread
+
+    A no-op outside a TaskRunner run (e.g. `main.py task`), so tasks can
+    call it unconditionally.
+    """
+    run = getattr(_current, 'run', None)
+    if run is not None:
+        run._set_progress(done, total, message)
+
+@contextmanager
+def progress_to(target):
+    """Route report_progress() calls on this thread to target._set_progress"""
+    previous = getattr(_current, 'run', None)
+    _current.run = target
+    try:
+        yield target
+    finally:
+        _current.run = previous
+
+class TaskRun:
+    """
+    One execution of a task, shared by every caller that requested the task
+    while it was in flight
+
+    Attributes:
+        task (str): Task name
+        run_id (int): Increasing id per runner
+        trigger (str): Who started the run ('scheduler', 'dashboard', ...)
+        attached (int): Later requests that joined this run instead of
+            starting another
+        state (str): 'running', 'succeeded' or 'failed'
+    """
+
+    def __init__(self, task, run_id, trigger, started_at, clock):
+        self.task = task
+        self.run_id = run_id
+        self.trigger = trigger
+        self.attached = 0
+        self.state = 'running'
+        self.started_at = started_at
+        self.finished_at = None
+        self.duration = None
+        self.result = None
+        self.error = None
+        self.progress = {'done': None, 'total': None, 'message': None}
+        self._clock = clock
+        self._start = clock()
+        self._done = Event()
+        self._lock = Lock()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the run finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def snapshot(self):
+        """Plain-dict view of the run for display"""
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            'run_id': self.run_id,
+            'trigger': self.trigger,
+            'attached': self.attached,
+            'state': self.state,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed': self.duration if self.done else self._clock() - self._start,
+            'error': str(self.error) if self.error else None,
+            'progress': progress,
+        }
+
+    def _set_progress(self, done, total, message):
+        with self._lock:
+            if done is not None:
+                self.progress['done'] = done
+            if total is not None:
+                self.progress['total'] = total
+            if message is not None:
+                self.progress['message'] = message
+
+    def _finish(self, result, error, finished_at):
+        self.result = result
+        self.error = error
+        self.finished_at = finished_at
+        self.duration = self._clock() - self._start
+        self.state = 'failed' if error else 'succeeded'
+        self._done.set()
+
+class TaskRunner:
+    """
+    Single-flight execution of the named tasks
+
+    A request for a task that is already running attaches to the in-flight
+    run instead of starting another, so dashboard buttons pressed by
+    several analysts and the scheduler never refresh the same data twice
+    at once. submit() returns immediately with the shared TaskRun for
+    polling; run() waits for it.
+
+    Args:
+        tasks (dict): See TASKS
+        max_workers (int): Threads running tasks (one per distinct task is enough)
+        clock: Monotonic time source
+        now: Wall clock used for reported times
+    """
+
+    def __init__(self, tasks=TASKS, max_workers=None, clock=time.monotonic, now=datetime.now):
+        self._tasks = dict(tasks)
+        self._funcs = {}
+        self._max_workers = max_workers or len(self._tasks)
+        self._executor = None
+        self._clock = clock
+        self._now = now
+        self._lock = Lock()
+        self._runs = {}
+        self._last = {}
+        self._next_id = 1
+
+    def label(self, name):
+        return self._tasks[name][0]
+
+    def submit(self, name, trigger='manual'):
+        """
+        Start a task, or attach to its run in flight
+
+        Returns:
+            tuple: (TaskRun, True if this call started it)
+        """
+        if name not in self._tasks:
+            raise ValueError(f"Unknown task: {name}")
+        with self._lock:
+            run = self._runs.get(name)
+            if run is not None:
+                run.attached += 1
+                logger.info(f"{self.label(name)} already running (run {run.run_id}), "
+                            f"attached {trigger} request")
+                return run, False
+            run = TaskRun(name, self._next_id, trigger, self._now(), self._clock)
+            self._next_id += 1
+            self._runs[name] = run
+            self._last[name] = run
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix='task'
+                )
+        logger.info(f"{self.label(name)} started by {trigger} (run {run.run_id})")
+        self._executor.submit(self._execute, run)
+        return run, True
+
+    def run(self, name, trigger='manual', timeout=None):
+        """
+        Run a task (or join its run in flight) and wait for it
+
+        Raises:
+            TimeoutError: The run did not finish within timeout
+            Exception: Whatever the task raised
+        """
+        run, _ = self.submit(name, trigger)
+        if not run.wait(timeout):
+            raise TimeoutError(f"{self.label(name)} still running after {timeout}s")
+        if run.error:
+            raise run.error
+        return run.result
+
+    def current(self, name):
+        """The in-flight run of a task, or None"""
+        with self._lock:
+            return self._runs.get(name)
+
+    def active(self):
+        """Names of the tasks currently running"""
+        with self._lock:
+            return list(self._runs)
+
+    def status(self):
+        """
+        Latest run per task
+
+        Returns:
+            dict: name -> label plus the TaskRun.snapshot() of the latest run
+                (None if the task never ran in this process)
+        """
+        with self._lock:
+            latest = dict(self._last)
+        return {
+            name: {'label': label, 'run': latest[name].snapshot() if name in latest else None}
+            for name, (label, _, _) in self._tasks.items()
+        }
+
+    def _resolve(self, name):
+        func = self._funcs.get(name)
+        if func is None:
+            target = self._tasks[name][1]
+            if callable(target):
+                func = target
+            else:
+                module, attr = target.split(':')
+                func = getattr(importlib.import_module(module), attr)
+            self._funcs[name] = func
+        return func
+
+    def _execute(self, run):
+        from utils.instrumentation import span
+
+        result, error = None, None
+        try:
+            with progress_to(run), span(f"task.{run.task}"):
+                result = self._resolve(run.task)()
+            tags = self._tasks[run.task][2]
+            if tags:
+                query_cache.invalidate(*tags)
+        except Exception as e:
+            error = e
+            logger.error(f"{self.label(run.task)} failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._runs.pop(run.task, None)
+            run._finish(result, error, self._now())
+        logger.info(f"{self.label(run.task)} {run.state} in {run.duration:.1f}s "
+                    f"({run.attached} requests attached)")
+
+# Shared by the scheduler and every dashboard session in this process
+task_runner = TaskRunner()
@@ -0,0 +1,145 @@
+import datetime
+import hashlib
+import json
+import logging
+from threading import Lock
+from utils.db_pool import dialect_insert, execute_values
+from utils.models import RowHash, Watermark
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+_LOOKUP_BATCH = 500
+
+def row_hash(row, fields):
+    """Content hash of a row dict over fields (stable across processes and runs)"""
+    payload = json.dumps([row.get(field) for field in fields], default=str, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+class WatermarkStore:
+    """
+    Cursors and per-row content hashes for incremental ingestion
+
+    A cursor records how far a source has been read (e.g. the migrations
+    feed offset and latest migration time, the newest tweet id), so the next
+    run asks only for what came after it. Row hashes record the content of
+    the last written version of each row, so rows fetched again unchanged
+    are dropped before they reach the database.
+
+    Writes happen in the caller's session after the data itself was
+    written: a crash in between makes the next run rewrite those rows,
+    never skip them.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}
+
+    def get(self, session, name):
+        """Cursor value (JSON-decoded), or None"""
+        value = session.query(Watermark.value).filter(Watermark.name == name).scalar()
+        return json.loads(value) if value is not None else None
+
+    def set(self, session, name, value):
+        """Store a cursor value in the caller's transaction"""
+        table = Watermark.__table__
+        stmt = dialect_insert(session.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+        )
+        session.execute(stmt, {
+            'name': name, 'value': json.dumps(value, default=str),
+            'updated_at': datetime.datetime.utcnow(),
+        })
+
+    def load(self, session, source, keys):
+        """
+        Stored hashes for keys
+
+        Returns:
+            dict: key -> (hash, seen_at) for the keys that have one
+        """
+        keys = [str(key) for key in keys]
+        stored = {}
+        for i in range(0, len(keys), _LOOKUP_BATCH):
+            stored.update(
+                (key, (digest, seen_at))
+                for key, digest, seen_at in session.query(RowHash.key, RowHash.hash, RowHash.seen_at).filter(
+                    RowHash.source == source, RowHash.key.in_(keys[i:i + _LOOKUP_BATCH])
+                )
+            )
+        return stored
+
+    def diff(self, session, source, rows, key, fields, stored=None):
+        """
+        Split fetched rows into the changed ones and their new hashes
+
+        Args:
+            rows (list): Row dicts
+            key (str): Field identifying a row
+            fields (tuple): Fields whose content is compared
+            stored (dict): Result of load() if the caller already has it
+
+        Returns:
+            tuple: (rows that are new or changed, {key: hash} for every row)
+        """
+        hashes = {str(row[key]): row_hash(row, fields) for row in rows}
+        if stored is None:
+            stored = self.load(session, source, hashes)
+        changed = [
+            row for row in rows
+            if stored.get(str(row[key]), (None,))[0] != hashes[str(row[key])]
+        ]
+        return changed, hashes
+
+    def remember(self, session, source, hashes, seen_at=None):
+        """Record {key: hash} as written (and fetched at seen_at) in the caller's transaction"""
+        if not hashes:
+            return 0
+        seen_at = seen_at or datetime.datetime.utcnow()
+        table = RowHash.__table__
+        stmt = dialect_insert(session.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['source', 'key'],
+            set_={'hash': stmt.excluded.hash, 'seen_at': stmt.excluded.seen_at}
+        )
+        return execute_values(session, stmt, [
+            {'source': source, 'key': key, 'hash': digest, 'seen_at': seen_at}
+            for key, digest in hashes.items()
+        ])
+
+    def expire(self, session, source, before):
+        """Forget hashes of rows not fetched since before"""
+        return session.query(RowHash).filter(
+            RowHash.source == source, RowHash.seen_at < before
+        ).delete(synchronize_session=False)
+
+    def record(self, source, fetched, changed):
+        """Log and keep the fetched vs changed counts of a run"""
+        stats = {'fetched': fetched, 'changed': changed, 'at': datetime.datetime.utcnow()}
+        with self._lock:
+            totals = self._stats.setdefault(source, {'runs': 0, 'fetched': 0, 'changed': 0, 'skipped': 0})
+            totals['runs'] += 1
+            totals['fetched'] += fetched
+            totals['changed'] += changed
+            totals['last'] = stats
+        logger.info(f"{source}: {fetched} rows fetched, {changed} changed")
+        return stats
+
+    def skip(self, source, rows, reason):
+        """Log and count rows of a source dropped before the diff"""
+        if not rows:
+            return
+        with self._lock:
+            totals = self._stats.setdefault(source, {'runs': 0, 'fetched': 0, 'changed': 0, 'skipped': 0})
+            totals['skipped'] += rows
+        logger.warning(f"{source}: {rows} rows skipped ({reason})")
+
+    def stats(self):
+        """Fetched vs changed (and skipped) rows per source for this process (totals and last run)"""
+        with self._lock:
+            return {source: dict(totals) for source, totals in self._stats.items()}
+
+# Process-wide store used by the ingestion tasks
+watermarks = WatermarkStore()